@@ -0,0 +1,71 @@
+"""
+Near-duplicate detection cost per posting (signature + LSH query) as the
+index grows, plus recall on lightly edited cross-posts.
+
+Usage (from backend/):
+    python -m benchmarks.bench_dedup --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from myapp.dedup import DuplicateIndex, minhash_signature, posting_text
+
+from . import samples
+
+
+def _text(seed):
+    posting = samples.job_posting(seed)
+    # Pad with generated prose so postings have a realistic ~300 words
+    about = samples.resume_text(seed, roles=2)
+    return posting_text(posting["title"], f"{posting['description']}\n{about}", posting["requirements"])
+
+
+def _edit(text, rng):
+    words = text.split()
+    for _ in range(max(1, len(words) // 100)):
+        words[rng.randrange(len(words))] = "updated"
+    return " ".join(words) + " Apply today."
+
+
+def bench_size(n, probes=200):
+    rng = random.Random(n)
+    index = DuplicateIndex()
+    texts = {}
+    for seed in range(n):
+        texts[seed] = _text(seed)
+        index.add(seed, minhash_signature(texts[seed]))
+
+    timings, found = [], 0
+    for seed in rng.sample(range(n), min(probes, n)):
+        edited = _edit(texts[seed], rng)
+        started = time.perf_counter()
+        match = index.best_match(minhash_signature(edited))
+        timings.append(time.perf_counter() - started)
+        found += bool(match) and match[0] == str(seed)
+    timings.sort()
+    return {
+        "benchmark": "dedup",
+        "index_size": n,
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+        "p99_ms": round(timings[int(0.99 * (len(timings) - 1))] * 1000, 3),
+        "recall": round(found / len(timings), 3),
+    }
+
+
+def run(sizes=(1_000, 10_000, 100_000)):
+    return [bench_size(n) for n in sizes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 10_000, 100_000])
+    args = parser.parse_args()
+    for row in run(args.sizes):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Embedding latency and throughput per inference backend.
+
+Usage (from backend/):
+    python -m benchmarks.bench_embeddings --backends torch onnx onnx-int8 --batch-sizes 1 8 32
+"""
+import argparse
+import json
+import statistics
+import time
+
+from myapp.embeddings import BACKENDS, embedding_threads, encode, load_model
+
+SAMPLE = (
+    "Experienced backend engineer skilled in Python, Django, REST APIs, PostgreSQL, "
+    "Docker and AWS. Built data pipelines and led migrations to microservices. "
+)
+
+
+def bench_backend(backend, batch_sizes, texts, repeats):
+    started = time.perf_counter()
+    model = load_model(backend)
+    load_seconds = time.perf_counter() - started
+    encode(texts[:4], model=model)  # warm up
+
+    results = []
+    for batch_size in batch_sizes:
+        batch = texts[:batch_size]
+        latencies = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            encode(batch, model=model)
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        results.append({
+            "backend": backend,
+            "batch_size": batch_size,
+            "threads": embedding_threads(),
+            "load_seconds": round(load_seconds, 3),
+            "p50_ms": round(statistics.median(latencies) * 1000, 2),
+            "p95_ms": round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 2),
+            "texts_per_second": round(batch_size / statistics.median(latencies), 1),
+        })
+    return results
+
+
+def run(backends=BACKENDS, batch_sizes=(1, 8, 32), repeats=20, words=150):
+    text = " ".join((SAMPLE * 20).split()[:words])
+    texts = [f"{i} {text}" for i in range(max(batch_sizes))]
+    results = []
+    for backend in backends:
+        try:
+            results.extend(bench_backend(backend, batch_sizes, texts, repeats))
+        except ImportError as e:
+            print(f"Skipping {backend}: {e}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--words", type=int, default=150, help="Words per text (one chunk is ~160)")
+    args = parser.parse_args()
+    for row in run(args.backends, args.batch_sizes, args.repeats, args.words):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
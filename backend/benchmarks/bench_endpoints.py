@@ -0,0 +1,153 @@
+"""
+End-to-end latency percentiles for upload_resume, analyze_resume and
+upload_job_posting under concurrency, with Supabase and Groq replaced by the
+local fakes in fake_services.py and a throwaway SQLite database.
+`--storage local` swaps the fake Supabase for the in-process SQLite backend
+(myapp/storage.py), which also measures what dropping the network hop buys.
+
+Usage (from backend/):
+    python -m benchmarks.bench_endpoints --concurrency 1 8 32 --groq-latency 0.5
+    python -m benchmarks.bench_endpoints --storage local
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import samples
+from .fake_services import FAKE_SUPABASE_KEY, fake_groq, fake_supabase
+
+
+def percentiles(latencies):
+    ordered = sorted(latencies)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+    }
+
+
+def _setup_django(supabase_url, groq_url, db_path, storage="fake"):
+    os.environ.update({
+        "STORAGE_BACKEND": "local" if storage == "local" else "supabase",
+        "LOCAL_STORAGE_DB": os.path.join(os.path.dirname(db_path), "storage.sqlite3"),
+        "SUPABASE_URL": supabase_url,
+        "SUPABASE_KEY": FAKE_SUPABASE_KEY,
+        "GROQ_API_URL": f"{groq_url}/openai/v1/chat/completions",
+        "GROQ_API_KEY": "bench",
+        # Measure the handlers, not load shedding: no rate limits, no concurrency caps below the bench's
+        "RATE_LIMITS": "",
+        "ADMISSION_LIMITS": "ocr=64:64,llm=64:64,ingest=64:64,read=64:64",
+        "SUPABASE_MIRROR": "0",
+    })
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "jobsyncai.settings")
+
+    import django
+
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    connection.settings_dict["TEST"]["NAME"] = db_path
+    setup_test_environment()
+    return connection, connection.creation.create_test_db(verbosity=0)
+
+
+def _upload_resume(client, seed):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    pdf = samples.text_pdf(samples.resume_pages(seed=seed, pages=2))
+    upload = SimpleUploadedFile(f"resume_{seed}.pdf", pdf, content_type="application/pdf")
+    return client.post("/upload_resume/", {"file": upload})
+
+
+def _upload_job(client, seed):
+    return client.post("/api/upload-job-posting/", samples.job_posting(seed), content_type="application/json")
+
+
+def _analyze(client, seed):
+    return client.get("/analyze-resume/")
+
+
+ENDPOINTS = {
+    "upload_resume": _upload_resume,
+    "analyze_resume": _analyze,
+    "upload_job_posting": _upload_job,
+}
+
+
+def bench_endpoint(name, call, concurrency, total):
+    from django.test import Client
+
+    def timed(seed):
+        client = Client()
+        started = time.perf_counter()
+        response = call(client, seed)
+        return time.perf_counter() - started, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, range(1000, 1000 + total)))
+    wall = time.perf_counter() - started
+
+    errors = sum(1 for _, code in outcomes if code >= 400)
+    return dict(
+        {"endpoint": name, "concurrency": concurrency, "requests": total, "errors": errors,
+         "throughput_rps": round(total / wall, 2)},
+        **percentiles([latency for latency, _ in outcomes]),
+    )
+
+
+def run(concurrency=(1, 8, 32), requests=64, jobs=200, supabase_latency=0.02, groq_latency=0.5,
+        endpoints=tuple(ENDPOINTS), storage="fake"):
+    results = []
+    with fake_supabase(latency=supabase_latency) as supabase, fake_groq(latency=groq_latency) as groq, \
+            tempfile.TemporaryDirectory() as tmp:
+        connection, old_name = _setup_django(supabase.url, groq.url, os.path.join(tmp, "bench.sqlite3"), storage)
+        try:
+            from django.test import Client
+
+            client = Client()
+            for seed in range(jobs):
+                _upload_job(client, seed)
+            _upload_resume(client, 0)
+
+            for name in endpoints:
+                for level in concurrency:
+                    row = bench_endpoint(name, ENDPOINTS[name], level, max(requests, level))
+                    row.update({"storage": storage, "supabase_latency_ms": supabase_latency * 1000,
+                                "groq_latency_ms": groq_latency * 1000})
+                    results.append(row)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--jobs", type=int, default=200, help="Job postings to seed before measuring")
+    parser.add_argument("--supabase-latency", type=float, default=0.02, help="Seconds added to every Supabase call")
+    parser.add_argument("--groq-latency", type=float, default=0.5, help="Seconds added to every Groq call")
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument("--storage", choices=["fake", "local"], default="fake",
+                        help="Fake Supabase over HTTP, or the local SQLite storage backend")
+    args = parser.parse_args()
+    rows = run(args.concurrency, args.requests, args.jobs, args.supabase_latency, args.groq_latency,
+               tuple(args.endpoints), args.storage)
+    for row in rows:
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
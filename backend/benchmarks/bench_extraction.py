@@ -0,0 +1,82 @@
+"""
+Per-page text extraction cost: PyPDF2 text layer vs. rasterising and OCR
+through myapp.ocr (engine chosen by OCR_BACKEND).
+
+Usage (from backend/):
+    python -m benchmarks.bench_extraction --pages 4
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from . import samples
+
+
+def _per_page(seconds, pages):
+    return round(statistics.median(seconds) / pages * 1000, 2)
+
+
+def bench_pypdf(path, pages, repeats):
+    from PyPDF2 import PdfReader
+
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        text = "".join(page.extract_text() or "" for page in PdfReader(path).pages)
+        timings.append(time.perf_counter() - started)
+    return {"method": "pypdf2", "pages": pages, "ms_per_page": _per_page(timings, pages), "chars": len(text)}
+
+
+def bench_ocr(path, pages, repeats):
+    from myapp import ocr
+
+    raster, recognise = [], []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        images = list(ocr.rasterize_pages(path))
+        raster.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        text = "".join(ocr.ocr_image(image) for image in images)
+        recognise.append(time.perf_counter() - started)
+    return {
+        "method": f"ocr_{ocr.get_ocr_engine().name}",
+        "pages": pages,
+        "rasterize_ms_per_page": _per_page(raster, pages),
+        "ms_per_page": _per_page(recognise, pages),
+        "chars": len(text),
+    }
+
+
+def run(pages=4, repeats=3):
+    results = []
+    page_lines = samples.resume_pages(seed=1, pages=pages)
+    with tempfile.TemporaryDirectory() as tmp:
+        text_path = os.path.join(tmp, "text.pdf")
+        scan_path = os.path.join(tmp, "scan.pdf")
+        with open(text_path, "wb") as f:
+            f.write(samples.text_pdf(page_lines))
+        with open(scan_path, "wb") as f:
+            f.write(samples.scanned_pdf(page_lines))
+
+        results.append(bench_pypdf(text_path, len(page_lines), repeats))
+        try:
+            results.append(bench_ocr(scan_path, len(page_lines), repeats))
+        except Exception as e:
+            print(f"Skipping OCR benchmark: {e}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    for row in run(args.pages, args.repeats):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
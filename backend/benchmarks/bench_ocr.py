@@ -0,0 +1,82 @@
+"""
+OCR page throughput and memory per engine (pytesseract subprocess vs. the
+in-process tesserocr engine), with and without preprocessing.
+
+Each engine runs in a fresh child process so peak RSS is measured in
+isolation; for the subprocess engine the peak of the `tesseract` children
+is reported too.
+
+Usage (from backend/):
+    python -m benchmarks.bench_ocr --pages 4 --engines subprocess tesserocr
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import time
+
+from . import samples
+
+
+def _worker(engine_name, pages, preprocess, queue):
+    try:
+        from myapp import ocr
+
+        engine = ocr.load_engine(engine_name)
+        images = [samples.page_image(lines, dpi=ocr.OCR_DPI) for lines in samples.resume_pages(seed=3, pages=pages)]
+        for image in images:
+            image.info["dpi"] = (ocr.OCR_DPI, ocr.OCR_DPI)
+
+        # First page separately: includes engine start-up (model load for tesserocr)
+        started = time.perf_counter()
+        engine.recognize(images[0].convert("L"))
+        first_page = time.perf_counter() - started
+
+        started = time.perf_counter()
+        chars = 0
+        for image in images:
+            if preprocess:
+                chars += len(ocr.ocr_image(image, engine=engine))
+            else:
+                chars += len(engine.recognize(image.convert("L")))
+        elapsed = time.perf_counter() - started
+
+        queue.put({
+            "engine": engine_name,
+            "preprocess": preprocess,
+            "pages": len(images),
+            "first_page_ms": round(first_page * 1000, 1),
+            "ms_per_page": round(elapsed / len(images) * 1000, 1),
+            "pages_per_second": round(len(images) / elapsed, 2),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+            "chars": chars,
+        })
+    except Exception as e:
+        queue.put({"engine": engine_name, "preprocess": preprocess, "error": str(e)})
+
+
+def run(pages=4, engines=("subprocess", "tesserocr"), preprocess=(False, True)):
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for engine_name in engines:
+        for with_preprocess in preprocess:
+            queue = context.Queue()
+            process = context.Process(target=_worker, args=(engine_name, pages, with_preprocess, queue))
+            process.start()
+            results.append(queue.get())
+            process.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=4)
+    parser.add_argument("--engines", nargs="+", default=["subprocess", "tesserocr"])
+    args = parser.parse_args()
+    for row in run(args.pages, tuple(args.engines)):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
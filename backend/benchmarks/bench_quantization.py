@@ -0,0 +1,116 @@
+"""
+Recall vs. memory of product-quantized vector search (myapp.quantization)
+against the exact float32 matrix, for several re-rank depths.
+
+Vectors are drawn around topic centres with low-rank variation, like real
+posting embeddings, because PQ recall on structureless random vectors says
+little.
+
+Usage (from backend/):
+    python -m benchmarks.bench_quantization --sizes 10000 100000 --subspaces 24 48 96
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from myapp.embeddings import EMBEDDING_DIM
+from myapp.quantization import PQIndex, ProductQuantizer, normalize
+
+
+def clustered_unit_vectors(n, dim=EMBEDDING_DIM, topics=200, rank=16, spread=0.5, noise=0.05, seed=0):
+    """
+    Vectors around topic centres that vary along a few topic-specific
+    directions (low intrinsic dimension) plus a little isotropic noise.
+    The same seed gives the same topics, so queries share the corpus topics.
+    """
+    rng = np.random.default_rng(seed)
+    centres = normalize(rng.standard_normal((topics, dim), dtype=np.float32))
+    bases = rng.standard_normal((topics, rank, dim), dtype=np.float32) / np.sqrt(dim)
+    draw = np.random.default_rng((seed, n))
+    topic = draw.integers(0, topics, size=n)
+    latent = draw.standard_normal((n, rank), dtype=np.float32) * spread
+    vectors = centres[topic] + np.einsum("nr,nrd->nd", latent, bases[topic])
+    vectors += draw.standard_normal((n, dim), dtype=np.float32) * (noise / np.sqrt(dim))
+    return normalize(vectors)
+
+
+def _recall(found, truth):
+    return len(set(found.tolist()) & set(truth.tolist())) / len(truth)
+
+
+def bench_size(n, subspaces, k=10, queries=50, rerank_depths=(0, 50, 100, 200), train_sample=20_000):
+    matrix = clustered_unit_vectors(n)
+    query_vectors = clustered_unit_vectors(queries)
+    truth = [np.argsort(-(matrix @ q))[:k] for q in query_vectors]
+
+    started = time.perf_counter()
+    quantizer = ProductQuantizer(matrix.shape[1], subspaces).fit(matrix, sample=train_sample, iterations=10)
+    train_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    index = PQIndex(quantizer, quantizer.encode(matrix), lambda rows: matrix[rows])
+    encode_seconds = time.perf_counter() - started
+
+    results = []
+    for depth in rerank_depths:
+        recalls, timings = [], []
+        for query, expected in zip(query_vectors, truth):
+            started = time.perf_counter()
+            found, _ = index.search(query, k, rerank=depth)
+            timings.append(time.perf_counter() - started)
+            recalls.append(_recall(found, expected))
+        results.append({
+            "benchmark": "pq_search",
+            "vectors": n,
+            "subspaces": subspaces,
+            "rerank": depth,
+            "recall_at_k": round(statistics.mean(recalls), 3),
+            "k": k,
+            "exact_mb": round(matrix.nbytes / 2**20, 2),
+            "pq_mb": round(index.nbytes / 2**20, 2),
+            "p50_ms": round(statistics.median(timings) * 1000, 3),
+            "train_s": round(train_seconds, 2),
+            "encode_s": round(encode_seconds, 2),
+        })
+
+    timings = []
+    for query in query_vectors:
+        started = time.perf_counter()
+        scores = matrix @ query
+        top = np.argpartition(-scores, k)[:k]
+        top[np.argsort(-scores[top])]
+        timings.append(time.perf_counter() - started)
+    results.append({
+        "benchmark": "exact_search",
+        "vectors": n,
+        "recall_at_k": 1.0,
+        "k": k,
+        "exact_mb": round(matrix.nbytes / 2**20, 2),
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+    })
+    return results
+
+
+def run(sizes=(10_000, 100_000), subspaces=(24, 48, 96)):
+    results = []
+    for n in sizes:
+        for m in subspaces:
+            rows = bench_size(n, m)
+            # The exact baseline does not depend on the subspace count
+            results.extend(rows if m == subspaces[0] else rows[:-1])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000])
+    parser.add_argument("--subspaces", nargs="+", type=int, default=[24, 48, 96])
+    args = parser.parse_args()
+    for row in run(args.sizes, tuple(args.subspaces)):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Top-k cosine similarity search over N stored job vectors (brute force, NumPy),
+plus max-sim re-ranking of the recalled candidates.
+
+Usage (from backend/):
+    python -m benchmarks.bench_search --sizes 1000 100000 1000000
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from myapp.embeddings import EMBEDDING_DIM, maxsim_scores
+
+
+def random_unit_vectors(n, dim=EMBEDDING_DIM, seed=0, block=100_000):
+    """Random normalised float32 vectors, generated in blocks to bound peak memory"""
+    rng = np.random.default_rng(seed)
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, block):
+        chunk = rng.standard_normal((min(block, n - start), dim), dtype=np.float32)
+        chunk /= np.linalg.norm(chunk, axis=1, keepdims=True)
+        out[start:start + len(chunk)] = chunk
+    return out
+
+
+def top_k(matrix, query, k):
+    scores = matrix @ query
+    candidates = np.argpartition(-scores, k)[:k]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+def bench_size(n, k, queries, repeats):
+    matrix = random_unit_vectors(n)
+    query_vectors = random_unit_vectors(queries, seed=1)
+    timings = []
+    for _ in range(repeats):
+        for query in query_vectors:
+            started = time.perf_counter()
+            top_k(matrix, query, k)
+            timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        "benchmark": "vector_search",
+        "vectors": n,
+        "k": k,
+        "matrix_mb": round(matrix.nbytes / 2**20, 1),
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[int(0.95 * (len(timings) - 1))] * 1000, 3),
+    }
+
+
+def bench_maxsim(candidates=50, query_chunks=12, doc_chunks=8, repeats=200):
+    query = random_unit_vectors(query_chunks, seed=2)
+    docs = [random_unit_vectors(doc_chunks, seed=10 + i) for i in range(candidates)]
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        maxsim_scores(query, docs)
+        timings.append(time.perf_counter() - started)
+    return {
+        "benchmark": "maxsim_rerank",
+        "candidates": candidates,
+        "query_chunks": query_chunks,
+        "doc_chunks": doc_chunks,
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+    }
+
+
+def run(sizes=(1_000, 100_000, 1_000_000), k=10, queries=20, repeats=3):
+    results = [bench_size(n, k, queries, repeats) for n in sizes]
+    results.append(bench_maxsim())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1_000, 100_000, 1_000_000])
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    for row in run(args.sizes, args.k, args.queries, args.repeats):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
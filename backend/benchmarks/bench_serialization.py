@@ -0,0 +1,83 @@
+"""
+Cost of encoding a job listing: Django's JsonResponse encoder vs. orjson vs.
+joining the cached per-job bytes of myapp.renderers.JobPayloadCache.
+
+Usage (from backend/):
+    python -m benchmarks.bench_serialization --sizes 100 1000 10000
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from . import samples
+
+
+def job_rows(count):
+    started = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for seed in range(count):
+        posting = samples.job_posting(seed)
+        rows.append(dict(
+            posting,
+            id=uuid.UUID(int=seed + 1),
+            uuid=uuid.UUID(int=seed + 1),
+            salary=Decimal("85000.00") + seed,
+            contact_info=posting["company"],
+            application_link="",
+            created_at=started + timedelta(minutes=seed),
+            updated_at=started + timedelta(minutes=seed),
+        ))
+    return rows
+
+
+def _median_ms(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return round(statistics.median(timings) * 1000, 3)
+
+
+def run(sizes=(100, 1_000, 10_000), repeats=5):
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "jobsyncai.settings")
+    django.setup()
+
+    from django.core.serializers.json import DjangoJSONEncoder
+
+    from myapp.renderers import JobPayloadCache, dumps
+
+    results = []
+    for size in sizes:
+        rows = job_rows(size)
+        cache = JobPayloadCache(max_size=size)
+        cache.render_list(rows)  # warm
+        methods = {
+            "django_json": lambda: json.dumps(rows, cls=DjangoJSONEncoder).encode(),
+            "orjson": lambda: dumps(rows),
+            "cached_bytes": lambda: cache.render_list(rows),
+        }
+        for method, func in methods.items():
+            results.append({"method": method, "jobs": size, "ms": _median_ms(func, repeats),
+                            "bytes": len(func())})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1_000, 10_000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    for row in run(args.sizes, args.repeats):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
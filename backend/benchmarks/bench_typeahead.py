@@ -0,0 +1,84 @@
+"""
+Typeahead latency (TypeaheadIndex.suggest) by index size, for short and
+longer prefixes, plus the cost of an incremental add.
+
+Usage (from backend/):
+    python -m benchmarks.bench_typeahead --sizes 10000 100000 1000000
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from myapp.typeahead import TypeaheadIndex
+
+from . import samples
+
+PREFIXES = ["s", "py", "sen", "senior py", "comp", "company 12", "data", "kub", "lead d", "eng"]
+
+
+def _postings(n):
+    now = datetime.now(timezone.utc)
+    for seed in range(n):
+        posting = samples.job_posting(seed % 10_000)
+        # Spread titles and companies so the term count grows with n
+        yield (
+            f"{posting['title']} {seed % 5_000}",
+            f"Company {seed // 4}",
+            posting["domain"],
+            posting["requirements"],
+            now - timedelta(minutes=seed),
+        )
+
+
+def _percentiles(timings):
+    timings.sort()
+    return {
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+        "p99_ms": round(timings[int(0.99 * (len(timings) - 1))] * 1000, 3),
+    }
+
+
+def bench_size(n, queries=500):
+    rng = random.Random(n)
+    index = TypeaheadIndex()
+    started = time.perf_counter()
+    index.add_postings(_postings(n))
+    build_seconds = time.perf_counter() - started
+
+    rows = []
+    for prefix in PREFIXES:
+        timings = []
+        for _ in range(queries // len(PREFIXES)):
+            started = time.perf_counter()
+            index.suggest(prefix, 10)
+            timings.append(time.perf_counter() - started)
+        rows.append({"benchmark": "typeahead_suggest", "postings": n, "terms": len(index), "prefix": prefix,
+                     **_percentiles(timings)})
+
+    timings = []
+    for i in range(200):
+        posting = samples.job_posting(rng.randrange(10_000))
+        started = time.perf_counter()
+        index.add_posting(f"{posting['title']} new {i}", f"New Company {i}", posting["domain"], posting["requirements"])
+        timings.append(time.perf_counter() - started)
+    rows.append({"benchmark": "typeahead_add", "postings": n, "build_s": round(build_seconds, 2), **_percentiles(timings)})
+    return rows
+
+
+def run(sizes=(10_000, 100_000, 1_000_000)):
+    return [row for n in sizes for row in bench_size(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+    for row in run(args.sizes):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""
+Local stand-ins for Supabase (PostgREST subset) and the Groq chat API.
+
+Both servers keep their data in memory, add a configurable latency to every
+request and implement only what myapp/views.py uses:
+
+- POST /rest/v1/<table>            insert one row or a list of rows; `updated_at`
+                                   defaults to the insert time, like a column default
+- GET  /rest/v1/<table>?col=eq.val select rows filtered with eq/gt/gte/lt/lte and
+                                   or=(...)/and(...), with order= and limit=
+- POST /rest/v1/rpc/match_filtered_job_descriptions
+- POST /rest/v1/rpc/match_candidates
+- POST /openai/v1/chat/completions canned chat completion
+"""
+import json
+import operator
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+FAKE_SUPABASE_KEY = "bench.fake.key"
+
+CANNED_ANALYSIS = "\n".join(
+    f"## Job {i}\n### Match Assessment\nGood overlap with the role.\n"
+    f"### Key Matching Skills\n- Python\n- Django\n### Missing Skills\n- Kubernetes\n"
+    f"### Recommended Learning\n- CKA certification\n"
+    for i in range(1, 4)
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _delay(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+
+_OPERATORS = {"eq": operator.eq, "gt": operator.gt, "gte": operator.ge, "lt": operator.lt, "lte": operator.le}
+
+
+def _split_terms(expression):
+    """Split a PostgREST logic list on top-level commas"""
+    terms, depth, quoted, current = [], 0, False, ""
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and char == "," and depth == 0:
+            terms.append(current)
+            current = ""
+            continue
+        current += char
+    return terms + [current] if current else terms
+
+
+def _compare(value, op, expected):
+    if value is None:
+        return False
+    return _OPERATORS[op](str(value), expected)
+
+
+def _condition(term):
+    """Predicate for `col.op.value`, `and(...)` or `or(...)`"""
+    if term.startswith(("and(", "or(")):
+        combine = all if term.startswith("and(") else any
+        parts = [_condition(t) for t in _split_terms(term[term.index("(") + 1:-1])]
+        return lambda row: combine(part(row) for part in parts)
+    column, op, expected = term.split(".", 2)
+    expected = expected.strip('"')
+    return lambda row: _compare(row.get(column), op, expected)
+
+
+class _SupabaseHandler(_Handler):
+    def do_GET(self):
+        self._delay()
+        url = urlparse(self.path)
+        table = url.path.rsplit("/", 1)[-1]
+        params = {column: values[0] for column, values in parse_qs(url.query).items() if values}
+        conditions = []
+        for column, value in params.items():
+            if column == "or":
+                conditions.append(_condition(f"or{value}"))
+            elif column not in ("select", "order", "limit") and value.split(".", 1)[0] in _OPERATORS:
+                op, expected = value.split(".", 1)
+                conditions.append(_condition(f"{column}.{op}.{expected}"))
+        rows = [row for row in self.server.store.select(table, {}) if all(c(row) for c in conditions)]
+        for key in reversed(params.get("order", "").split(",") if params.get("order") else []):
+            column, _, direction = key.partition(".")
+            rows.sort(key=lambda row: str(row.get(column) or ""), reverse=direction.startswith("desc"))
+        if "limit" in params:
+            rows = rows[:int(params["limit"])]
+        columns = params.get("select", "*")
+        if columns != "*":
+            keep = columns.split(",")
+            rows = [{k: row.get(k) for k in keep} for row in rows]
+        self._send_json(rows)
+
+    def do_POST(self):
+        self._delay()
+        path = urlparse(self.path).path
+        payload = self._read_json()
+        if "/rpc/" in path:
+            self._send_json(self.server.store.rpc(path.rsplit("/", 1)[-1], payload))
+            return
+        table = path.rsplit("/", 1)[-1]
+        rows = payload if isinstance(payload, list) else [payload]
+        self.server.store.insert(table, rows)
+        self._send_json(rows, status=201)
+
+    do_PATCH = do_POST
+
+
+class _GroqHandler(_Handler):
+    def do_POST(self):
+        self._delay()
+        payload = self._read_json()
+        self._send_json({
+            "id": "bench",
+            "model": payload.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": CANNED_ANALYSIS}}],
+        })
+
+
+class SupabaseStore:
+    """In-memory tables plus brute-force cosine RPCs"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tables = {}
+
+    def insert(self, table, rows):
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [dict(row, updated_at=row.get("updated_at") or now) for row in rows]
+        with self.lock:
+            self.tables.setdefault(table, []).extend(rows)
+
+    def select(self, table, filters):
+        with self.lock:
+            rows = list(self.tables.get(table, []))
+        return [row for row in rows if all(str(row.get(k)) == v for k, v in filters.items())]
+
+    def _rank(self, rows, query, threshold, count):
+        if not rows:
+            return []
+        matrix = np.asarray([row["embedding"] for row in rows], dtype=np.float32)
+        query = np.asarray(query, dtype=np.float32)
+        scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+        order = np.argsort(-scores)[:count]
+        return [(rows[i], float(scores[i])) for i in order if scores[i] > threshold]
+
+    def rpc(self, name, params):
+        query = params["query_embedding"]
+        threshold = params.get("match_threshold", 0)
+        count = params.get("match_count", 10)
+        if name == "match_candidates":
+            ranked = self._rank(self.select("resume_vectors", {}), query, threshold, count)
+            return [
+                {"id": row["id"], "name": row.get("name"), "text": row.get("text"), "similarity": score}
+                for row, score in ranked
+            ]
+        if name == "match_filtered_job_descriptions":
+            jobs = {str(job["id"]): job for job in self.select("job_description", {})}
+            vectors = [v for v in self.select("vector_table", {}) if str(v["job_id"]) in jobs]
+            ranked = self._rank(vectors, query, threshold, count)
+            return [dict(jobs[str(v["job_id"])], similarity=score) for v, score in ranked]
+        return []
+
+
+class FakeServer:
+    """Run a handler on an ephemeral localhost port in a daemon thread"""
+
+    def __init__(self, handler, latency=0.0, store=None):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.latency = latency
+        self.httpd.store = store
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def fake_supabase(latency=0.0, store=None):
+    return FakeServer(_SupabaseHandler, latency=latency, store=store or SupabaseStore())
+
+
+def fake_groq(latency=0.0):
+    return FakeServer(_GroqHandler, latency=latency)
@@ -0,0 +1,93 @@
+"""
+Run the benchmark suite and write machine-readable results.
+
+Usage (from backend/):
+    python -m benchmarks.run                       # everything, default sizes
+    python -m benchmarks.run --only search embeddings --output results.json
+    python -m benchmarks.run --quick               # small sizes, for CI smoke runs
+
+The output file is one JSON document with run metadata (git commit, host,
+Python version, start time) and a flat list of result rows per benchmark,
+so two runs can be diffed to spot regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from . import (
+    bench_dedup, bench_embeddings, bench_endpoints, bench_extraction, bench_ocr, bench_quantization, bench_search,
+    bench_serialization, bench_typeahead,
+)
+
+SUITES = ("extraction", "ocr", "embeddings", "search", "quantization", "dedup", "serialization", "typeahead", "endpoints")
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def run_suite(name, quick):
+    if name == "extraction":
+        return bench_extraction.run(pages=2 if quick else 4, repeats=1 if quick else 3)
+    if name == "ocr":
+        return bench_ocr.run(pages=1 if quick else 4)
+    if name == "embeddings":
+        return bench_embeddings.run(batch_sizes=(1, 8) if quick else (1, 8, 32, 64), repeats=3 if quick else 20)
+    if name == "search":
+        return bench_search.run(sizes=(1_000, 10_000) if quick else (1_000, 100_000, 1_000_000))
+    if name == "quantization":
+        return bench_quantization.run(sizes=(10_000,) if quick else (10_000, 100_000), subspaces=(48,) if quick else (24, 48, 96))
+    if name == "dedup":
+        return bench_dedup.run(sizes=(1_000,) if quick else (1_000, 10_000, 100_000))
+    if name == "serialization":
+        return bench_serialization.run(sizes=(100, 1_000) if quick else (100, 1_000, 10_000))
+    if name == "typeahead":
+        return bench_typeahead.run(sizes=(10_000,) if quick else (10_000, 100_000, 1_000_000))
+    if name == "endpoints":
+        if quick:
+            return bench_endpoints.run(concurrency=(1, 4), requests=8, jobs=20, groq_latency=0.05)
+        return bench_endpoints.run()
+    raise ValueError(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=SUITES, default=list(SUITES))
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--quick", action="store_true")
+    args = parser.parse_args()
+
+    report = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "quick": args.quick,
+        "results": {},
+    }
+    for name in args.only:
+        started = time.perf_counter()
+        print(f"Running {name} benchmarks...")
+        try:
+            report["results"][name] = run_suite(name, args.quick)
+        except Exception as e:
+            print(f"❌ {name} benchmarks failed: {e}")
+            report["results"][name] = {"error": str(e)}
+        print(f"✅ {name} finished in {time.perf_counter() - started:.1f}s")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
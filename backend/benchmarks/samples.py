@@ -0,0 +1,100 @@
+"""Synthetic resumes, job postings and PDFs for the benchmarks"""
+import io
+import random
+
+from PIL import Image, ImageDraw
+
+SKILLS = [
+    "Python", "Django", "Flask", "React", "TypeScript", "Node.js", "PostgreSQL", "MongoDB",
+    "Docker", "Kubernetes", "AWS", "GCP", "Terraform", "Spark", "Airflow", "TensorFlow",
+    "PyTorch", "Scrum", "Figma", "SQL", "Java", "Go", "Redis", "Kafka", "CI/CD",
+]
+DOMAINS = ["Software Development", "Data Science", "DevOps", "Product Management", "UX/UI Design"]
+VERBS = ["Built", "Designed", "Led", "Migrated", "Optimised", "Automated", "Maintained", "Shipped"]
+
+
+def resume_text(seed=0, roles=4):
+    rng = random.Random(seed)
+    lines = [f"Candidate {seed}", "SUMMARY", f"Engineer with {rng.randint(1, 15)} years of experience.", "EXPERIENCE"]
+    for role in range(roles):
+        lines.append(f"Company {rng.randint(1, 500)} - Engineer ({2010 + role}-{2012 + role})")
+        for _ in range(6):
+            lines.append(f"- {rng.choice(VERBS)} services using {', '.join(rng.sample(SKILLS, 3))} for {rng.randint(2, 90)} teams.")
+    lines += ["SKILLS", ", ".join(rng.sample(SKILLS, 10)), "EDUCATION", "BSc Computer Science"]
+    return "\n".join(lines)
+
+
+def job_posting(seed=0):
+    rng = random.Random(seed)
+    skills = rng.sample(SKILLS, 6)
+    return {
+        "title": f"{rng.choice(['Senior', 'Junior', 'Staff', 'Lead'])} {rng.choice(skills)} Engineer",
+        "company": f"Company {rng.randint(1, 500)}",
+        "domain": rng.choice(DOMAINS),
+        "location": rng.choice(["Remote", "Bangalore", "Berlin", "New York"]),
+        "description": (
+            f"We are hiring an engineer to work on our platform.\nResponsibilities\n"
+            + "\n".join(f"- {rng.choice(VERBS)} systems with {s}" for s in skills)
+        ),
+        "requirements": "Requirements\n" + "\n".join(f"- {rng.randint(1, 8)}+ years of {s}" for s in skills),
+    }
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def text_pdf(pages):
+    """A minimal PDF with an embedded text layer, one list of lines per page"""
+    objects = []
+    kids = []
+    font_id = 3 + 2 * len(pages)
+    for index, lines in enumerate(pages):
+        page_id, content_id = 3 + 2 * index, 4 + 2 * index
+        kids.append(f"{page_id} 0 R")
+        stream = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({_escape(l)}) '" for l in lines) + " ET"
+        objects.append((page_id, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                                 f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>"))
+        objects.append((content_id, f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"))
+    objects.insert(0, (2, f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"))
+    objects.insert(0, (1, "<< /Type /Catalog /Pages 2 0 R >>"))
+    objects.append((font_id, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id, body in sorted(objects):
+        offsets[obj_id] = out.tell()
+        out.write(f"{obj_id} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for obj_id in sorted(offsets):
+        out.write(f"{offsets[obj_id]:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+def page_image(lines, dpi=200):
+    """Render lines of text onto an A4-sized white page, like a scan"""
+    width, height = int(8.27 * dpi), int(11.69 * dpi)
+    image = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(image)
+    y = dpi // 2
+    for line in lines:
+        draw.text((dpi // 2, y), line, fill="black")
+        y += dpi // 6
+    return image
+
+
+def scanned_pdf(pages, dpi=200):
+    """An image-only PDF (no text layer) so extraction has to fall back to OCR"""
+    images = [page_image(lines, dpi) for lines in pages]
+    out = io.BytesIO()
+    images[0].save(out, format="PDF", save_all=True, append_images=images[1:], resolution=dpi)
+    return out.getvalue()
+
+
+def resume_pages(seed=0, pages=2):
+    lines = resume_text(seed, roles=3 * pages).splitlines()
+    per_page = max(1, len(lines) // pages)
+    return [lines[i:i + per_page] for i in range(0, len(lines), per_page)][:pages]
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "jobsyncai.settings")
 
 application = get_asgi_application()
+
+from myapp.ranking import warm_cross_encoder  # noqa: E402 (needs the app registry)
+
+# Load the cross-encoder now rather than inside the first request's stage budget
+warm_cross_encoder()
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "myapp.middleware.timing_middleware",
     "django.middleware.security.SecurityMiddleware",
     'corsheaders.middleware.CorsMiddleware', 
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -119,6 +120,36 @@ STATIC_URL = "static/"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'uploads'  # Directory for storing uploaded files
 
+# Structured request logs from myapp.middleware.timing_middleware
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "plain": {"format": "%(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "plain"},
+    },
+    "loggers": {
+        "myapp.requests": {"handlers": ["console"], "level": "INFO", "propagate": False},
+        # Diagnostics from the views; DEBUG adds per-request details
+        "myapp": {"handlers": ["console"], "level": "INFO"},
+    },
+}
+
+# orjson for DRF request bodies and responses (see myapp.renderers)
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "myapp.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "myapp.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -10,10 +10,13 @@ urlpatterns = [
     path('analyze-resume/', views.analyze_resume, name='analyze_resume'),
     path('api/jobs/domain/', views.get_jobs_by_domain, name='jobs_by_domain'),
     path('api/domains/', views.get_all_domains, name='get_all_domains'),
+    path('api/typeahead/', views.typeahead, name='typeahead'),
+    path('api/export/<str:table>/', views.export_table, name='export_table'),
     path('api/recruiters/upload-job/', views.upload_job_posting, name='upload_job_posting'),
     path('api/domains/', views.get_domains, name='get_domains'),
     path('upload-job-posting/', views.upload_job_posting, name='upload_job_posting'),# New URL
     path('api/upload-job-posting/', views.upload_job_posting, name='upload_job_posting'),
+    path('metrics', views.metrics, name='metrics'),
 ]
 
 # Serve media files in development (for local testing)
@@ -0,0 +1,344 @@
+"""
+Admission control and load shedding.
+
+Views are grouped into endpoint classes (ocr, llm, ingest, read, export). Each
+class has a concurrency limit and a bounded FIFO wait queue shared by the
+sync and async views of that class in this process. When the queue is full,
+or a request has waited longer than ADMISSION_QUEUE_TIMEOUT, the request is
+rejected right away with 503 and Retry-After instead of tying up a worker.
+
+Classes can also have a per-client token bucket (429 + Retry-After when
+empty). Buckets live in a small SQLite file so every uvicorn worker on the
+host shares them.
+
+Configuration, as comma-separated `class=a:b` pairs:
+    ADMISSION_LIMITS  concurrency:queue size, e.g. "ocr=2:4,llm=8:16"
+    RATE_LIMITS       tokens per second:burst, e.g. "ocr=0.2:5"
+"""
+import asyncio
+import math
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from . import instrumentation
+from .renderers import JsonResponse
+
+DEFAULT_LIMITS = "ocr=2:4,llm=8:16,ingest=4:16,read=64:256,export=2:2"
+DEFAULT_RATES = "ocr=0.1:5,llm=0.2:10,ingest=1:20,export=0.02:10"
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "5"))
+RATE_LIMIT_DB = os.getenv("RATE_LIMIT_DB", str(settings.BASE_DIR / "ratelimit.sqlite3"))
+TRUST_X_FORWARDED_FOR = os.getenv("TRUST_X_FORWARDED_FOR", "0") in ("1", "true")
+
+QUEUE_DEPTH = instrumentation.register(
+    instrumentation.Gauge("jobsync_admission_queue_depth", "Requests waiting for a slot by endpoint class")
+)
+IN_FLIGHT = instrumentation.register(
+    instrumentation.Gauge("jobsync_admission_in_flight", "Requests being handled by endpoint class")
+)
+REJECTED = instrumentation.register(
+    instrumentation.Counter("jobsync_admission_rejected_total", "Rejected requests by endpoint class and reason")
+)
+
+
+def parse_pairs(value):
+    """'ocr=2:4,llm=8:16' -> {'ocr': (2.0, 4.0), 'llm': (8.0, 16.0)}"""
+    pairs = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, numbers = item.split("=")
+        first, second = numbers.split(":")
+        pairs[name.strip()] = (float(first), float(second))
+    return pairs
+
+
+class Rejected(Exception):
+    def __init__(self, status, reason, retry_after):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("granted", "event", "loop", "future")
+
+    def __init__(self, loop=None):
+        self.granted = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def wake(self):
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(True)
+
+
+class ConcurrencyLimiter:
+    """
+    Limit of concurrently running requests with a bounded FIFO queue.
+    A released slot is handed straight to the oldest waiter.
+    """
+
+    def __init__(self, name, limit, queue_size, timeout=ADMISSION_QUEUE_TIMEOUT):
+        self.name = name
+        self.limit = int(limit)
+        self.queue_size = int(queue_size)
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = deque()
+
+    def _publish(self):
+        IN_FLIGHT.set(self._active, endpoint_class=self.name)
+        QUEUE_DEPTH.set(len(self._waiters), endpoint_class=self.name)
+
+    def _enter(self, loop=None):
+        """Take a free slot (returns None) or join the queue (returns a waiter)"""
+        with self._lock:
+            if self._active < self.limit:
+                self._active += 1
+                self._publish()
+                return None
+            if len(self._waiters) >= self.queue_size:
+                raise self._rejection("queue_full")
+            waiter = _Waiter(loop)
+            self._waiters.append(waiter)
+            self._publish()
+            return waiter
+
+    def _abandon(self, waiter):
+        """Leave the queue after a timeout; returns True if the slot was granted meanwhile"""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            self._publish()
+            return False
+
+    def _rejection(self, reason):
+        # Rough time until a slot frees up: one queue timeout per full round of the queue
+        retry_after = max(1, math.ceil(self.timeout * (len(self._waiters) + 1) / max(self.limit, 1)))
+        return Rejected(503, reason, retry_after)
+
+    def acquire(self):
+        waiter = self._enter()
+        if waiter is None or waiter.event.wait(self.timeout) or self._abandon(waiter):
+            return
+        raise self._rejection("queue_timeout")
+
+    async def aacquire(self):
+        waiter = self._enter(asyncio.get_running_loop())
+        if waiter is None:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.timeout)
+            return
+        except asyncio.TimeoutError:
+            if self._abandon(waiter):
+                return
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self.release()
+            raise
+        raise self._rejection("queue_timeout")
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                # Hand the slot over; the active count stays the same
+                self._waiters.popleft().wake()
+            else:
+                self._active -= 1
+            self._publish()
+
+
+class TokenBucketStore:
+    """
+    Per-client token buckets in SQLite, shared by all workers on the host.
+    Each check is one short IMMEDIATE transaction. Connections are pooled
+    per process rather than per thread: under ASGI every sync request runs
+    on a new thread.
+    """
+
+    def __init__(self, path=RATE_LIMIT_DB):
+        self.path = path
+        self._idle = queue.SimpleQueue()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=1, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=OFF")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        return connection
+
+    def take(self, key, rate, burst, now=None):
+        """Take one token; returns seconds to wait for the next token, 0 if allowed"""
+        now = time.time() if now is None else now
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+                allowed = tokens >= 1
+                if allowed:
+                    tokens -= 1
+                connection.execute(
+                    "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                    (key, tokens, now),
+                )
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        finally:
+            self._idle.put(connection)
+        return 0 if allowed else (1 - tokens) / rate
+
+
+_limiters = {name: ConcurrencyLimiter(name, *limits) for name, limits in parse_pairs(
+    os.getenv("ADMISSION_LIMITS", DEFAULT_LIMITS)).items()}
+_rates = parse_pairs(os.getenv("RATE_LIMITS", DEFAULT_RATES))
+_buckets = TokenBucketStore()
+
+
+def concurrency_limit(endpoint_class, default=1):
+    """Concurrent requests allowed for an endpoint class in this process"""
+    limiter = _limiters.get(endpoint_class)
+    return limiter.limit if limiter else default
+
+
+def client_id(request):
+    if TRUST_X_FORWARDED_FOR:
+        forwarded = request.META.get("HTTP_X_FORWARDED_FOR")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "unknown")
+
+
+def _check_rate(endpoint_class, request):
+    if endpoint_class not in _rates:
+        return
+    rate, burst = _rates[endpoint_class]
+    try:
+        wait = _buckets.take(f"{endpoint_class}:{client_id(request)}", rate, burst)
+    except sqlite3.Error as e:
+        # Fail open: a locked or broken bucket file must not take the endpoint down
+        print(f"Warning: rate limit store unavailable: {e}")
+        return
+    if wait:
+        raise Rejected(429, "rate_limited", max(1, math.ceil(wait)))
+
+
+def _rejected_response(endpoint_class, rejection):
+    REJECTED.inc(endpoint_class=endpoint_class, reason=rejection.reason)
+    message = "Too many requests" if rejection.status == 429 else "Server busy"
+    response = JsonResponse(
+        {"error": f"{message}, please retry later", "retry_after": rejection.retry_after},
+        status=rejection.status,
+    )
+    response["Retry-After"] = str(rejection.retry_after)
+    return response
+
+
+def _release_after_stream(response, limiter):
+    """
+    Keep the slot of a streaming response until its body has been sent (or
+    the response is closed without sending it); returns False for other
+    responses, whose slot the caller releases.
+    """
+    if not getattr(response, "streaming", False):
+        return False
+    content = response.streaming_content
+    released = []
+
+    def release():
+        if not released:
+            released.append(True)
+            limiter.release()
+
+    if response.is_async:
+        async def stream():
+            try:
+                async for chunk in content:
+                    yield chunk
+            finally:
+                release()
+    else:
+        def stream():
+            try:
+                yield from content
+            finally:
+                release()
+    response.streaming_content = stream()
+    response._resource_closers.append(release)
+    return True
+
+
+def admit(endpoint_class):
+    """
+    Decorator applying the rate limit and concurrency limit of an endpoint
+    class to a sync or async view. A streaming response holds its slot
+    until the stream ends.
+    """
+    limiter = _limiters.get(endpoint_class)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def wrapper(request, *args, **kwargs):
+                try:
+                    if endpoint_class in _rates:
+                        # The bucket transaction can wait on the file lock; keep it off the event loop
+                        await sync_to_async(_check_rate, thread_sensitive=False)(endpoint_class, request)
+                    if limiter:
+                        await limiter.aacquire()
+                except Rejected as rejection:
+                    return _rejected_response(endpoint_class, rejection)
+                response = None
+                try:
+                    response = await view(request, *args, **kwargs)
+                    return response
+                finally:
+                    if limiter and not _release_after_stream(response, limiter):
+                        limiter.release()
+        else:
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                try:
+                    _check_rate(endpoint_class, request)
+                    if limiter:
+                        limiter.acquire()
+                except Rejected as rejection:
+                    return _rejected_response(endpoint_class, rejection)
+                response = None
+                try:
+                    response = view(request, *args, **kwargs)
+                    return response
+                finally:
+                    if limiter and not _release_after_stream(response, limiter):
+                        limiter.release()
+        return wrapper
+    return decorator
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class MyappConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "myapp"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save
+
+        from .models import JobDescription
+        from .renderers import job_payloads
+
+        def drop_job_payload(sender, instance, **kwargs):
+            job_payloads.invalidate(instance.pk)
+
+        # Cached job JSON must not outlive a change to the row
+        post_save.connect(drop_job_payload, sender=JobDescription, weak=False, dispatch_uid="drop_job_payload_save")
+        post_delete.connect(drop_job_payload, sender=JobDescription, weak=False, dispatch_uid="drop_job_payload_delete")
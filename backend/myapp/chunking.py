@@ -0,0 +1,91 @@
+import os
+import re
+
+# all-MiniLM-L6-v2 truncates at 256 word pieces, roughly 180 English words
+CHUNK_WORDS = int(os.getenv("CHUNK_WORDS", "160"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "32"))
+MAX_CHUNKS = int(os.getenv("MAX_CHUNKS", "16"))
+
+# Headings that commonly start a section in resumes and job postings
+SECTION_HEADINGS = [
+    "summary", "profile", "objective", "about", "about us", "about the role",
+    "experience", "work experience", "professional experience", "employment history",
+    "education", "skills", "technical skills", "core competencies",
+    "projects", "certifications", "certificates", "achievements", "awards",
+    "publications", "languages", "interests", "volunteering",
+    "responsibilities", "key responsibilities", "what you will do", "duties",
+    "requirements", "qualifications", "preferred qualifications",
+    "nice to have", "benefits", "what we offer",
+]
+
+_HEADING_RE = re.compile(
+    r"^\s*(?:#+\s*)?(" + "|".join(re.escape(h) for h in SECTION_HEADINGS) + r")\s*:?\s*$",
+    re.IGNORECASE,
+)
+
+
+def is_heading(line):
+    """Return True if a line looks like a section heading"""
+    stripped = line.strip()
+    if not stripped or len(stripped) > 40:
+        return False
+    if _HEADING_RE.match(stripped):
+        return True
+    # Short all-caps lines such as "WORK HISTORY" are headings too
+    letters = [c for c in stripped if c.isalpha()]
+    return len(letters) >= 4 and stripped.rstrip(":").isupper() and len(stripped.split()) <= 4
+
+
+def split_sections(text):
+    """
+    Split a document into (heading, body) pairs.
+    Text before the first heading is returned with an empty heading.
+    """
+    sections = []
+    heading = ""
+    lines = []
+    for line in text.splitlines():
+        if is_heading(line):
+            if any(l.strip() for l in lines):
+                sections.append((heading, "\n".join(lines).strip()))
+            heading = line.strip().strip("#").strip().rstrip(":")
+            lines = []
+        else:
+            lines.append(line)
+    if any(l.strip() for l in lines):
+        sections.append((heading, "\n".join(lines).strip()))
+    return sections
+
+
+def chunk_text(text, max_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP, max_chunks=MAX_CHUNKS):
+    """
+    Section-aware chunking of resume or job text.
+
+    Each section is cut into overlapping windows of at most `max_words` words
+    so every chunk fits in the embedding model's context. Chunks are prefixed
+    with their section heading to keep context. At most `max_chunks` chunks are
+    returned; the budget is shared across sections so a long experience section
+    cannot crowd out skills or education.
+    """
+    if not text or not text.strip():
+        return []
+
+    step = max(1, max_words - overlap)
+    per_section = []
+    for heading, body in split_sections(text) or [("", text)]:
+        words = body.split()
+        windows = []
+        for start in range(0, max(len(words) - overlap, 1), step):
+            window = " ".join(words[start:start + max_words])
+            windows.append(f"{heading}: {window}" if heading else window)
+        per_section.append(windows)
+
+    # Round-robin over sections until the chunk cap is reached
+    chunks = []
+    depth = 0
+    while len(chunks) < max_chunks and any(depth < len(w) for w in per_section):
+        for windows in per_section:
+            if depth < len(windows) and len(chunks) < max_chunks:
+                chunks.append(windows[depth])
+        depth += 1
+    return chunks
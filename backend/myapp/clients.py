@@ -0,0 +1,63 @@
+"""
+Shared async clients and the executor for CPU-bound work in async views.
+
+Clients are cached per event loop: uvicorn runs one loop per worker, while
+the Django test client and management commands may create a fresh loop per
+request, and httpx connection pools must not be shared across loops.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+# Threads for encode/OCR; each call is itself multi-threaded, so keep this small
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", "2"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "30"))
+
+_cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+_http_clients = weakref.WeakKeyDictionary()
+_supabase_clients = weakref.WeakKeyDictionary()
+
+
+def get_http_client():
+    """Pooled httpx.AsyncClient for the running event loop"""
+    loop = asyncio.get_running_loop()
+    client = _http_clients.get(loop)
+    if client is None:
+        client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+        _http_clients[loop] = client
+    return client
+
+
+async def get_async_supabase():
+    """Async Supabase client for the running event loop (or the local backend, see storage.py)"""
+    from supabase import acreate_client
+
+    from .storage import STORAGE_BACKEND, local_client
+
+    if STORAGE_BACKEND == "local":
+        return local_client(asynchronous=True)
+    loop = asyncio.get_running_loop()
+    client = _supabase_clients.get(loop)
+    if client is None:
+        client = await acreate_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+        _supabase_clients[loop] = client
+    return client
+
+
+async def run_cpu(func, *args, **kwargs):
+    """
+    Run a CPU-bound function (encode, OCR, scoring) on the CPU executor so it
+    does not block the event loop. The caller's context is copied so
+    instrumentation spans still land on the current request.
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_cpu_executor, functools.partial(context.run, func, *args, **kwargs))
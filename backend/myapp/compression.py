@@ -0,0 +1,367 @@
+"""
+Transparent zstd compression of large text columns.
+
+`CompressedTextField` is a TextField stored as a binary column: each value
+is one zstd frame compressed with the newest dictionary of the field's
+dictionary group ("resume", "job"), trained on our own corpus so the
+boilerplate every resume and posting repeats compresses away. Values under
+COMPRESSION_MIN_BYTES are stored as plain UTF-8, and rows written before the
+column was compressed are read as they are.
+
+Frames name the dictionary they were compressed with (zstd dict id), and
+dictionaries are kept in CompressionDictionary and never deleted, so
+retraining (`manage.py train_compression_dictionary`) only affects rows
+written or recompressed afterwards.
+
+Decompression is lazy on model instances: the row keeps the stored frame
+and the attribute decompresses it on first access (then keeps the text), so
+list queries that load instances without reading their text never pay for
+it, and saving an instance whose text was not touched writes the stored
+frame back unchanged. values() / values_list() hand back plain str; models
+with a CompressedTextField use CompressedTextManager for that.
+
+Dictionaries are read from the database when first needed and re-read every
+DICTIONARY_REFRESH_SECONDS. On an event loop thread, where Django refuses
+queries, the re-read runs in a background thread and the call goes on with
+the dictionaries it has; `manage.py serve` loads them before forking.
+"""
+import asyncio
+import functools
+import os
+import threading
+import time
+
+import zstandard as zstd
+from django.db import connections, models
+from django.db.models import F
+from django.db.models.functions import Cast
+from django.db.models.query_utils import DeferredAttribute
+
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "64"))
+COMPRESSION_DICT_SIZE = int(os.getenv("COMPRESSION_DICT_SIZE", str(64 * 1024)))
+# Rows sampled to train a dictionary; fewer than COMPRESSION_MIN_SAMPLES and no dictionary is trained
+COMPRESSION_TRAINING_SAMPLES = int(os.getenv("COMPRESSION_TRAINING_SAMPLES", "5000"))
+COMPRESSION_MIN_SAMPLES = int(os.getenv("COMPRESSION_MIN_SAMPLES", "100"))
+# How often a process looks for dictionaries trained by another one
+DICTIONARY_REFRESH_SECONDS = float(os.getenv("DICTIONARY_REFRESH_SECONDS", "300"))
+
+
+class CompressedText:
+    """A CompressedTextField value as stored, before its attribute is read"""
+
+    __slots__ = ("stored",)
+
+    def __init__(self, stored):
+        # bytes, or str for rows written before the column was compressed
+        self.stored = bytes(stored) if isinstance(stored, memoryview) else stored
+
+    def __str__(self):
+        return decompress(self.stored)
+
+    def __repr__(self):
+        return f"<CompressedText: {len(self.stored)} bytes>"
+
+
+def _text(value):
+    return decompress(value.stored) if isinstance(value, CompressedText) else value
+
+
+_dictionaries = {}  # dict id -> ZstdCompressionDict
+_latest = {}  # dictionary group -> dict id
+_checked = None
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _load_dictionaries():
+    from .models import CompressionDictionary
+
+    rows = CompressionDictionary.objects.order_by("created_at", "id").values_list("name", "dict_id", "data")
+    for name, dict_id, data in rows:
+        if dict_id not in _dictionaries:
+            _dictionaries[dict_id] = zstd.ZstdCompressionDict(bytes(data))
+        _latest[name] = dict_id
+
+
+def _fresh():
+    return _checked is not None and time.monotonic() - _checked < DICTIONARY_REFRESH_SECONDS
+
+
+def _reload():
+    global _checked
+    try:
+        _load_dictionaries()
+    except Exception as e:
+        # Before the migration created the table, or the database is down: no dictionaries yet
+        print(f"Warning: could not load compression dictionaries: {e}")
+    _checked = time.monotonic()
+
+
+def load_dictionaries():
+    """Read the dictionaries now, e.g. at startup; call from sync code"""
+    with _lock:
+        _reload()
+
+
+def _load_in_background():
+    try:
+        load_dictionaries()
+    finally:
+        connections.close_all()
+
+
+def _refresh(force=False):
+    global _checked
+    if not force and _fresh():
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        with _lock:
+            if force or not _fresh():
+                _reload()
+        return
+    with _lock:
+        if not force and _fresh():
+            return
+        # Counts as checked, so other calls on the loop do not start threads of their own
+        _checked = time.monotonic()
+    threading.Thread(target=_load_in_background, name="compression-dictionaries", daemon=True).start()
+
+
+def _load_missing():
+    # A frame names a dictionary trained since the last refresh. Rare, so
+    # on an event loop thread the read waits for the load in another thread
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        _refresh(force=True)
+        return
+    thread = threading.Thread(target=_load_in_background, name="compression-dictionaries")
+    thread.start()
+    thread.join()
+
+
+def _compressor(dict_id):
+    # zstd contexts are not thread-safe; keep one per thread and dictionary
+    compressors = _local.__dict__.setdefault("compressors", {})
+    if dict_id not in compressors:
+        dictionary = _dictionaries.get(dict_id)
+        compressors[dict_id] = zstd.ZstdCompressor(level=COMPRESSION_LEVEL, dict_data=dictionary)
+    return compressors[dict_id]
+
+
+def _decompressor(dict_id):
+    decompressors = _local.__dict__.setdefault("decompressors", {})
+    if dict_id not in decompressors:
+        decompressors[dict_id] = zstd.ZstdDecompressor(dict_data=_dictionaries.get(dict_id))
+    return decompressors[dict_id]
+
+
+def compress(text, dictionary):
+    """Stored form of a text: a zstd frame, or UTF-8 if it is too short to be worth it"""
+    data = text.encode()
+    if len(data) < COMPRESSION_MIN_BYTES:
+        return data
+    _refresh()
+    return _compressor(_latest.get(dictionary, 0)).compress(data)
+
+
+def decompress(stored):
+    if isinstance(stored, str):
+        return stored
+    stored = bytes(stored)
+    if stored[:4] != zstd.FRAME_HEADER:
+        # Plain UTF-8 never starts with the zstd magic number (0xb5 cannot follow "(")
+        return stored.decode()
+    dict_id = zstd.get_frame_parameters(stored).dict_id
+    if dict_id and dict_id not in _dictionaries:
+        _load_missing()
+        if dict_id not in _dictionaries:
+            raise ValueError(f"Compression dictionary {dict_id} not found")
+    return _decompressor(dict_id).decompress(stored).decode()
+
+
+def dictionary_id(stored):
+    """Dict id a stored value was compressed with; 0 without a dictionary, None if not compressed"""
+    stored = bytes(stored) if isinstance(stored, (bytes, memoryview)) else b""
+    if stored[:4] != zstd.FRAME_HEADER:
+        return None
+    return zstd.get_frame_parameters(stored).dict_id
+
+
+def train_dictionary(name, samples, model=None):
+    """
+    Train and store a new dictionary for a group from sample texts; it is
+    used for everything compressed from then on. Returns its dict id, or
+    None when there are too few samples to train on.
+    """
+    from .models import CompressionDictionary
+
+    samples = [text.encode() for text in samples if text]
+    if len(samples) < COMPRESSION_MIN_SAMPLES:
+        return None
+    try:
+        dictionary = zstd.train_dictionary(COMPRESSION_DICT_SIZE, samples, level=COMPRESSION_LEVEL)
+    except zstd.ZstdError as e:
+        print(f"Warning: could not train the '{name}' compression dictionary: {e}")
+        return None
+    (model or CompressionDictionary).objects.create(
+        name=name, dict_id=dictionary.dict_id(), data=dictionary.as_bytes()
+    )
+    _refresh(force=True)
+    return dictionary.dict_id()
+
+
+def training_samples(model, fields, limit=COMPRESSION_TRAINING_SAMPLES):
+    """Texts of the given fields of the newest rows"""
+    rows = model.objects.order_by("-pk").values_list(*fields)[:limit]
+    # Historical models in migrations have a plain manager, whose rows hold CompressedText
+    return [_text(value) for row in rows for value in row if value]
+
+
+def compressed_fields():
+    """{dictionary group: [(model, [CompressedTextField names])]} over the installed models"""
+    from django.apps import apps
+
+    groups = {}
+    for model in apps.get_models():
+        fields = {}
+        for field in model._meta.concrete_fields:
+            if isinstance(field, CompressedTextField):
+                fields.setdefault(field.dictionary, []).append(field.name)
+        for name, names in fields.items():
+            groups.setdefault(name, []).append((model, names))
+    return groups
+
+
+def recompress(model, fields, batch_size=500):
+    """
+    Rewrite the given CompressedTextFields of every row that is not stored
+    with its group's newest dictionary; returns the number of rows rewritten.
+    """
+    _refresh(force=True)
+    latest = {name: _latest.get(model._meta.get_field(name).dictionary, 0) for name in fields}
+    # The stored form, which the field itself would decompress
+    stored = {f"{name}_stored": Cast(F(name), models.BinaryField()) for name in fields}
+    rewritten = 0
+    last_pk = None
+    while True:
+        queryset = model.objects.order_by("pk")
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        rows = list(queryset.annotate(**stored).values_list("pk", *stored)[:batch_size])
+        if not rows:
+            return rewritten
+        last_pk = rows[-1][0]
+        stale = []
+        for pk, *values in rows:
+            if any(value is not None and _is_stale(value, latest[name]) for name, value in zip(fields, values)):
+                stale.append(model(pk=pk, **{
+                    name: None if value is None else decompress(value) for name, value in zip(fields, values)
+                }))
+        if stale:
+            model.objects.bulk_update(stale, fields)
+            rewritten += len(stale)
+
+
+def _is_stale(stored, latest):
+    if isinstance(stored, str):
+        return True
+    stored = bytes(stored)
+    dict_id = dictionary_id(stored)
+    if dict_id is None:
+        # Short values stay plain; longer ones were written before the column was compressed
+        return len(stored) >= COMPRESSION_MIN_BYTES
+    return dict_id != latest
+
+
+class _DecompressingIterable:
+    def __iter__(self):
+        for row in super().__iter__():
+            if isinstance(row, dict):
+                yield {name: _text(value) for name, value in row.items()}
+            elif hasattr(row, "_fields"):
+                yield row._make(map(_text, row))
+            elif isinstance(row, tuple):
+                yield tuple(map(_text, row))
+            else:
+                yield _text(row)
+
+
+@functools.cache
+def _decompressing(iterable_class):
+    return type(f"Decompressing{iterable_class.__name__}", (_DecompressingIterable, iterable_class), {})
+
+
+class CompressedTextQuerySet(models.QuerySet):
+    """values() / values_list() rows with the CompressedTextFields decompressed"""
+
+    def values(self, *fields, **expressions):
+        clone = super().values(*fields, **expressions)
+        clone._iterable_class = _decompressing(clone._iterable_class)
+        return clone
+
+    def values_list(self, *fields, flat=False, named=False):
+        clone = super().values_list(*fields, flat=flat, named=named)
+        clone._iterable_class = _decompressing(clone._iterable_class)
+        return clone
+
+
+CompressedTextManager = models.Manager.from_queryset(CompressedTextQuerySet)
+
+
+class CompressedTextDescriptor(DeferredAttribute):
+    """Decompresses the loaded value on first access and keeps the text"""
+
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, CompressedText):
+            value = instance.__dict__[self.field.attname] = decompress(value.stored)
+        return value
+
+    def __set__(self, instance, value):
+        # A data descriptor, so reads come through __get__ instead of the instance __dict__
+        instance.__dict__[self.field.attname] = value
+
+
+class CompressedTextField(models.TextField):
+    """TextField stored zstd-compressed with the `dictionary` group's dictionary"""
+
+    descriptor_class = CompressedTextDescriptor
+
+    def __init__(self, *args, dictionary, **kwargs):
+        self.dictionary = dictionary
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["dictionary"] = self.dictionary
+        return name, path, args, kwargs
+
+    def get_internal_type(self):
+        return "BinaryField"
+
+    def from_db_value(self, value, expression, connection):
+        return None if value is None else CompressedText(value)
+
+    def pre_save(self, model_instance, add):
+        # The stored frame of a value that was never read goes back as it is
+        return model_instance.__dict__.get(self.attname)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, CompressedText) and isinstance(value.stored, bytes):
+            return value.stored
+        return compress(self.to_python(value), self.dictionary)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        return None if value is None else connection.Database.Binary(value)
+
+    def to_python(self, value):
+        return super().to_python(_text(value))
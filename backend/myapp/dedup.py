@@ -0,0 +1,182 @@
+"""
+Near-duplicate detection for job postings with MinHash + LSH banding.
+
+A posting is reduced to hashed word 5-gram shingles and turned
+into a NUM_PERM-value MinHash signature with vectorised universal hashing.
+The signature is split into DEDUP_BANDS bands; postings sharing any band
+are candidates, and candidates whose estimated Jaccard similarity reaches
+DEDUP_THRESHOLD are duplicates. Signatures are stored on JobDescription
+(`minhash`) so the in-memory index is rebuilt from the database without
+re-shingling, and kept up to date with other workers' postings.
+"""
+import os
+import re
+import threading
+import time
+import zlib
+from datetime import timedelta
+
+import numpy as np
+
+NUM_PERM = 128
+DEDUP_BANDS = int(os.getenv("DEDUP_BANDS", "16"))  # 16 bands x 8 rows: candidate threshold ~0.7
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+# "flag" stores the posting marked as a duplicate, "merge" returns the existing posting, "off" disables
+DEDUP_MODE = os.getenv("DEDUP_MODE", "flag")
+# Each worker holds its own index; postings stored by the others are read every DEDUP_SYNC_SECONDS
+DEDUP_SYNC_SECONDS = float(os.getenv("DEDUP_SYNC_SECONDS", "5"))
+# Postings can commit out of created_at order; each sync re-reads this window
+DEDUP_SYNC_OVERLAP_SECONDS = 60
+SHINGLE_SIZE = 5
+
+_MERSENNE_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.RandomState(20240509)
+_A = _rng.randint(1, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+_B = _rng.randint(0, (1 << 31) - 1, size=NUM_PERM).astype(np.uint64)
+_WORD_RE = re.compile(r"[a-z0-9+#]+")
+_MASK32 = np.uint64(0xFFFFFFFF)
+# Odd multipliers that mix word position into the shingle hash (wrap-around is intended)
+_SHINGLE_MULTIPLIERS = [np.uint64(m) for m in (0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F, 0x165667B1)]
+
+
+def posting_text(title, description, requirements=""):
+    """The fields that identify a posting; company is left out so cross-posts by agencies still match"""
+    return f"{title or ''}\n{description or ''}\n{requirements or ''}"
+
+
+def shingle_hashes(text):
+    """
+    32-bit hashes of the word 5-gram shingles of a normalised text. Words are
+    hashed once with crc32 and combined per window in NumPy, instead of
+    building and hashing every shingle string.
+    """
+    words = _WORD_RE.findall(text.lower())
+    word_hashes = np.fromiter((zlib.crc32(w.encode()) for w in words), dtype=np.uint64, count=len(words))
+    if len(word_hashes) < SHINGLE_SIZE:
+        return np.unique(word_hashes.sum(keepdims=True) & _MASK32)
+    windows = len(word_hashes) - SHINGLE_SIZE + 1
+    combined = np.zeros(windows, dtype=np.uint64)
+    for offset, multiplier in enumerate(_SHINGLE_MULTIPLIERS):
+        combined += word_hashes[offset:offset + windows] * multiplier
+    return np.unique((combined ^ (combined >> np.uint64(32))) & _MASK32)
+
+
+def minhash_signature(text):
+    """NUM_PERM uint32 MinHash values for a text"""
+    hashes = shingle_hashes(text)
+    # (a * h + b) mod p stays below 2**63 because a, b < 2**31 and h < 2**32
+    permuted = (np.outer(hashes, _A) + _B) % _MERSENNE_PRIME
+    return permuted.min(axis=0).astype(np.uint32)
+
+
+def signature_to_bytes(signature):
+    return np.asarray(signature, dtype=np.uint32).tobytes()
+
+
+def signature_from_bytes(blob):
+    return np.frombuffer(bytes(blob), dtype=np.uint32)
+
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.count_nonzero(a == b)) / len(a)
+
+
+class DuplicateIndex:
+    """In-memory LSH index of posting signatures"""
+
+    def __init__(self, bands=DEDUP_BANDS, threshold=DEDUP_THRESHOLD):
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._buckets = [dict() for _ in range(bands)]
+        self._signatures = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _band_keys(self, signature):
+        view = np.ascontiguousarray(signature, dtype=np.uint32).reshape(self.bands, self.rows)
+        return [band.tobytes() for band in view]
+
+    def add(self, doc_id, signature):
+        doc_id = str(doc_id)
+        with self._lock:
+            self._signatures[doc_id] = signature
+            for buckets, key in zip(self._buckets, self._band_keys(signature)):
+                buckets.setdefault(key, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        doc_id = str(doc_id)
+        with self._lock:
+            signature = self._signatures.pop(doc_id, None)
+            if signature is None:
+                return
+            for buckets, key in zip(self._buckets, self._band_keys(signature)):
+                members = buckets.get(key)
+                if members:
+                    members.discard(doc_id)
+                    if not members:
+                        del buckets[key]
+
+    def query(self, signature):
+        """Indexed postings at or above the threshold, as [(doc_id, similarity)] best first"""
+        with self._lock:
+            candidates = set()
+            for buckets, key in zip(self._buckets, self._band_keys(signature)):
+                candidates.update(buckets.get(key, ()))
+            scored = [(doc_id, similarity(signature, self._signatures[doc_id])) for doc_id in candidates]
+        matches = [(doc_id, score) for doc_id, score in scored if score >= self.threshold]
+        return sorted(matches, key=lambda match: match[1], reverse=True)
+
+    def best_match(self, signature):
+        matches = self.query(signature)
+        return matches[0] if matches else None
+
+
+_index = None
+_index_lock = threading.Lock()
+_watermark = None  # newest created_at read from the database
+_synced_at = 0.0
+
+
+def _canonical():
+    from .lifecycle import live_jobs
+
+    return live_jobs().filter(duplicate_of__isnull=True).exclude(minhash=None)
+
+
+def _load(index, queryset):
+    global _watermark
+    rows = queryset.values_list("id", "minhash", "created_at")
+    for job_id, blob, created_at in rows.iterator(chunk_size=2000):
+        # Adding a posting again (it was in the overlap window) just replaces it
+        index.add(job_id, signature_from_bytes(blob))
+        _watermark = created_at if _watermark is None else max(_watermark, created_at)
+
+
+def get_duplicate_index():
+    """
+    Process-wide index of canonical (non-duplicate), unexpired postings, loaded
+    from the database on first use and topped up with other processes'
+    postings every DEDUP_SYNC_SECONDS. Call from sync code (use sync_to_async in views).
+    """
+    global _index, _synced_at
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = DuplicateIndex()
+                _load(index, _canonical())
+                _synced_at = time.monotonic()
+                _index = index
+    elif time.monotonic() - _synced_at >= DEDUP_SYNC_SECONDS:
+        with _index_lock:
+            if time.monotonic() - _synced_at >= DEDUP_SYNC_SECONDS:
+                _synced_at = time.monotonic()
+                queryset = _canonical()
+                if _watermark is not None:
+                    horizon = _watermark - timedelta(seconds=DEDUP_SYNC_OVERLAP_SECONDS)
+                    queryset = queryset.filter(created_at__gt=horizon)
+                _load(_index, queryset)
+    return _index
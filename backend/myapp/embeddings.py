@@ -0,0 +1,199 @@
+import os
+import numpy as np
+
+from .chunking import chunk_text
+from .instrumentation import span
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+EMBEDDING_DIM = 384
+
+# Inference backend: "torch" (default), "onnx" or "onnx-int8" (dynamically quantized)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+# Directory written by `manage.py export_embedding_model`
+EMBEDDING_MODEL_DIR = os.getenv(
+    "EMBEDDING_MODEL_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "all-MiniLM-L6-v2"),
+)
+# Target instruction set for int8 quantization: arm64, avx2, avx512 or avx512_vnni
+EMBEDDING_QUANTIZATION = os.getenv("EMBEDDING_QUANTIZATION", "avx2")
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+_model = None
+
+
+def embedding_threads():
+    """
+    Threads each worker may use for inference.
+    Defaults to an even share of the CPUs across uvicorn workers so workers do not oversubscribe.
+    """
+    configured = int(os.getenv("EMBEDDING_THREADS", "0"))
+    if configured > 0:
+        return configured
+    workers = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+    return max(1, (os.cpu_count() or 1) // workers)
+
+
+def onnx_file_name(backend):
+    """Path of the ONNX graph for a backend, relative to the model directory"""
+    if backend == "onnx-int8":
+        return f"onnx/model_qint8_{EMBEDDING_QUANTIZATION}.onnx"
+    return "onnx/model.onnx"
+
+
+def load_model(backend=None, threads=None):
+    """
+    Build a SentenceTransformer for the given inference backend, using
+    `threads` inference threads (default: embedding_threads()).
+
+    The ONNX backends run on ONNX Runtime with thread counts pinned per worker and
+    load the exported model from EMBEDDING_MODEL_DIR when it exists, otherwise
+    from the hub. Both need the optional `optimum` and `onnxruntime` packages.
+    """
+    from sentence_transformers import SentenceTransformer
+
+    backend = backend or EMBEDDING_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{backend}', expected one of {BACKENDS}")
+
+    threads = threads or embedding_threads()
+    if backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+        return SentenceTransformer(EMBEDDING_MODEL, backend="torch", device="cpu")
+
+    import onnxruntime as ort
+    session_options = ort.SessionOptions()
+    session_options.intra_op_num_threads = threads
+    session_options.inter_op_num_threads = 1
+    session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+    source = EMBEDDING_MODEL_DIR if os.path.isdir(EMBEDDING_MODEL_DIR) else EMBEDDING_MODEL
+    return SentenceTransformer(
+        source,
+        backend="onnx",
+        device="cpu",
+        model_kwargs={
+            "file_name": onnx_file_name(backend),
+            "provider": "CPUExecutionProvider",
+            "session_options": session_options,
+        },
+    )
+
+
+def get_model():
+    """Load the embedding model once per process"""
+    global _model
+    if _model is None:
+        _model = load_model()
+    return _model
+
+
+def preload_model():
+    """
+    Load the torch model weights in a pre-fork master (`manage.py serve`).
+    torch runs single-threaded here, so no OpenMP thread pool exists to be
+    broken by fork; each worker then calls set_inference_threads().
+    """
+    global _model
+    if _model is None:
+        _model = load_model("torch", threads=1)
+    return _model
+
+
+def set_inference_threads():
+    """Give this worker its share of the CPUs for torch inference (intra-op threads)"""
+    import torch
+
+    torch.set_num_threads(embedding_threads())
+
+
+def encode(texts, model=None):
+    """
+    Encode a list of texts in batches.
+    Returns a float32 array of L2-normalised vectors with shape (len(texts), dim).
+    """
+    if not texts:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    with span("encode"):
+        vectors = (model or get_model()).encode(
+            list(texts),
+            batch_size=EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def pool(chunk_vectors):
+    """Mean-pool chunk vectors into one normalised document vector"""
+    if len(chunk_vectors) == 0:
+        return np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    mean = chunk_vectors.mean(axis=0)
+    norm = np.linalg.norm(mean)
+    return mean / norm if norm > 0 else mean
+
+
+def embed_document(text, max_chunks=None):
+    """
+    Chunk a resume or job text and encode every chunk in one batch.
+    Returns (chunk_vectors, pooled_vector).
+    """
+    if max_chunks is None:
+        chunks = chunk_text(text)
+    else:
+        chunks = chunk_text(text, max_chunks=max_chunks)
+    chunk_vectors = encode(chunks)
+    return chunk_vectors, pool(chunk_vectors)
+
+
+def embed_documents(texts, max_chunks=None):
+    """
+    Chunk several documents and encode all of their chunks in a single batched call.
+    Returns a list of chunk-vector matrices, one per document.
+    """
+    all_chunks = []
+    counts = []
+    for text in texts:
+        chunks = chunk_text(text) if max_chunks is None else chunk_text(text, max_chunks=max_chunks)
+        all_chunks.extend(chunks)
+        counts.append(len(chunks))
+    vectors = encode(all_chunks)
+    return np.split(vectors, np.cumsum(counts)[:-1]) if counts else []
+
+
+def pack_vectors(chunk_vectors):
+    """Store chunk vectors compactly as float16 bytes (768 bytes per 384-d chunk)"""
+    return np.asarray(chunk_vectors, dtype=np.float16).tobytes()
+
+
+def unpack_vectors(blob):
+    """Inverse of pack_vectors, returns a float32 (n, dim) matrix"""
+    if not blob:
+        return np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+    return np.frombuffer(bytes(blob), dtype=np.float16).reshape(-1, EMBEDDING_DIM).astype(np.float32)
+
+
+def maxsim_scores(query_vectors, doc_matrices):
+    """
+    Late-interaction (max-sim) scoring of one query against many documents.
+
+    For every query chunk take the best matching chunk of each document, then
+    average over query chunks. All documents are scored with one matrix product
+    and a segmented max, so cost is a single (q x total_chunks) matmul.
+    Documents without chunks get a score of 0.
+    """
+    scores = np.zeros(len(doc_matrices), dtype=np.float32)
+    if len(query_vectors) == 0:
+        return scores
+
+    present = [i for i, m in enumerate(doc_matrices) if len(m) > 0]
+    if not present:
+        return scores
+
+    stacked = np.concatenate([doc_matrices[i] for i in present], axis=0)
+    offsets = np.cumsum([0] + [len(doc_matrices[i]) for i in present[:-1]])
+    similarities = query_vectors @ stacked.T
+    best = np.maximum.reduceat(similarities, offsets, axis=1)
+    scores[present] = best.mean(axis=0)
+    return scores
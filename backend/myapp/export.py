@@ -0,0 +1,256 @@
+"""
+Columnar export of job postings and resumes with their embeddings.
+
+Rows are read in watermark order EXPORT_ROW_GROUP_SIZE at a time and each
+batch becomes one Parquet row group (zstd) or Arrow IPC record batch, which
+is handed on before the next is read, so memory stays bounded by the row
+group size whatever the table size. `embedding` is the pooled, normalised
+document vector from `chunk_vectors` as fixed_size_list<float32>[EMBEDDING_DIM],
+null for rows that were never embedded.
+
+Exports are incremental: an export covers the rows after `since` up to the
+table's watermark when the export started (`Export.until`); pass that back
+as `since` next time. Watermarks are opaque strings:
+
+    jobs     "<updated_at ISO 8601>|<id>"   (updated rows are exported again)
+    resumes  "<id>"                         (resumes are append-only)
+
+Used by `manage.py export_data` and the /api/export/<table>/ endpoint.
+"""
+import os
+import uuid
+from itertools import islice
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from .embeddings import EMBEDDING_DIM, pool, unpack_vectors
+
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "5000"))
+
+FORMATS = {
+    # format: (file extension, content type)
+    "parquet": ("parquet", "application/vnd.apache.parquet"),
+    "arrow": ("arrows", "application/vnd.apache.arrow.stream"),
+}
+
+_TIMESTAMP = pa.timestamp("us", tz="UTC")
+EMBEDDING_TYPE = pa.list_(pa.float32(), EMBEDDING_DIM)
+
+
+class ExportTable:
+    """A model exported with the given (field, arrow type) columns plus `embedding`"""
+
+    def __init__(self, model_name, columns, watermark_field=None):
+        self.model_name = model_name
+        self.columns = columns
+        # None: the auto-increment primary key alone is the watermark
+        self.watermark_field = watermark_field
+        self.schema = pa.schema([pa.field(name, type) for name, type in columns] + [pa.field("embedding", EMBEDDING_TYPE)])
+
+    @property
+    def model(self):
+        from . import models
+
+        return getattr(models, self.model_name)
+
+    def _order(self):
+        return [self.watermark_field, "id"] if self.watermark_field else ["id"]
+
+    def watermark(self, values):
+        """Watermark string of a row, from its _order() values"""
+        if self.watermark_field:
+            return f"{values[0].isoformat()}|{values[1]}"
+        return str(values[0])
+
+    def _after(self, watermark):
+        """Q for rows strictly after a watermark; ValueError if it is malformed"""
+        if not self.watermark_field:
+            return Q(id__gt=int(watermark))
+        mark, _, mark_id = watermark.partition("|")
+        timestamp = parse_datetime(mark)
+        if timestamp is None or not mark_id:
+            raise ValueError(f"Invalid watermark '{watermark}'")
+        return Q(**{f"{self.watermark_field}__gt": timestamp}) | Q(
+            **{self.watermark_field: timestamp, "id__gt": uuid.UUID(mark_id)}
+        )
+
+    def current_watermark(self):
+        """Watermark of the last row, or None for an empty table"""
+        last = self.model.objects.order_by(*(f"-{field}" for field in self._order())).values_list(*self._order()).first()
+        return None if last is None else self.watermark(last)
+
+    def rows(self, since=None, until=None):
+        """Column value tuples (with chunk_vectors last) in (since, until], in watermark order"""
+        queryset = self.model.objects.order_by(*self._order())
+        if since:
+            queryset = queryset.filter(self._after(since))
+        if until:
+            queryset = queryset.exclude(self._after(until))
+        fields = [name for name, _ in self.columns]
+        return queryset.values_list(*fields, "chunk_vectors").iterator(chunk_size=EXPORT_ROW_GROUP_SIZE)
+
+    def record_batch(self, rows):
+        columns = list(zip(*rows))
+        arrays = [
+            pa.array(
+                [str(value) if isinstance(value, uuid.UUID) else value for value in values], type=type
+            )
+            for values, (_, type) in zip(columns, self.columns)
+        ]
+        arrays.append(_embeddings(columns[-1]))
+        return pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+
+
+TABLES = {
+    "jobs": ExportTable(
+        "JobDescription",
+        [
+            ("id", pa.string()),
+            ("title", pa.string()),
+            ("company", pa.string()),
+            ("domain", pa.string()),
+            ("description", pa.string()),
+            ("requirements", pa.string()),
+            ("location", pa.string()),
+            ("salary", pa.decimal128(10, 2)),
+            ("created_at", _TIMESTAMP),
+            ("updated_at", _TIMESTAMP),
+            ("expires_at", _TIMESTAMP),
+            ("duplicate_of_id", pa.string()),
+        ],
+        watermark_field="updated_at",
+    ),
+    "resumes": ExportTable(
+        "Resume",
+        [
+            ("id", pa.int64()),
+            ("name", pa.string()),
+            ("text", pa.string()),
+        ],
+    ),
+}
+
+
+def _embeddings(blobs):
+    matrix = np.zeros((len(blobs), EMBEDDING_DIM), dtype=np.float32)
+    missing = np.zeros(len(blobs), dtype=bool)
+    for i, blob in enumerate(blobs):
+        if blob:
+            matrix[i] = pool(unpack_vectors(blob))
+        else:
+            missing[i] = True
+    return pa.FixedSizeListArray.from_arrays(
+        pa.array(matrix.ravel()), EMBEDDING_DIM, mask=pa.array(missing) if missing.any() else None
+    )
+
+
+class _Sink:
+    """Write-only file object the Arrow writers append to; drained after every row group"""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+class Export:
+    """
+    One export of a table. The upper watermark is fixed on creation, so rows
+    written while the export streams are left to the next one. ValueError for
+    an unknown table or format or a malformed watermark.
+    """
+
+    def __init__(self, table, format="parquet", since=None, row_group_size=EXPORT_ROW_GROUP_SIZE):
+        if table not in TABLES:
+            raise ValueError(f"Unknown table '{table}', expected one of {', '.join(TABLES)}")
+        if format not in FORMATS:
+            raise ValueError(f"Unknown format '{format}', expected one of {', '.join(FORMATS)}")
+        self.table = TABLES[table]
+        self.name = table
+        self.format = format
+        self.since = since or None
+        if self.since:
+            self.table._after(self.since)
+        self.row_group_size = row_group_size
+        self.until = self.table.current_watermark()
+        self.rows = 0
+
+    @property
+    def file_name(self):
+        extension, _ = FORMATS[self.format]
+        return f"{self.name}.{extension}"
+
+    @property
+    def content_type(self):
+        return FORMATS[self.format][1]
+
+    def chunks(self):
+        """The export file as byte strings, one per row group"""
+        sink = _Sink()
+        schema = self.table.schema
+        if self.format == "parquet":
+            writer = pq.ParquetWriter(sink, schema, compression="zstd")
+        else:
+            writer = pa.ipc.new_stream(sink, schema)
+        try:
+            rows = self.table.rows(self.since, self.until) if self.until else iter(())
+            while True:
+                batch = list(islice(rows, self.row_group_size))
+                if not batch:
+                    break
+                record_batch = self.table.record_batch(batch)
+                if self.format == "parquet":
+                    writer.write_batch(record_batch, row_group_size=len(batch))
+                else:
+                    writer.write_batch(record_batch)
+                self.rows += len(batch)
+                yield sink.drain()
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    async def achunks(self):
+        """chunks() for async views; rows are read and encoded in the sync thread, one row group at a time"""
+        chunks = self.chunks()
+        try:
+            while True:
+                chunk = await sync_to_async(next)(chunks, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            await sync_to_async(chunks.close)()
+
+    def write_to(self, path):
+        """Write the export to a file, atomically; returns the number of rows"""
+        with open(f"{path}.tmp", "wb") as f:
+            for chunk in self.chunks():
+                f.write(chunk)
+        os.replace(f"{path}.tmp", path)
+        return self.rows
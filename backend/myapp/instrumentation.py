@@ -0,0 +1,212 @@
+"""
+Lightweight request tracing and metrics.
+
+Code wraps hot paths in `span("encode")` blocks. While a request is being
+handled (see middleware.timing_middleware) every span is recorded against it
+so the response can carry a Server-Timing header and a structured log line.
+All spans and counters also feed an in-process Prometheus registry rendered
+by the /metrics endpoint.
+
+Set INSTRUMENTATION_ENABLED=0 to turn everything off; `span` then returns a
+shared no-op context manager and counters return immediately.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import wraps
+
+ENABLED = os.getenv("INSTRUMENTATION_ENABLED", "1").lower() not in ("0", "false", "no")
+
+# Upper bounds in seconds, from sub-millisecond vector math to multi-second LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NULL_SPAN = nullcontext()
+_request_spans = ContextVar("request_spans", default=None)
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in sorted(items):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_labels(key)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines += [f"{self.name}{_labels(key)} {value}" for key, value in items]
+        return lines
+
+
+class Gauge(Counter):
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+    def render(self):
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+def _labels(key):
+    if not key:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in key)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(key, escaped)) + "}"
+
+
+REQUEST_SECONDS = Histogram("jobsync_request_duration_seconds", "Time spent handling HTTP requests")
+SPAN_SECONDS = Histogram("jobsync_span_duration_seconds", "Time spent in instrumented hot paths")
+CACHE_TOTAL = Counter("jobsync_cache_total", "Cache lookups by cache and result (hit/miss)")
+RETRY_TOTAL = Counter("jobsync_retries_total", "Retries of remote calls by operation")
+EVENT_TOTAL = Counter("jobsync_events_total", "Other notable events by name")
+
+_registry = [REQUEST_SECONDS, SPAN_SECONDS, CACHE_TOTAL, RETRY_TOTAL, EVENT_TOTAL]
+
+
+def register(metric):
+    """Add a metric defined elsewhere to the /metrics output"""
+    _registry.append(metric)
+    return metric
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_span(self.name, time.perf_counter() - self.started)
+        return False
+
+
+def span(name):
+    """Time a block of code: `with span("encode"): ...`"""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def timed(name):
+    """Decorator form of span()"""
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with _Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name, seconds):
+    SPAN_SECONDS.observe(seconds, span=name)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((name, seconds))
+
+
+def cache_event(cache, hit, amount=1):
+    if ENABLED and amount:
+        CACHE_TOTAL.inc(amount, cache=cache, result="hit" if hit else "miss")
+
+
+def retry_event(operation):
+    if ENABLED:
+        RETRY_TOTAL.inc(operation=operation)
+
+
+def event(name, amount=1):
+    if ENABLED:
+        EVENT_TOTAL.inc(amount, event=name)
+
+
+def start_request():
+    """Begin collecting spans for the current request; returns a token for end_request"""
+    return _request_spans.set([])
+
+
+def end_request(token):
+    """Stop collecting spans and return them as a list of (name, seconds)"""
+    spans = _request_spans.get() or []
+    _request_spans.reset(token)
+    return spans
+
+
+def summarize(spans):
+    """Aggregate spans by name into {name: (total_seconds, count)}, preserving first-seen order"""
+    summary = {}
+    for name, seconds in spans:
+        total, count = summary.get(name, (0.0, 0))
+        summary[name] = (total + seconds, count + 1)
+    return summary
+
+
+def server_timing(summary, total_seconds):
+    """Format a Server-Timing header value"""
+    parts = [
+        f'{name};dur={total * 1000:.1f}' + (f';desc="{count}x"' if count > 1 else "")
+        for name, (total, count) in summary.items()
+    ]
+    parts.append(f"total;dur={total_seconds * 1000:.1f}")
+    return ", ".join(parts)
+
+
+def render_metrics():
+    """Render every registered metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,224 @@
+"""
+Job posting lifecycle: expiry, archival and index compaction.
+
+- Every JobDescription gets `expires_at` (JOB_POSTING_TTL_DAYS after posting
+  unless the recruiter sends one). From then on it is a tombstone: it stays
+  in the tables, but matching and listings skip it.
+- `manage.py archive_jobs` (run it from cron, or with --interval) moves
+  expired postings to cold storage in batches of ARCHIVE_BATCH_SIZE: one
+  gzipped JSON-lines file per batch under ARCHIVE_DIR with the Django row,
+  the Supabase row and its vectors, then deletes them from Supabase (or the
+  local storage backend), the mirror and the database. Postings flagged as
+  duplicates of an archived one go with it, so no duplicate is left
+  pointing nowhere (and shown as a posting of its own).
+- The in-memory job matrices (local storage backend, mirror) mask tombstoned
+  rows out of searches and rebuild themselves without them once they make up
+  INDEX_COMPACT_THRESHOLD of the rows, so search cost tracks live postings
+  when archival falls behind. Archival itself shrinks the tables, after which
+  the matrices are reloaded.
+"""
+import base64
+import gzip
+import os
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+import orjson
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from . import instrumentation
+from .instrumentation import event, span
+
+JOB_POSTING_TTL_DAYS = float(os.getenv("JOB_POSTING_TTL_DAYS", "60"))
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", str(settings.BASE_DIR / "archive"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "500"))
+# Fraction of masked rows at which a job matrix is rebuilt without them
+INDEX_COMPACT_THRESHOLD = float(os.getenv("INDEX_COMPACT_THRESHOLD", "0.2"))
+TOMBSTONE_REFRESH_SECONDS = float(os.getenv("TOMBSTONE_REFRESH_SECONDS", "30"))
+# Full re-read of the tombstones, dropping postings archived by other processes
+TOMBSTONE_RELOAD_SECONDS = float(os.getenv("TOMBSTONE_RELOAD_SECONDS", "3600"))
+# Ids per Supabase `in` filter; they all go in the URL
+ARCHIVE_FILTER_IDS = int(os.getenv("ARCHIVE_FILTER_IDS", "100"))
+
+FRAGMENTATION = instrumentation.register(
+    instrumentation.Gauge("jobsync_index_fragmentation", "Fraction of job matrix rows that are expired postings")
+)
+ARCHIVED = instrumentation.register(
+    instrumentation.Counter("jobsync_archived_jobs_total", "Expired job postings moved to cold storage")
+)
+
+
+def default_expiry():
+    return timezone.now() + timedelta(days=JOB_POSTING_TTL_DAYS)
+
+
+def live_jobs():
+    """JobDescription rows that have not expired"""
+    from .models import JobDescription
+
+    return JobDescription.objects.filter(Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()))
+
+
+_tombstones = (0, frozenset())
+_tombstones_checked = None
+_tombstones_loaded = None
+_tombstones_until = None  # expiry time up to which the set is complete
+_tombstones_lock = threading.Lock()
+
+
+def tombstones():
+    """
+    (generation, ids of expired postings not archived yet); the generation
+    changes with the set. Every TOMBSTONE_REFRESH_SECONDS only postings that
+    expired since the last check are read (expiry dates are never set in the
+    past), and every TOMBSTONE_RELOAD_SECONDS the whole set is re-read so
+    archived postings leave it. Call from sync code (use sync_to_async in views).
+    """
+    global _tombstones, _tombstones_checked, _tombstones_loaded, _tombstones_until
+    if _tombstones_checked is None or time.monotonic() - _tombstones_checked >= TOMBSTONE_REFRESH_SECONDS:
+        with _tombstones_lock:
+            if _tombstones_checked is None or time.monotonic() - _tombstones_checked >= TOMBSTONE_REFRESH_SECONDS:
+                from .models import JobDescription
+
+                full = (
+                    _tombstones_checked is None or _tombstones_loaded is None
+                    or time.monotonic() - _tombstones_loaded >= TOMBSTONE_RELOAD_SECONDS
+                )
+                now = timezone.now()
+                rows = JobDescription.objects.filter(expires_at__lte=now)
+                if not full:
+                    rows = rows.filter(expires_at__gt=_tombstones_until)
+                try:
+                    with span("db"):
+                        ids = frozenset(str(job_id) for job_id in rows.values_list("id", flat=True))
+                except Exception as e:
+                    print(f"Warning: could not load expired postings: {e}")
+                else:
+                    expired = ids if full else _tombstones[1] | ids
+                    if expired != _tombstones[1]:
+                        _tombstones = (_tombstones[0] + 1, expired)
+                    _tombstones_until = now
+                    if full:
+                        _tombstones_loaded = time.monotonic()
+                _tombstones_checked = time.monotonic()
+    return _tombstones
+
+
+class LiveMatrix:
+    """
+    Normalised job matrix whose tombstoned rows score -inf. Immutable:
+    refreshed() returns a new instance when the tombstones changed, compacted
+    (tombstoned rows dropped) once they reach INDEX_COMPACT_THRESHOLD.
+    """
+
+    def __init__(self, keys, matrix, alive=None, generation=None):
+        self.keys = keys
+        self.matrix = matrix
+        self.alive = alive  # None when every row is live
+        self.generation = generation
+
+    def refreshed(self):
+        generation, dead = tombstones()
+        if generation == self.generation:
+            return self
+        if not dead or not self.keys:
+            return LiveMatrix(self.keys, self.matrix, None, generation)
+        alive = np.fromiter((key not in dead for key in self.keys), dtype=bool, count=len(self.keys))
+        fragmentation = 1 - np.count_nonzero(alive) / len(alive)
+        if fragmentation >= INDEX_COMPACT_THRESHOLD:
+            keep = np.flatnonzero(alive)
+            print(f"🧹 Compacting job matrix: dropping {len(alive) - len(keep)} expired of {len(alive)} rows")
+            event("index_compacted")
+            FRAGMENTATION.set(0)
+            return LiveMatrix([self.keys[i] for i in keep], self.matrix[keep], None, generation)
+        FRAGMENTATION.set(round(fragmentation, 4))
+        return LiveMatrix(self.keys, self.matrix, None if alive.all() else alive, generation)
+
+    def scores(self, query):
+        scores = self.matrix @ query
+        if self.alive is not None:
+            scores[~self.alive] = -np.inf
+        return scores
+
+
+def _default(value):
+    if isinstance(value, (bytes, memoryview)):
+        return base64.b64encode(bytes(value)).decode()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Cannot archive {type(value).__name__}")
+
+
+def _write_batch(records, directory):
+    """Write one gzipped JSON-lines archive file atomically; returns its path"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"jobs-{timezone.now():%Y%m%dT%H%M%S%f}.jsonl.gz")
+    with gzip.open(f"{path}.tmp", "wb") as f:
+        for record in records:
+            f.write(orjson.dumps(record, default=_default, option=orjson.OPT_APPEND_NEWLINE))
+    os.replace(f"{path}.tmp", path)
+    return path
+
+
+def id_chunks(job_ids):
+    """Split ids for Supabase `in` filters of at most ARCHIVE_FILTER_IDS each"""
+    for start in range(0, len(job_ids), ARCHIVE_FILTER_IDS):
+        yield job_ids[start:start + ARCHIVE_FILTER_IDS]
+
+
+def archive_expired(client, batch_size=ARCHIVE_BATCH_SIZE, directory=ARCHIVE_DIR, limit=None):
+    """
+    Move expired postings to cold storage, oldest expiry first, batch by
+    batch, together with the postings flagged as their duplicates; returns
+    (postings archived, archive files written). A batch is written before
+    anything is deleted, so an interrupted run loses nothing (the next run
+    may archive a few postings a second time).
+    """
+    from .mirror import SUPABASE_MIRROR, SupabaseMirror
+    from .models import JobDescription
+    from .storage import STORAGE_BACKEND
+
+    mirror = SupabaseMirror() if SUPABASE_MIRROR and STORAGE_BACKEND == "supabase" else None
+    archived, files = 0, []
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        jobs = list(
+            JobDescription.objects.filter(expires_at__lte=timezone.now()).order_by("expires_at", "id").values()[:size]
+        )
+        if not jobs:
+            break
+        jobs += JobDescription.objects.filter(
+            duplicate_of_id__in=[job["id"] for job in jobs]
+        ).exclude(id__in=[job["id"] for job in jobs]).values()
+        job_ids = [str(job["id"]) for job in jobs]
+        remote_jobs, vectors = [], []
+        with span("supabase_read"):
+            for ids in id_chunks(job_ids):
+                remote_jobs += client.table("job_description").select("*").in_("id", ids).execute().data or []
+                vectors += client.table("vector_table").select("*").in_("job_id", ids).execute().data or []
+        remote_by_id = {str(row["id"]): row for row in remote_jobs}
+        vectors_by_job = {}
+        for row in vectors:
+            vectors_by_job.setdefault(str(row["job_id"]), []).append(row)
+        files.append(_write_batch(
+            [{"job": job, "supabase_job": remote_by_id.get(job_id), "vectors": vectors_by_job.get(job_id, [])}
+             for job, job_id in zip(jobs, job_ids)],
+            directory,
+        ))
+
+        with span("supabase_write"):
+            for ids in id_chunks(job_ids):
+                client.table("vector_table").delete().in_("job_id", ids).execute()
+                client.table("job_description").delete().in_("id", ids).execute()
+        if mirror is not None:
+            mirror.delete_jobs(job_ids)
+        JobDescription.objects.filter(id__in=job_ids).delete()
+        archived += len(job_ids)
+        ARCHIVED.inc(len(job_ids))
+        print(f"📦 Archived {len(job_ids)} expired postings to {files[-1]}")
+    return archived, files
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from myapp.lifecycle import ARCHIVE_BATCH_SIZE, ARCHIVE_DIR, archive_expired
+from myapp.models import JobDescription
+
+
+class Command(BaseCommand):
+    help = (
+        "Move expired job postings and their vectors to cold storage (gzipped JSON lines) "
+        "and delete them from Supabase, the mirror and the database"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+        parser.add_argument("--directory", default=ARCHIVE_DIR, help="Where archive files are written")
+        parser.add_argument("--limit", type=int, default=None, help="Archive at most this many postings per run")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the expired postings")
+        parser.add_argument("--interval", type=float, default=0, help="Keep running every this many seconds")
+
+    def handle(self, *args, **options):
+        from myapp.views import get_supabase_client
+
+        while True:
+            if options["dry_run"]:
+                expired = JobDescription.objects.filter(expires_at__lte=timezone.now()).count()
+                self.stdout.write(f"{expired} expired postings would be archived to {options['directory']}")
+                return
+            started = time.perf_counter()
+            archived, files = archive_expired(
+                get_supabase_client(), options["batch_size"], options["directory"], options["limit"]
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {archived} expired postings into {len(files)} files in {time.perf_counter() - started:.1f}s"
+            ))
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp.dedup import (
+    DuplicateIndex, minhash_signature, posting_text, signature_from_bytes, signature_to_bytes,
+)
+from myapp.lifecycle import id_chunks
+from myapp.models import JobDescription
+
+
+class Command(BaseCommand):
+    help = "Bulk near-duplicate pass over existing job postings: computes missing MinHash signatures and flags duplicates"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threshold", type=float, default=None, help="Override DEDUP_THRESHOLD")
+        parser.add_argument("--recompute", action="store_true", help="Recompute signatures that are already stored")
+        parser.add_argument("--dry-run", action="store_true", help="Report duplicates without saving anything")
+        parser.add_argument(
+            "--purge-vectors",
+            action="store_true",
+            help="Delete the Supabase job and vector rows of postings flagged as duplicates",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        index = DuplicateIndex() if options["threshold"] is None else DuplicateIndex(threshold=options["threshold"])
+        started = time.perf_counter()
+        scanned = flagged = signed = 0
+        pending = []
+        duplicate_ids = []
+
+        # Oldest first, so the earliest posting of a group stays canonical
+        rows = JobDescription.objects.order_by("created_at").only(
+            "id", "title", "description", "requirements", "minhash", "duplicate_of"
+        )
+        for job in rows.iterator(chunk_size=options["batch_size"]):
+            scanned += 1
+            if job.minhash and not options["recompute"]:
+                signature = signature_from_bytes(job.minhash)
+            else:
+                signature = minhash_signature(posting_text(job.title, job.description, job.requirements))
+                job.minhash = signature_to_bytes(signature)
+                signed += 1
+
+            match = index.best_match(signature)
+            if match:
+                duplicate_id, score = match
+                job.duplicate_of_id = duplicate_id
+                duplicate_ids.append(str(job.id))
+                flagged += 1
+                self.stdout.write(f"{job.id} duplicates {duplicate_id} (similarity {score:.2f})")
+            else:
+                job.duplicate_of_id = None
+                index.add(job.id, signature)
+
+            pending.append(job)
+            if len(pending) >= options["batch_size"]:
+                self._save(pending, options["dry_run"])
+                pending = []
+        self._save(pending, options["dry_run"])
+
+        if options["purge_vectors"] and duplicate_ids and not options["dry_run"]:
+            self._purge(duplicate_ids)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Scanned {scanned} postings ({signed} signed) in {elapsed:.1f}s, "
+            f"{flagged} flagged as duplicates, {len(index)} canonical"
+        ))
+
+    def _save(self, jobs, dry_run):
+        if jobs and not dry_run:
+            JobDescription.objects.bulk_update(jobs, ["minhash", "duplicate_of"])
+
+    def _purge(self, job_ids):
+        from myapp.views import get_supabase_client
+
+        client = get_supabase_client()
+        # --batch-size is for the database scan; the ids of a filter all go in the URL
+        for batch in id_chunks(job_ids):
+            client.table("vector_table").delete().in_("job_id", batch).execute()
+            client.table("job_description").delete().in_("id", batch).execute()
+        self.stdout.write(f"Removed {len(job_ids)} duplicate postings from Supabase")
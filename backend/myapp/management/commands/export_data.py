@@ -0,0 +1,63 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from myapp.export import EXPORT_ROW_GROUP_SIZE, FORMATS, TABLES, Export
+
+
+class Command(BaseCommand):
+    help = (
+        "Export job postings and resumes with their embeddings to Parquet or Arrow files, "
+        "optionally incrementally from the watermarks of the previous run"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("tables", nargs="*", help=f"Any of {', '.join(TABLES)} (default: all)")
+        parser.add_argument("--output", default="exports", help="Directory the files are written to")
+        parser.add_argument("--format", choices=FORMATS, default="parquet")
+        parser.add_argument("--row-group-size", type=int, default=EXPORT_ROW_GROUP_SIZE)
+        parser.add_argument("--since", help="Export rows after this watermark (single table only)")
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Start from the watermarks in <output>/watermarks.json and update them afterwards",
+        )
+
+    def handle(self, *args, **options):
+        tables = options["tables"] or list(TABLES)
+        if options["since"] and len(tables) != 1:
+            raise CommandError("--since needs exactly one table")
+        os.makedirs(options["output"], exist_ok=True)
+        state_path = os.path.join(options["output"], "watermarks.json")
+        watermarks = {}
+        if options["incremental"] and os.path.exists(state_path):
+            with open(state_path) as f:
+                watermarks = json.load(f)
+
+        for table in tables:
+            started = time.perf_counter()
+            try:
+                export = Export(
+                    table, options["format"], options["since"] or watermarks.get(table), options["row_group_size"]
+                )
+            except ValueError as e:
+                raise CommandError(str(e))
+            if export.until is None or export.until == export.since:
+                self.stdout.write(f"No new {table} rows")
+                continue
+            stem, extension = export.file_name.rsplit(".", 1)
+            path = os.path.join(options["output"], f"{stem}-{timezone.now():%Y%m%dT%H%M%S}.{extension}")
+            rows = export.write_to(path)
+            watermarks[table] = export.until
+            self.stdout.write(self.style.SUCCESS(
+                f"Exported {rows} {table} rows to {path} in {time.perf_counter() - started:.1f}s "
+                f"(watermark {export.until})"
+            ))
+
+        if options["incremental"]:
+            with open(f"{state_path}.tmp", "w") as f:
+                json.dump(watermarks, f, indent=2)
+            os.replace(f"{state_path}.tmp", state_path)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from myapp.embeddings import EMBEDDING_MODEL, EMBEDDING_MODEL_DIR, EMBEDDING_QUANTIZATION
+
+
+class Command(BaseCommand):
+    help = "Export the embedding model to ONNX (and an int8 dynamically quantized copy) for EMBEDDING_BACKEND=onnx/onnx-int8"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=EMBEDDING_MODEL_DIR, help="Directory to write the exported model to")
+        parser.add_argument(
+            "--quantization",
+            default=EMBEDDING_QUANTIZATION,
+            choices=["arm64", "avx2", "avx512", "avx512_vnni"],
+            help="Instruction set to target with the int8 model",
+        )
+        parser.add_argument("--skip-quantize", action="store_true", help="Only export the float32 ONNX model")
+
+    def handle(self, *args, **options):
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+        output = options["output"]
+        self.stdout.write(f"Exporting {EMBEDDING_MODEL} to ONNX in {output}...")
+        model = SentenceTransformer(EMBEDDING_MODEL, backend="onnx", device="cpu", model_kwargs={"export": True})
+        model.save_pretrained(output)
+
+        if not options["skip_quantize"]:
+            self.stdout.write(f"Quantizing to int8 for {options['quantization']}...")
+            export_dynamic_quantized_onnx_model(model, options["quantization"], output)
+
+        self.stdout.write(self.style.SUCCESS(f"Embedding model exported to {output}"))
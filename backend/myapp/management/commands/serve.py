@@ -0,0 +1,218 @@
+import gc
+import os
+import signal
+import socket
+import time
+import traceback
+
+from django.core.management.base import BaseCommand
+
+from myapp.sharedmatrix import SHARED_MATRIX_POLL_SECONDS
+
+# Each worker runs its own inference threads on top of the shared weights; scale up with WEB_CONCURRENCY
+DEFAULT_WORKERS = 2
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-fork production server: the master loads the app, the model weights and the job matrix once, "
+        "then forks uvicorn workers that share those pages copy-on-write"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8000)
+        parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "0")) or DEFAULT_WORKERS)
+        parser.add_argument("--graceful-timeout", type=float, default=30, help="Seconds workers get to finish on exit")
+        parser.add_argument("--no-preload", action="store_true", help="Let each worker load its own model")
+
+    def handle(self, *args, **options):
+        workers = max(1, options["workers"])
+        # embedding_threads() divides the CPUs between this many workers
+        os.environ["WEB_CONCURRENCY"] = str(workers)
+
+        listener = socket.socket(socket.AF_INET6 if ":" in options["host"] else socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((options["host"], options["port"]))
+        listener.listen(2048)
+        listener.set_inheritable(True)
+
+        import uvicorn
+        from django.core.asgi import get_asgi_application
+
+        application = get_asgi_application()
+
+        if not options["no_preload"]:
+            self._preload()
+        publisher, refresh = self._shared_matrix()
+
+        from django.db import connections
+
+        # Nothing opened in the master may be used by the workers
+        connections.close_all()
+        # Keep the preloaded objects out of the collector so it does not dirty their pages in the workers
+        gc.collect()
+        gc.freeze()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Serving on {options['host']}:{options['port']} with {workers} workers (master pid {os.getpid()})"
+        ))
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+        signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+
+        children = {}
+        next_refresh = 0.0
+        try:
+            while not stopping:
+                while len(children) < workers:
+                    children[self._spawn(uvicorn, application, listener, options)] = time.monotonic()
+                pid, status = os.waitpid(-1, os.WNOHANG)
+                if pid in children:
+                    started = children.pop(pid)
+                    print(f"⚠️ Worker {pid} exited with status {status}, respawning")
+                    if time.monotonic() - started < 1:
+                        # Crash loop guard
+                        time.sleep(1)
+                if refresh is not None and time.monotonic() >= next_refresh:
+                    refresh()
+                    next_refresh = time.monotonic() + SHARED_MATRIX_POLL_SECONDS
+                time.sleep(0.2)
+        finally:
+            self._shutdown(children, options["graceful_timeout"])
+            if publisher is not None:
+                publisher.close()
+            listener.close()
+
+    def _preload(self):
+        from myapp import views  # noqa: F401 (module-level clients, caches and metrics)
+        from myapp.compression import load_dictionaries
+        from myapp.typeahead import get_typeahead_index
+
+        load_dictionaries()
+        try:
+            get_typeahead_index()
+        except Exception as e:
+            print(f"Warning: typeahead index not preloaded ({e})")
+        self._preload_models()
+
+    def _preload_models(self):
+        """
+        Master side: load the torch weights, but run no inference. Threads
+        started before the fork (OpenMP, ONNX Runtime sessions) would be
+        missing in the workers, so torch stays single-threaded here.
+        """
+        from myapp.embeddings import EMBEDDING_BACKEND, preload_model
+        from myapp.ranking import CROSS_ENCODER_BACKEND, get_cross_encoder
+
+        if EMBEDDING_BACKEND != "torch":
+            # ONNX Runtime sessions own thread pools, which do not survive fork
+            print(f"Embedding backend '{EMBEDDING_BACKEND}' is loaded by each worker")
+            return
+        started = time.perf_counter()
+        try:
+            preload_model()
+        except ImportError as e:
+            print(f"Warning: embedding model not preloaded ({e})")
+            return
+        if CROSS_ENCODER_BACKEND == "torch":
+            get_cross_encoder()
+        print(f"✅ Model weights preloaded in {time.perf_counter() - started:.1f}s")
+
+    def _load_models(self):
+        """Worker side, after the fork: set the inference threads, then warm the models up"""
+        from myapp.embeddings import EMBEDDING_BACKEND, encode, set_inference_threads
+        from myapp.ranking import warm_cross_encoder
+
+        started = time.perf_counter()
+        try:
+            if EMBEDDING_BACKEND == "torch":
+                set_inference_threads()
+            # Loads the model when the master did not (ONNX, --no-preload), and runs the first inference
+            encode(["warm up"])
+        except ImportError as e:
+            print(f"Warning: embedding model not loaded ({e})")
+        else:
+            print(f"✅ Worker {os.getpid()} warmed up in {time.perf_counter() - started:.1f}s")
+        warm_cross_encoder()
+
+    def _shared_matrix(self):
+        """(publisher, refresh) for the job matrix source this deployment reads locally, or (None, None)"""
+        from myapp import sharedmatrix
+        from myapp.mirror import MIRROR_VECTOR_INDEX, SUPABASE_MIRROR, SupabaseMirror
+        from myapp.storage import STORAGE_BACKEND, LocalStore
+
+        # Separate instances, so the master's SQLite connections are never used by a worker
+        if STORAGE_BACKEND == "local":
+            store = LocalStore()
+
+            def version():
+                return f"storage:{store.version('vector_table')}"
+
+            def load():
+                return store.load_matrix("vector_table", "job_id")
+        elif SUPABASE_MIRROR and MIRROR_VECTOR_INDEX == "exact":
+            mirror = SupabaseMirror()
+
+            def version():
+                return f"mirror:{mirror.version()}"
+
+            load = mirror.exact_matrix
+        else:
+            print("No local job vectors (STORAGE_BACKEND=local or SUPABASE_MIRROR=1), shared matrix disabled")
+            return None, None
+
+        publisher = sharedmatrix.MatrixPublisher()
+        # Workers are forked after this, so they see the prefix
+        sharedmatrix.SHARED_MATRIX_PREFIX = os.environ["SHARED_MATRIX_PREFIX"] = publisher.prefix
+
+        def refresh():
+            try:
+                current = version()
+                if current != publisher.version:
+                    started = time.perf_counter()
+                    ids, matrix = load()
+                    publisher.publish(current, ids, matrix)
+                    print(f"✅ Published {len(ids)} job vectors ({matrix.nbytes / 2**20:.1f} MB) "
+                          f"to shared memory in {time.perf_counter() - started:.2f}s")
+            except Exception as e:
+                print(f"❌ Shared matrix refresh failed: {e}")
+
+        refresh()
+        return publisher, refresh
+
+    def _spawn(self, uvicorn, application, listener, options):
+        pid = os.fork()
+        if pid:
+            return pid
+        # Worker
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        try:
+            self._load_models()
+            config = uvicorn.Config(application, lifespan="off", timeout_graceful_shutdown=options["graceful_timeout"])
+            uvicorn.Server(config).run(sockets=[listener])
+        except BaseException:
+            traceback.print_exc()
+            os._exit(1)
+        os._exit(0)
+
+    def _shutdown(self, children, graceful_timeout):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + graceful_timeout
+        while children and time.monotonic() < deadline:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+            if pid:
+                children.pop(pid, None)
+            else:
+                time.sleep(0.1)
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ChildProcessError, ProcessLookupError):
+                pass
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp.mirror import MIRROR_POLL_SECONDS, SupabaseMirror, sync_forever
+
+
+class Command(BaseCommand):
+    help = "Sync the local read mirror of job_description and vector_table from Supabase"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Re-copy everything, dropping rows deleted upstream")
+        parser.add_argument("--loop", action="store_true", help="Keep polling (for a dedicated sync process)")
+        parser.add_argument("--poll-seconds", type=float, default=MIRROR_POLL_SECONDS)
+
+    def handle(self, *args, **options):
+        from myapp.views import get_supabase_client
+
+        mirror = SupabaseMirror()
+        started = time.perf_counter()
+        copied = mirror.sync(get_supabase_client(), full=options["full"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Mirror synced in {time.perf_counter() - started:.1f}s: "
+            + ", ".join(f"{table} {rows} rows" for table, rows in copied.items())
+        ))
+        if options["loop"]:
+            sync_forever(mirror, get_supabase_client, options["poll_seconds"])
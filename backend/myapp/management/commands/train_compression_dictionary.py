@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from myapp.compression import (
+    COMPRESSION_TRAINING_SAMPLES,
+    compressed_fields,
+    recompress,
+    train_dictionary,
+    training_samples,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Train new zstd dictionaries for the compressed text columns on their newest rows "
+        "and optionally recompress the existing rows with them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("groups", nargs="*", help="Dictionary groups to train (default: all)")
+        parser.add_argument("--samples", type=int, default=COMPRESSION_TRAINING_SAMPLES, help="Rows to train on")
+        parser.add_argument(
+            "--recompress",
+            action="store_true",
+            help="Rewrite the rows not compressed with the newest dictionary (run VACUUM afterwards to shrink SQLite)",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        groups = compressed_fields()
+        unknown = set(options["groups"]) - set(groups)
+        if unknown:
+            raise CommandError(
+                f"Unknown dictionary groups {', '.join(sorted(unknown))}, expected any of {', '.join(groups)}"
+            )
+
+        for name in options["groups"] or list(groups):
+            samples = [
+                text for model, fields in groups[name] for text in training_samples(model, fields, options["samples"])
+            ]
+            dict_id = train_dictionary(name, samples)
+            if dict_id is None:
+                self.stdout.write(f"Not enough {name} texts to train a dictionary ({len(samples)} samples)")
+                continue
+            self.stdout.write(self.style.SUCCESS(f"Trained {name} dictionary {dict_id} on {len(samples)} samples"))
+            if options["recompress"]:
+                for model, fields in groups[name]:
+                    started = time.perf_counter()
+                    rewritten = recompress(model, fields, options["batch_size"])
+                    self.stdout.write(
+                        f"Recompressed {rewritten} {model.__name__} rows in {time.perf_counter() - started:.1f}s"
+                    )
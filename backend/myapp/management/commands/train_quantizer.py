@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from myapp.mirror import SupabaseMirror
+from myapp.quantization import PQ_SUBSPACES, PQ_TRAIN_ITERATIONS, PQ_TRAIN_SAMPLE
+
+
+class Command(BaseCommand):
+    help = "Train product-quantization codebooks on the mirrored job vectors and encode them (MIRROR_VECTOR_INDEX=pq)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subspaces", type=int, default=PQ_SUBSPACES, help="Bytes per code")
+        parser.add_argument("--sample", type=int, default=PQ_TRAIN_SAMPLE, help="Vectors used for k-means")
+        parser.add_argument("--iterations", type=int, default=PQ_TRAIN_ITERATIONS)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        quantizer, encoded = SupabaseMirror().train_quantizer(
+            subspaces=options["subspaces"], sample=options["sample"], iterations=options["iterations"]
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Trained {quantizer.subspaces}x256 codebooks and encoded {encoded} vectors "
+            f"in {time.perf_counter() - started:.1f}s ({quantizer.subspaces} bytes per vector)"
+        ))
@@ -0,0 +1,58 @@
+import json
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.utils.decorators import sync_and_async_middleware
+
+from . import instrumentation
+
+logger = logging.getLogger("myapp.requests")
+
+
+def _finish(request, response, spans, seconds):
+    view = getattr(request.resolver_match, "url_name", None) or "unmatched"
+    instrumentation.REQUEST_SECONDS.observe(seconds, view=view, method=request.method, status=response.status_code)
+    summary = instrumentation.summarize(spans)
+    response["Server-Timing"] = instrumentation.server_timing(summary, seconds)
+    logger.info(json.dumps({
+        "event": "request",
+        "method": request.method,
+        "path": request.path,
+        "view": view,
+        "status": response.status_code,
+        "duration_ms": round(seconds * 1000, 2),
+        "spans": {name: {"ms": round(total * 1000, 2), "count": count} for name, (total, count) in summary.items()},
+    }))
+    return response
+
+
+@sync_and_async_middleware
+def timing_middleware(get_response):
+    """
+    Collect instrumentation spans per request and report them as a
+    Server-Timing header, a structured log line and request latency metrics.
+    """
+    if not instrumentation.ENABLED:
+        return get_response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = instrumentation.start_request()
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                spans = instrumentation.end_request(token)
+            return _finish(request, response, spans, time.perf_counter() - started)
+    else:
+        def middleware(request):
+            token = instrumentation.start_request()
+            started = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                spans = instrumentation.end_request(token)
+            return _finish(request, response, spans, time.perf_counter() - started)
+
+    return middleware
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0003_remove_jobdescription_recruiter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="jobdescription",
+            name="chunk_vectors",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="resume",
+            name="chunk_vectors",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0004_resume_chunk_vectors_jobdescription_chunk_vectors"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="jobdescription",
+            name="minhash",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="jobdescription",
+            name="duplicate_of",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="duplicates",
+                to="myapp.jobdescription",
+            ),
+        ),
+    ]
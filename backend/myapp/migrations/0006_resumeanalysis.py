@@ -0,0 +1,43 @@
+# Generated by Django 5.1.4 on 2026-10-19 17:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0005_jobdescription_minhash_jobdescription_duplicate_of"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResumeAnalysis",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("key", models.CharField(max_length=64)),
+                ("payload", models.JSONField(blank=True, null=True)),
+                ("resume_vector", models.BinaryField()),
+                ("min_similarity", models.FloatField()),
+                ("stale", models.BooleanField(default=False)),
+                ("computed_at", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "resume",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="analysis",
+                        to="myapp.resume",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-19 17:34
+
+from datetime import timedelta
+
+import myapp.lifecycle
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_expiry(apps, schema_editor):
+    # Existing postings get a full JOB_POSTING_TTL_DAYS from the migration: counting from
+    # created_at would expire (and archive) every posting older than the TTL at once
+    JobDescription = apps.get_model("myapp", "JobDescription")
+    JobDescription.objects.update(
+        expires_at=timezone.now() + timedelta(days=myapp.lifecycle.JOB_POSTING_TTL_DAYS)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0006_resumeanalysis"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="jobdescription",
+            name="expires_at",
+            field=models.DateTimeField(
+                blank=True,
+                db_index=True,
+                default=myapp.lifecycle.default_expiry,
+                null=True,
+            ),
+        ),
+        migrations.RunPython(backfill_expiry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.1.4 on 2026-10-19 17:45
+
+import myapp.compression
+from django.db import migrations, models
+from django.db.models import Value
+
+COMPRESSED = [
+    # (dictionary group, model, fields)
+    ("resume", "Resume", ["text"]),
+    ("job", "JobDescription", ["description", "requirements"]),
+]
+
+
+def compress_texts(apps, schema_editor):
+    # The columns still hold the old text: train each group's first dictionary
+    # on it, then write every row back compressed
+    CompressionDictionary = apps.get_model("myapp", "CompressionDictionary")
+    for name, model_name, fields in COMPRESSED:
+        model = apps.get_model("myapp", model_name)
+        myapp.compression.train_dictionary(
+            name, myapp.compression.training_samples(model, fields), model=CompressionDictionary
+        )
+        myapp.compression.recompress(model, fields)
+
+
+def decompress_texts(apps, schema_editor):
+    for _, model_name, fields in COMPRESSED:
+        model = apps.get_model("myapp", model_name)
+        for pk, *values in list(model.objects.values_list("pk", *fields)):
+            model.objects.filter(pk=pk).update(**{
+                name: None if value is None else Value(str(value), output_field=models.TextField())
+                for name, value in zip(fields, values)
+            })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("myapp", "0007_jobdescription_expires_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CompressionDictionary",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=32)),
+                ("dict_id", models.PositiveIntegerField(unique=True)),
+                ("data", models.BinaryField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="jobdescription",
+            name="description",
+            field=myapp.compression.CompressedTextField(dictionary="job"),
+        ),
+        migrations.AlterField(
+            model_name="jobdescription",
+            name="requirements",
+            field=myapp.compression.CompressedTextField(blank=True, dictionary="job", null=True),
+        ),
+        migrations.AlterField(
+            model_name="resume",
+            name="text",
+            field=myapp.compression.CompressedTextField(dictionary="resume"),
+        ),
+        migrations.RunPython(compress_texts, decompress_texts),
+    ]
@@ -0,0 +1,510 @@
+"""
+Local read mirror of the Supabase `job_description` and `vector_table` tables.
+
+A background thread polls Supabase for rows changed since the last
+watermark, (watermark column, id), in batches of MIRROR_BATCH_SIZE. It
+writes them to a SQLite file shared by the workers on the host; one worker
+at a time syncs, holding a lease. Read endpoints are then served from the
+mirror, and vector matching runs locally on an in-memory NumPy matrix:
+
+- fresh mirror (synced within MIRROR_MAX_STALENESS seconds): local read
+- stale or never synced: Supabase, through a circuit breaker
+- Supabase failing or circuit open: the stale mirror if there is one
+
+With MIRROR_VECTOR_INDEX=pq and a quantizer trained by
+`manage.py train_quantizer`, only 48-byte PQ codes are held in memory and
+the exact vectors of the best candidates are read back from the file for
+re-ranking (see quantization.py).
+
+Watermarks need a column that changes on every write (an `updated_at`
+maintained by a trigger); deletes are only picked up by
+`manage.py sync_mirror --full`. Enable with SUPABASE_MIRROR=1.
+"""
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import numpy as np
+import orjson
+from django.conf import settings
+
+from . import instrumentation
+from .clients import run_cpu
+from .instrumentation import event, span
+from .lifecycle import LiveMatrix, tombstones
+from .quantization import PQ_RERANK, PQIndex, ProductQuantizer
+from .sharedmatrix import shared_snapshot
+from .storage import STORAGE_BACKEND
+
+SUPABASE_MIRROR = os.getenv("SUPABASE_MIRROR", "0") in ("1", "true")
+MIRROR_DB = os.getenv("MIRROR_DB", str(settings.BASE_DIR / "mirror.sqlite3"))
+MIRROR_POLL_SECONDS = float(os.getenv("MIRROR_POLL_SECONDS", "15"))
+MIRROR_BATCH_SIZE = int(os.getenv("MIRROR_BATCH_SIZE", "1000"))
+MIRROR_MAX_STALENESS = float(os.getenv("MIRROR_MAX_STALENESS", "120"))
+# "exact": float32 matrix in memory; "pq": product-quantized codes + exact re-rank
+MIRROR_VECTOR_INDEX = os.getenv("MIRROR_VECTOR_INDEX", "exact")
+MIRROR_WATERMARKS = os.getenv("MIRROR_WATERMARKS", "job_description=updated_at,vector_table=updated_at")
+BREAKER_FAILURES = int(os.getenv("SUPABASE_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("SUPABASE_BREAKER_RESET_SECONDS", "30"))
+
+STALENESS = instrumentation.register(
+    instrumentation.Gauge("jobsync_mirror_staleness_seconds", "Seconds since the local mirror last caught up")
+)
+MIRRORED_ROWS = instrumentation.register(
+    instrumentation.Counter("jobsync_mirror_rows_total", "Rows copied into the local mirror by table")
+)
+CIRCUIT_OPEN = instrumentation.register(
+    instrumentation.Gauge("jobsync_circuit_open", "1 while a circuit breaker is open")
+)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive errors. While open, calls are refused;
+    after `reset_seconds` a single trial call is let through (half-open) and
+    its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, name, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._trial = False
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if not self._trial and time.monotonic() - self._opened_at >= self.reset_seconds:
+                self._trial = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._trial = False
+            if self._opened_at is not None:
+                self._opened_at = None
+                CIRCUIT_OPEN.set(0, breaker=self.name)
+                print(f"✅ Circuit '{self.name}' closed")
+
+    def abandon(self):
+        """The call ended without a verdict (e.g. cancelled): let another trial through"""
+        with self._lock:
+            self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._trial or (self._opened_at is None and self._consecutive >= self.failures):
+                self._opened_at = time.monotonic()
+                self._trial = False
+                CIRCUIT_OPEN.set(1, breaker=self.name)
+                print(f"❌ Circuit '{self.name}' open after {self._consecutive} failures")
+
+
+supabase_breaker = CircuitBreaker("supabase")
+
+
+def parse_watermarks(value):
+    return dict(item.strip().split("=") for item in value.split(",") if item.strip())
+
+
+def _embedding(value):
+    """pgvector columns come back from PostgREST as '[0.1,...]' strings"""
+    if isinstance(value, str):
+        value = orjson.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+class SupabaseMirror:
+    def __init__(self, path=MIRROR_DB, watermarks=None):
+        self.path = path
+        self.watermarks = watermarks or parse_watermarks(MIRROR_WATERMARKS)
+        self._local = threading.local()
+        self._vectors_lock = threading.Lock()
+        self._vectors = (None, [], None)
+        self._quantizer = (None, None)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS job_description (
+                    id TEXT PRIMARY KEY, domain TEXT, watermark TEXT, data BLOB NOT NULL);
+                CREATE INDEX IF NOT EXISTS job_description_domain ON job_description (domain);
+                CREATE TABLE IF NOT EXISTS vector_table (
+                    id TEXT PRIMARY KEY, job_id TEXT, watermark TEXT, embedding BLOB NOT NULL, pq_code BLOB);
+                CREATE TABLE IF NOT EXISTS quantizer (name TEXT PRIMARY KEY, codebooks BLOB NOT NULL);
+                CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE IF NOT EXISTS lease (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+                """
+            )
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(vector_table)")}
+            if "pq_code" not in columns:
+                # Mirror files created before PQ support
+                connection.execute("ALTER TABLE vector_table ADD COLUMN pq_code BLOB")
+            self._local.connection = connection
+        return connection
+
+    # -- metadata ---------------------------------------------------------
+
+    def _get(self, key):
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set(self, connection, key, value):
+        connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def version(self):
+        """Changes whenever mirrored rows change"""
+        return self._get("version")
+
+    def synced_at(self):
+        value = self._get("synced_at")
+        return None if value is None else float(value)
+
+    def staleness(self):
+        synced_at = self.synced_at()
+        return float("inf") if synced_at is None else time.time() - synced_at
+
+    def ready(self):
+        """Synced at least once"""
+        return self.synced_at() is not None
+
+    def serving(self):
+        staleness = self.staleness()
+        if staleness != float("inf"):
+            STALENESS.set(round(staleness, 3))
+        return staleness <= MIRROR_MAX_STALENESS
+
+    # -- sync -------------------------------------------------------------
+
+    def acquire_lease(self, owner, seconds):
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO lease (name, owner, expires) VALUES ('sync', ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+            "WHERE lease.expires < ? OR lease.owner = excluded.owner",
+            (owner, now + seconds, now),
+        )
+        return cursor.rowcount == 1
+
+    def _fetch(self, client, table, column, mark, mark_id, batch_size):
+        query = client.table(table).select("*")
+        if mark is not None:
+            query = query.or_(f'{column}.gt."{mark}",and({column}.eq."{mark}",id.gt."{mark_id}")')
+        return query.order(column).order("id").limit(batch_size).execute().data or []
+
+    def _store(self, connection, table, column, rows):
+        if table == "job_description":
+            connection.executemany(
+                "INSERT OR REPLACE INTO job_description (id, domain, watermark, data) VALUES (?, ?, ?, ?)",
+                [(str(row["id"]), row.get("domain"), row.get(column), orjson.dumps(row)) for row in rows],
+            )
+        elif table == "vector_table":
+            embeddings = np.vstack([_embedding(row["embedding"]) for row in rows])
+            quantizer = self.quantizer()
+            codes = quantizer.encode(embeddings) if quantizer else [None] * len(rows)
+            connection.executemany(
+                "INSERT OR REPLACE INTO vector_table (id, job_id, watermark, embedding, pq_code) VALUES (?, ?, ?, ?, ?)",
+                [(str(row["id"]), str(row.get("job_id")), row.get(column), embedding.tobytes(),
+                  None if code is None else code.tobytes())
+                 for row, embedding, code in zip(rows, embeddings, codes)],
+            )
+        else:
+            raise ValueError(f"Table '{table}' is not mirrored")
+
+    def sync_table(self, client, table, column, batch_size=MIRROR_BATCH_SIZE):
+        """Copy the rows changed since the table's watermark; returns the number of rows"""
+        connection = self._connection()
+        mark, mark_id = self._get(f"watermark:{table}"), self._get(f"watermark_id:{table}")
+        copied = 0
+        while True:
+            with span("mirror_fetch"):
+                rows = self._fetch(client, table, column, mark, mark_id, batch_size)
+            if not rows:
+                break
+            mark, mark_id = rows[-1].get(column), str(rows[-1]["id"])
+            if mark is None:
+                # Without it every poll would copy the first batch again
+                raise ValueError(f"{table} rows have no '{column}' watermark, check MIRROR_WATERMARKS")
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._store(connection, table, column, rows)
+                self._set(connection, f"watermark:{table}", mark)
+                self._set(connection, f"watermark_id:{table}", mark_id)
+                self._set(connection, "version", uuid.uuid4().hex)
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            copied += len(rows)
+            MIRRORED_ROWS.inc(len(rows), table=table)
+            if len(rows) < batch_size:
+                break
+        return copied
+
+    def sync(self, client, full=False):
+        """Bring every mirrored table up to date; `full` re-copies from scratch, dropping deleted rows"""
+        connection = self._connection()
+        if full:
+            connection.execute("BEGIN IMMEDIATE")
+            for table in self.watermarks:
+                connection.execute(f"DELETE FROM {table}")
+            connection.execute("DELETE FROM meta")
+            connection.execute("COMMIT")
+        copied = {table: self.sync_table(client, table, column) for table, column in self.watermarks.items()}
+        self._set(connection, "synced_at", repr(time.time()))
+        self.serving()
+        return copied
+
+    # -- reads ------------------------------------------------------------
+
+    def delete_jobs(self, job_ids):
+        """Drop jobs and their vectors, e.g. after archival (deletes upstream are not synced)"""
+        connection = self._connection()
+        placeholders = ",".join("?" * len(job_ids))
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(f"DELETE FROM vector_table WHERE job_id IN ({placeholders})", job_ids)
+            connection.execute(f"DELETE FROM job_description WHERE id IN ({placeholders})", job_ids)
+            self._set(connection, "version", uuid.uuid4().hex)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def jobs_by_domain(self, domain):
+        rows = self._connection().execute("SELECT data FROM job_description WHERE domain = ?", (domain,))
+        return [orjson.loads(data) for data, in rows]
+
+    def domains(self):
+        rows = self._connection().execute("SELECT DISTINCT domain FROM job_description WHERE domain IS NOT NULL")
+        return [domain for domain, in rows if domain]
+
+    # -- vectors ----------------------------------------------------------
+
+    def quantizer(self):
+        """The trained ProductQuantizer, or None"""
+        row = self._connection().execute("SELECT codebooks FROM quantizer WHERE name = 'jobs'").fetchone()
+        if row is None:
+            return None
+        blob = bytes(row[0])
+        if self._quantizer[0] != blob:
+            self._quantizer = (blob, ProductQuantizer.from_bytes(blob))
+        return self._quantizer[1]
+
+    def train_quantizer(self, subspaces=None, batch_size=10000, **fit_options):
+        """Train PQ codebooks on the mirrored vectors and encode every row"""
+        connection = self._connection()
+        rowids, embeddings = self._embeddings()
+        if len(rowids) == 0:
+            raise ValueError("The mirror has no vectors to train on")
+        options = {"subspaces": subspaces} if subspaces else {}
+        quantizer = ProductQuantizer(embeddings.shape[1], **options).fit(embeddings, **fit_options)
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT OR REPLACE INTO quantizer (name, codebooks) VALUES ('jobs', ?)", (quantizer.to_bytes(),)
+            )
+            for start in range(0, len(rowids), batch_size):
+                codes = quantizer.encode(embeddings[start:start + batch_size])
+                connection.executemany(
+                    "UPDATE vector_table SET pq_code = ? WHERE rowid = ?",
+                    [(code.tobytes(), int(rowid)) for code, rowid in zip(codes, rowids[start:start + batch_size])],
+                )
+            self._set(connection, "version", uuid.uuid4().hex)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return quantizer, len(rowids)
+
+    def _embeddings(self, rowids=None):
+        """(rowids, float32 matrix) of all mirrored vectors, or of the given rows in that order"""
+        connection = self._connection()
+        if rowids is None:
+            rows = connection.execute("SELECT rowid, embedding FROM vector_table").fetchall()
+        else:
+            wanted = [int(rowid) for rowid in rowids]
+            found = dict(connection.execute(
+                f"SELECT rowid, embedding FROM vector_table WHERE rowid IN ({','.join('?' * len(wanted))})", wanted
+            ).fetchall())
+            rows = [(rowid, found[rowid]) for rowid in wanted]
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.float32)
+        return (
+            np.fromiter((rowid for rowid, _ in rows), dtype=np.int64, count=len(rows)),
+            np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows]),
+        )
+
+    def _vector_index(self):
+        """
+        (job ids, index) for the current mirror version, where index is a
+        LiveMatrix or a PQIndex. Reloaded after every sync.
+        """
+        version = self.version()
+        with self._vectors_lock:
+            if self._vectors[0] == version and self._vectors[2] is not None:
+                index = self._vectors[2]
+                if isinstance(index, LiveMatrix):
+                    # Compaction can drop rows, so the ids come from the matrix
+                    index = index.refreshed()
+                    self._vectors = (version, index.keys, index)
+                return self._vectors[1], index
+            join = "FROM vector_table v JOIN job_description j ON j.id = v.job_id"
+            quantizer = self.quantizer() if MIRROR_VECTOR_INDEX == "pq" else None
+            if quantizer is not None:
+                rows = self._connection().execute(f"SELECT v.job_id, v.rowid, v.pq_code, v.embedding {join}").fetchall()
+                job_ids = [job_id for job_id, _, _, _ in rows]
+                rowids = np.fromiter((rowid for _, rowid, _, _ in rows), dtype=np.int64, count=len(rows))
+                codes = np.zeros((len(rows), quantizer.subspaces), dtype=np.uint8)
+                for i, (_, _, code, embedding) in enumerate(rows):
+                    # Rows synced before the quantizer existed are encoded on load
+                    codes[i] = (np.frombuffer(code, dtype=np.uint8) if code is not None
+                                else quantizer.encode(np.frombuffer(embedding, dtype=np.float32)[None])[0])
+                del rows
+                index = PQIndex(quantizer, codes, lambda positions: self._embeddings(rowids[positions])[1])
+            else:
+                # Under `manage.py serve` the master has usually published this version already
+                index = LiveMatrix(*(shared_snapshot(f"mirror:{version}") or self.exact_matrix())).refreshed()
+                job_ids = index.keys
+            self._vectors = (version, job_ids, index)
+            return job_ids, index
+
+    def exact_matrix(self):
+        """(job ids, normalised float32 matrix) of every mirrored vector whose job is mirrored"""
+        rows = self._connection().execute(
+            "SELECT v.job_id, v.embedding FROM vector_table v JOIN job_description j ON j.id = v.job_id"
+        ).fetchall()
+        job_ids = [job_id for job_id, _ in rows]
+        if not rows:
+            return job_ids, np.zeros((0, 0), dtype=np.float32)
+        matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+        return job_ids, matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    def match_jobs(self, query_embedding, match_threshold, match_count):
+        """Local match_filtered_job_descriptions: jobs by cosine similarity above the threshold, best first"""
+        job_ids, index = self._vector_index()
+        if not job_ids:
+            return []
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        count = min(match_count, len(job_ids))
+        if isinstance(index, PQIndex):
+            # PQ codes are not compacted; expired jobs are dropped from a larger candidate list
+            _, dead = tombstones()
+            top, top_scores = index.search(query, min(count + len(dead), len(job_ids)), rerank=PQ_RERANK)
+            live = [i for i, position in enumerate(top) if job_ids[position] not in dead][:count]
+            top, top_scores = top[live], top_scores[live]
+        else:
+            scores = index.scores(query)
+            top = np.argpartition(-scores, count - 1)[:count]
+            top = top[np.argsort(-scores[top])]
+            top_scores = scores[top]
+        ranked = [(job_ids[i], float(score)) for i, score in zip(top, top_scores) if score > match_threshold]
+        placeholders = ",".join("?" * len(ranked))
+        data = dict(self._connection().execute(
+            f"SELECT id, data FROM job_description WHERE id IN ({placeholders})", [job_id for job_id, _ in ranked]
+        ).fetchall())
+        return [dict(orjson.loads(data[job_id]), similarity=score) for job_id, score in ranked if job_id in data]
+
+
+def sync_forever(mirror, client_factory, poll_seconds=MIRROR_POLL_SECONDS):
+    """Poll loop; only the worker holding the lease syncs, the others just read the shared file"""
+    owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+    client = None
+    while True:
+        try:
+            if mirror.acquire_lease(owner, poll_seconds * 3) and supabase_breaker.allow():
+                client = client or client_factory()
+                try:
+                    copied = mirror.sync(client)
+                except Exception as e:
+                    supabase_breaker.failure()
+                    print(f"❌ Mirror sync failed: {e}")
+                else:
+                    supabase_breaker.success()
+                    if any(copied.values()):
+                        print(f"🔄 Mirror synced {copied}")
+            mirror.serving()
+        except Exception as e:
+            # Keep polling: a dead thread would leave the mirror stale for good
+            print(f"❌ Mirror sync loop error: {e}")
+        time.sleep(poll_seconds)
+
+
+_mirror = None
+_mirror_lock = threading.Lock()
+
+
+def _supabase_client():
+    from supabase import create_client
+
+    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_KEY"))
+
+
+def get_mirror():
+    """The process-wide mirror with its poll thread started, or None when disabled"""
+    global _mirror
+    if not SUPABASE_MIRROR or STORAGE_BACKEND == "local":
+        # With the local storage backend the data is already on this host
+        return None
+    if _mirror is None:
+        with _mirror_lock:
+            if _mirror is None:
+                mirror = SupabaseMirror()
+                threading.Thread(
+                    target=sync_forever, args=(mirror, _supabase_client), name="supabase-mirror", daemon=True
+                ).start()
+                _mirror = mirror
+    return _mirror
+
+
+async def read_through(local, remote):
+    """
+    Serve a read from the mirror when it is fresh. Otherwise ask Supabase
+    through the circuit breaker and fall back to the stale mirror if that fails.
+    `local(mirror)` runs on the CPU executor, `remote()` is a coroutine function.
+    """
+    mirror = get_mirror()
+    if mirror is not None and mirror.serving():
+        event("mirror_read")
+        return await run_cpu(local, mirror)
+    if supabase_breaker.allow():
+        try:
+            result = await remote()
+        except Exception as e:
+            supabase_breaker.failure()
+            if mirror is None or not mirror.ready():
+                raise
+            print(f"❌ Supabase read failed ({e}), serving the stale mirror")
+        except BaseException:
+            # Cancelled, e.g. the client went away: says nothing about Supabase
+            supabase_breaker.abandon()
+            raise
+        else:
+            supabase_breaker.success()
+            return result
+    elif mirror is None or not mirror.ready():
+        raise CircuitOpenError("Supabase is unavailable (circuit open)")
+    event("mirror_stale_read")
+    return await run_cpu(local, mirror)
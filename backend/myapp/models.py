@@ -1,14 +1,39 @@
 from django.db import models
 import uuid
 
+from .compression import CompressedTextField, CompressedTextManager
+from .lifecycle import default_expiry
+
 class Resume(models.Model):
     name = models.CharField(max_length=255)
-    text = models.TextField()
+    text = CompressedTextField(dictionary="resume")
+    # float16 chunk embeddings, see embeddings.pack_vectors
+    chunk_vectors = models.BinaryField(blank=True, null=True)
+
+    objects = CompressedTextManager()
 
     def __str__(self):
         return self.name
 
 
+class ResumeAnalysis(models.Model):
+    """analyze_resume result precomputed after upload, see precompute.py"""
+    resume = models.OneToOneField(Resume, on_delete=models.CASCADE, related_name='analysis')
+    # analysis_key(): resume text and models; another key means the result is out of date
+    key = models.CharField(max_length=64)
+    payload = models.JSONField(blank=True, null=True)  # None while running
+    # Pooled float32 resume embedding and the similarity of its weakest match:
+    # a new job scoring at or above it would have been matched, so the result goes stale
+    resume_vector = models.BinaryField()
+    min_similarity = models.FloatField()
+    stale = models.BooleanField(default=False)
+    computed_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Analysis of {self.resume.name}"
+
+
 class JobRecruiter(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     uuid = models.UUIDField(unique=True, default=uuid.uuid4, editable=False)
@@ -23,18 +48,36 @@ class JobDescription(models.Model):
     title = models.CharField(max_length=255)
     company = models.CharField(max_length=255)
     domain = models.CharField(max_length=255)
-    description = models.TextField()
-    requirements = models.TextField(blank=True, null=True)
+    description = CompressedTextField(dictionary="job")
+    requirements = CompressedTextField(dictionary="job", blank=True, null=True)
     location = models.CharField(max_length=255, blank=True, null=True)
     salary = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     contact_info = models.TextField(default="")
     application_link = models.TextField(default="")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Hidden from matching once past, then archived, see lifecycle.py
+    expires_at = models.DateTimeField(default=default_expiry, null=True, blank=True, db_index=True)
+    chunk_vectors = models.BinaryField(blank=True, null=True)
+    # MinHash signature for near-duplicate detection, see dedup.py
+    minhash = models.BinaryField(blank=True, null=True)
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates')
+
+    objects = CompressedTextManager()
 
     def __str__(self):
         return f"{self.title} at {self.company}"
 
+class CompressionDictionary(models.Model):
+    """zstd dictionary for CompressedTextFields, see compression.py; kept while rows use it"""
+    name = models.CharField(max_length=32)  # dictionary group, e.g. "resume"
+    dict_id = models.PositiveIntegerField(unique=True)
+    data = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} dictionary {self.dict_id}"
+
 class VectorTable(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     job = models.ForeignKey(JobDescription, on_delete=models.CASCADE, related_name='vectors')
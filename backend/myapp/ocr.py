@@ -0,0 +1,283 @@
+"""
+Text extraction and OCR for uploaded resumes.
+
+PDFs with a text layer are read with PyPDF2. Scanned PDFs and images go
+through `preprocess` (orientation, DPI normalisation, downscaling,
+binarisation, deskew and page-segmentation selection) and then an OCR engine:
+
+- "subprocess" (default): pytesseract, one `tesseract` process per page
+- "tesserocr": Tesseract loaded in-process through its C API, a pool of at
+  most OCR_POOL_SIZE engines per worker process, so the model is
+  initialised once instead of per page or per request
+
+Select the engine with OCR_BACKEND.
+"""
+import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from .instrumentation import span
+
+OCR_BACKEND = os.getenv("OCR_BACKEND", "subprocess")
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+# Resolution Tesseract is tuned for; pages are rasterised and rescaled to this
+OCR_DPI = int(os.getenv("OCR_DPI", "300"))
+# Longest side after preprocessing; phone photos are often 4000px+ and OCR time grows with area
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", "3508"))  # A4 at 300 DPI
+OCR_DESKEW = os.getenv("OCR_DESKEW", "1") not in ("0", "false")
+# In-process Tesseract engines per worker; 0: the ocr admission concurrency limit
+OCR_POOL_SIZE = int(os.getenv("OCR_POOL_SIZE", "0"))
+
+# Tesseract page segmentation modes
+PSM_AUTO = 3           # fully automatic layout analysis, handles multi-column pages
+PSM_SINGLE_COLUMN = 4  # a single column of text of variable sizes
+PSM_SPARSE = 11        # sparse text in no particular order
+
+
+def preprocess(image):
+    """
+    Prepare an image for OCR. Returns (binarised grayscale image, psm).
+    """
+    # Respect the camera orientation of phone photos; work in grayscale from here on
+    dpi = image.info.get("dpi", (0, 0))[0]
+    gray = ImageOps.exif_transpose(image).convert("L")
+
+    # Normalise to OCR_DPI when the source resolution is known
+    if dpi and abs(dpi - OCR_DPI) > 10:
+        scale = OCR_DPI / float(dpi)
+        gray = gray.resize((max(1, int(gray.width * scale)), max(1, int(gray.height * scale))), Image.BILINEAR)
+
+    # Downscale oversized images
+    if max(gray.size) > OCR_MAX_SIDE:
+        gray.thumbnail((OCR_MAX_SIDE, OCR_MAX_SIDE), Image.BILINEAR)
+
+    gray = ImageOps.autocontrast(gray)
+    threshold = otsu_threshold(gray.histogram())
+
+    if OCR_DESKEW:
+        angle = estimate_skew(ink_mask(gray, threshold))
+        if abs(angle) >= 0.3:
+            gray = gray.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+
+    psm = select_psm(ink_mask(gray, threshold))
+    binary = gray.point(lambda value: 255 if value > threshold else 0)
+    return binary, psm
+
+
+def otsu_threshold(histogram):
+    """Global Otsu threshold from a 256-bin grayscale histogram"""
+    histogram = np.asarray(histogram[:256], dtype=np.float64)
+    total = histogram.sum()
+    if total == 0:
+        return 127
+    levels = np.arange(256)
+    weight_bg = np.cumsum(histogram)
+    weight_fg = total - weight_bg
+    cumulative_mean = np.cumsum(histogram * levels)
+    mean_bg = cumulative_mean / np.maximum(weight_bg, 1)
+    mean_fg = (cumulative_mean[-1] - cumulative_mean) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+def ink_mask(gray, threshold, max_side=800):
+    """Downsampled boolean mask of dark pixels, for cheap layout statistics"""
+    factor = max(1, max(gray.size) // max_side)
+    small = gray.reduce(factor) if factor > 1 else gray
+    return np.asarray(small) <= threshold
+
+
+def estimate_skew(ink, max_angle=5.0, step=0.5):
+    """
+    Estimate page skew in degrees with a projection profile: text lines give
+    the sharpest row histogram when they are horizontal.
+    Returns the angle to rotate the page by (PIL convention) to straighten it.
+    """
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-max_angle, max_angle + step, step):
+        theta = np.deg2rad(angle)
+        rows = np.round(ys * np.cos(theta) - xs * np.sin(theta)).astype(np.int64)
+        profile = np.bincount(rows - rows.min())
+        score = float(np.sum(profile.astype(np.float64) ** 2))
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return float(best_angle)
+
+
+def select_psm(ink):
+    """
+    Pick a page segmentation mode: sparse text for mostly empty images,
+    automatic layout for pages with a blank central gutter between two text
+    columns (two-column resumes), otherwise a single column.
+    """
+    if ink.size == 0 or ink.mean() < 0.002:
+        return PSM_SPARSE
+    columns = ink.mean(axis=0)
+    width = len(columns)
+    left, right = int(width * 0.35), int(width * 0.65)
+    has_text = columns > columns.max() * 0.05
+    gutter_width = max(1, width // 50)
+    gutter = np.convolve(columns[left:right] < 0.001, np.ones(gutter_width), mode="valid")
+    if has_text[:left].any() and has_text[right:].any() and gutter.max(initial=0) >= gutter_width:
+        return PSM_AUTO
+    return PSM_SINGLE_COLUMN
+
+
+class SubprocessOcrEngine:
+    """pytesseract: starts a `tesseract` process per image"""
+
+    name = "subprocess"
+
+    def recognize(self, image, psm=PSM_AUTO):
+        import pytesseract
+        return pytesseract.image_to_string(image, lang=OCR_LANG, config=f"--psm {psm} --dpi {OCR_DPI}")
+
+
+class TesserocrEngine:
+    """
+    Tesseract kept loaded in-process via tesserocr. A PyTessBaseAPI is not
+    thread-safe, so pages check one out of a per-process pool and return it
+    afterwards. APIs are created on demand up to `pool_size`; under ASGI
+    every request runs on a fresh thread, so a per-thread API would be
+    initialised (and leaked) per request.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, pool_size=None):
+        import tesserocr  # noqa: F401 - fail fast when the binding is missing
+        if not pool_size:
+            from .admission import concurrency_limit
+            pool_size = OCR_POOL_SIZE or concurrency_limit("ocr")
+        self.pool_size = pool_size
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _api(self):
+        try:
+            api = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.pool_size
+                if create:
+                    self._created += 1
+            if create:
+                import tesserocr
+                try:
+                    api = tesserocr.PyTessBaseAPI(lang=OCR_LANG)
+                except BaseException:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                # Every API is busy: wait for one to come back
+                api = self._idle.get()
+        try:
+            yield api
+        finally:
+            self._idle.put(api)
+
+    def recognize(self, image, psm=PSM_AUTO):
+        with self._api() as api:
+            api.SetPageSegMode(psm)
+            api.SetImage(image)
+            api.SetSourceResolution(OCR_DPI)
+            try:
+                return api.GetUTF8Text()
+            finally:
+                api.Clear()
+
+
+ENGINES = {
+    "subprocess": SubprocessOcrEngine,
+    "tesserocr": TesserocrEngine,
+}
+
+_engine = None
+
+
+def load_engine(backend=None):
+    backend = backend or OCR_BACKEND
+    if backend not in ENGINES:
+        raise ValueError(f"Unknown OCR backend '{backend}', expected one of {tuple(ENGINES)}")
+    return ENGINES[backend]()
+
+
+def get_ocr_engine():
+    """OCR engine for this worker, falling back to the subprocess engine if tesserocr is missing"""
+    global _engine
+    if _engine is None:
+        try:
+            _engine = load_engine()
+        except ImportError as e:
+            print(f"Warning: OCR backend '{OCR_BACKEND}' unavailable ({e}), using subprocess")
+            _engine = SubprocessOcrEngine()
+    return _engine
+
+
+def ocr_image(image, engine=None):
+    """Preprocess and recognise one image or page"""
+    with span("ocr_preprocess"):
+        prepared, psm = preprocess(image)
+    with span("ocr_page"):
+        return (engine or get_ocr_engine()).recognize(prepared, psm)
+
+
+def rasterize_pages(file_path):
+    """
+    Yield the pages of a PDF as grayscale images at OCR_DPI, one at a time
+    so memory stays bounded by a single page.
+    """
+    from pdf2image import convert_from_path, pdfinfo_from_path
+
+    page_count = pdfinfo_from_path(file_path)["Pages"]
+    for page_number in range(1, page_count + 1):
+        with span("rasterize"):
+            pages = convert_from_path(
+                file_path, dpi=OCR_DPI, grayscale=True, first_page=page_number, last_page=page_number
+            )
+        for page in pages:
+            page.info["dpi"] = (OCR_DPI, OCR_DPI)
+            yield page
+
+
+def extract_pdf_text(file_path):
+    """Text layer of a PDF, or an empty string if it has none"""
+    from PyPDF2 import PdfReader
+
+    text = ""
+    with span("extract"):
+        reader = PdfReader(file_path)
+        for page in reader.pages:
+            page_text = page.extract_text()
+            if page_text:
+                text += page_text
+    return text
+
+
+def extract_text(file_path, file_name):
+    """
+    Extract text from an uploaded resume: the PDF text layer when there is
+    one, otherwise OCR of every page; images are always OCR'd.
+    """
+    if file_name.lower().endswith('.pdf'):
+        try:
+            text = extract_pdf_text(file_path)
+        except Exception:
+            text = ""
+        if text.strip():
+            return text
+        # Fallback to OCR if PDF is an image-based document
+        return "".join(ocr_image(page) for page in rasterize_pages(file_path))
+
+    with Image.open(file_path) as image:
+        return ocr_image(image)
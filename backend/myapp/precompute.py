@@ -0,0 +1,119 @@
+"""
+Speculative analysis after a resume upload.
+
+upload_resume schedules the full analysis (matching, ranking, Groq) on a
+background event loop as soon as the resume is stored, through the same
+single-flight key analyze_resume uses. analyze_resume then serves the stored
+result (ResumeAnalysis), or attaches to the run still in flight.
+
+A stored result goes stale when a job is posted whose similarity to the
+resume reaches that of the weakest match, i.e. it would have been matched;
+results also expire after PRECOMPUTE_TTL_SECONDS.
+"""
+import asyncio
+import os
+import threading
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .instrumentation import cache_event, event, span
+from .models import ResumeAnalysis
+
+PRECOMPUTE_ANALYSIS = os.getenv("PRECOMPUTE_ANALYSIS", "1") not in ("0", "false")
+PRECOMPUTE_TTL_SECONDS = float(os.getenv("PRECOMPUTE_TTL_SECONDS", "86400"))
+# Speculative runs compete with real requests for Groq quota and CPU
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "2"))
+
+_loop = None
+_loop_lock = threading.Lock()
+_slots = None
+
+
+def _background_loop():
+    global _loop, _slots
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="precompute", daemon=True).start()
+                _slots = asyncio.Semaphore(PRECOMPUTE_CONCURRENCY)
+                _loop = loop
+    return _loop
+
+
+async def _run(make_coroutine):
+    async with _slots:
+        try:
+            with span("precompute"):
+                await make_coroutine()
+            event("precompute_done")
+        except Exception as e:
+            print(f"⚠️ Speculative analysis failed: {e}")
+
+
+def schedule(make_coroutine):
+    """Run `make_coroutine()` on the background loop; callable from sync and async code"""
+    if not PRECOMPUTE_ANALYSIS:
+        return None
+    return asyncio.run_coroutine_threadsafe(_run(make_coroutine), _background_loop())
+
+
+def _fresh_after():
+    return timezone.now() - timedelta(seconds=PRECOMPUTE_TTL_SECONDS)
+
+
+async def lookup(resume, key):
+    """Stored payload for this resume and analysis key, or None"""
+    with span("db"):
+        stored = await ResumeAnalysis.objects.filter(
+            resume=resume, key=key, stale=False, payload__isnull=False, computed_at__gte=_fresh_after()
+        ).values_list("payload", flat=True).afirst()
+    cache_event("precomputed_analysis", stored is not None)
+    return stored
+
+
+async def begin(resume, key, vector, min_similarity):
+    """Record a run in progress, so jobs posted while it runs can mark it stale"""
+    with span("db"):
+        await ResumeAnalysis.objects.aupdate_or_create(
+            resume=resume,
+            defaults={
+                "key": key,
+                "payload": None,
+                "resume_vector": np.asarray(vector, dtype=np.float32).tobytes(),
+                "min_similarity": min_similarity,
+                "stale": False,
+                "computed_at": None,
+            },
+        )
+
+
+async def finish(resume, key, payload, min_similarity):
+    # Keeps `stale` as is: a relevant job posted during the run still invalidates it
+    with span("db"):
+        await ResumeAnalysis.objects.filter(resume=resume, key=key).aupdate(
+            payload=payload, min_similarity=min_similarity, computed_at=timezone.now()
+        )
+
+
+async def invalidate_for_job(job_vector):
+    """Mark stale every live result the new job would have been matched into; returns the count"""
+    job = np.asarray(job_vector, dtype=np.float32)
+    job = job / max(float(np.linalg.norm(job)), 1e-12)
+    with span("db"):
+        rows = [
+            row async for row in ResumeAnalysis.objects.filter(stale=False, updated_at__gte=_fresh_after())
+            .values_list("id", "resume_vector", "min_similarity")
+        ]
+    if not rows:
+        return 0
+    resumes = np.vstack([np.frombuffer(vector, dtype=np.float32) for _, vector, _ in rows])
+    similarity = resumes @ job / np.maximum(np.linalg.norm(resumes, axis=1), 1e-12)
+    stale = [row_id for (row_id, _, threshold), score in zip(rows, similarity) if score >= threshold]
+    if stale:
+        with span("db"):
+            await ResumeAnalysis.objects.filter(id__in=stale).aupdate(stale=True)
+        event("precompute_invalidated")
+    return len(stale)
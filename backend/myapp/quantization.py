@@ -0,0 +1,153 @@
+"""
+Product quantization (PQ) of embeddings.
+
+A vector is split into PQ_SUBSPACES sub-vectors; each is replaced by the index
+of its nearest centroid in a 256-entry codebook learned with k-means for that
+subspace. A 384-d float32 vector (1536 bytes) becomes PQ_SUBSPACES bytes
+(48 by default, a 32x reduction).
+
+Queries are scored without decoding, by asymmetric distance computation (ADC):
+the inner products of each query sub-vector with all centroids of its
+subspace form a (subspaces x 256) lookup table, and a code's score is the sum
+of one table entry per subspace. The best PQ_RERANK candidates are then
+re-scored with their exact vectors, so the final order is exact.
+"""
+import io
+import os
+
+import numpy as np
+
+PQ_SUBSPACES = int(os.getenv("PQ_SUBSPACES", "48"))
+PQ_CENTROIDS = 256  # codes are uint8
+PQ_RERANK = int(os.getenv("PQ_RERANK", "100"))
+PQ_TRAIN_SAMPLE = int(os.getenv("PQ_TRAIN_SAMPLE", "50000"))
+PQ_TRAIN_ITERATIONS = int(os.getenv("PQ_TRAIN_ITERATIONS", "15"))
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def _kmeans(points, k, iterations, rng):
+    """Plain Lloyd's k-means; returns (k, d) centroids"""
+    centroids = points[rng.choice(len(points), size=k, replace=len(points) < k)].copy()
+    for _ in range(iterations):
+        labels = _nearest(points, centroids)
+        counts = np.bincount(labels, minlength=k)
+        for dim in range(points.shape[1]):
+            centroids[:, dim] = np.bincount(labels, weights=points[:, dim], minlength=k) / np.maximum(counts, 1)
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            # Restart empty clusters on random points
+            centroids[empty] = points[rng.choice(len(points), size=len(empty))]
+    return centroids
+
+
+def _nearest(points, centroids):
+    # argmin ||x - c||^2 == argmin ||c||^2 - 2 x.c
+    distances = (centroids * centroids).sum(axis=1) - 2.0 * points @ centroids.T
+    return distances.argmin(axis=1)
+
+
+class ProductQuantizer:
+    def __init__(self, dim, subspaces=PQ_SUBSPACES, codebooks=None):
+        if dim % subspaces:
+            raise ValueError(f"Dimension {dim} is not divisible into {subspaces} subspaces")
+        self.dim = dim
+        self.subspaces = subspaces
+        self.sub_dim = dim // subspaces
+        # (subspaces, 256, sub_dim)
+        self.codebooks = codebooks
+
+    @property
+    def trained(self):
+        return self.codebooks is not None
+
+    def _split(self, vectors):
+        return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), self.subspaces, self.sub_dim)
+
+    def fit(self, vectors, sample=PQ_TRAIN_SAMPLE, iterations=PQ_TRAIN_ITERATIONS, seed=0):
+        rng = np.random.default_rng(seed)
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) > sample:
+            vectors = vectors[rng.choice(len(vectors), size=sample, replace=False)]
+        parts = self._split(vectors)
+        self.codebooks = np.stack([
+            _kmeans(np.ascontiguousarray(parts[:, m]), PQ_CENTROIDS, iterations, rng) for m in range(self.subspaces)
+        ]).astype(np.float32)
+        return self
+
+    def encode(self, vectors, batch_size=65536):
+        """(n, dim) float vectors -> (n, subspaces) uint8 codes"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for start in range(0, len(vectors), batch_size):
+            parts = self._split(vectors[start:start + batch_size])
+            for m in range(self.subspaces):
+                codes[start:start + len(parts), m] = _nearest(parts[:, m], self.codebooks[m])
+        return codes
+
+    def decode(self, codes):
+        codes = np.asarray(codes, dtype=np.uint8)
+        parts = self.codebooks[np.arange(self.subspaces), codes]  # (n, subspaces, sub_dim)
+        return parts.reshape(len(codes), self.dim)
+
+    def lookup_tables(self, query):
+        """(subspaces, 256) inner products of each query sub-vector with its subspace's centroids"""
+        query = np.asarray(query, dtype=np.float32).reshape(self.subspaces, self.sub_dim)
+        return np.einsum("md,mkd->mk", query, self.codebooks)
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.save(buffer, self.codebooks, allow_pickle=False)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, blob):
+        codebooks = np.load(io.BytesIO(bytes(blob)), allow_pickle=False)
+        subspaces, _, sub_dim = codebooks.shape
+        return cls(subspaces * sub_dim, subspaces, codebooks)
+
+
+class PQIndex:
+    """
+    PQ codes of a set of vectors, searched by ADC and re-ranked exactly.
+    `exact(indices)` returns the float vectors of the given rows, so the full
+    matrix does not have to stay in memory (it can be read from disk).
+    """
+
+    def __init__(self, quantizer, codes, exact):
+        self.quantizer = quantizer
+        # Subspace-major, so each ADC pass reads one contiguous row
+        self.codes = np.ascontiguousarray(np.asarray(codes, dtype=np.uint8).T)
+        self.exact = exact
+
+    def __len__(self):
+        return self.codes.shape[1]
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.quantizer.codebooks.nbytes
+
+    def adc_scores(self, query):
+        tables = self.quantizer.lookup_tables(query)
+        scores = np.zeros(len(self), dtype=np.float32)
+        for m in range(self.quantizer.subspaces):
+            scores += tables[m].take(self.codes[m])
+        return scores
+
+    def search(self, query, k, rerank=PQ_RERANK):
+        """(row indices, exact cosine scores) of the k best rows, best first"""
+        query = normalize(query)
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        scores = self.adc_scores(query)
+        depth = min(max(k, rerank), len(scores))
+        candidates = np.argpartition(-scores, depth - 1)[:depth]
+        if rerank:
+            exact = normalize(self.exact(candidates)) @ query
+        else:
+            exact = scores[candidates]
+        order = np.argsort(-exact)[:k]
+        return candidates[order], exact[order]
@@ -0,0 +1,198 @@
+"""
+Cascade ranking for resume analysis.
+
+1. recall         vector search returns CASCADE_RECALL_COUNT candidates
+2. chunks         max-sim over chunk vectors re-ranks the top CASCADE_RERANK_COUNT
+3. cross_encoder  a local cross-encoder scores (resume, job) pairs in batches,
+                  with pair scores cached across requests
+4. llm            only the best CASCADE_LLM_COUNT jobs are sent to Groq, one
+                  request per job (views.analyze_jobs)
+
+Every stage after recall has a latency budget (CASCADE_BUDGETS_MS) and is
+also capped by what is left of the request budget (CASCADE_TOTAL_BUDGET_MS).
+A stage that runs out of time is dropped and the previous stage's ranking is
+used instead; in the LLM stage a job that runs out of time gets its
+rule-based fallback section. The CPU stages check their Deadline between
+batches and stop themselves, since cancelling the awaiter does not stop
+work already running on the run_cpu executor.
+
+The cross-encoder is loaded in the background at startup
+(warm_cross_encoder); until it is ready the stage is skipped rather than
+paying for the load inside its budget.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .instrumentation import cache_event, event, span
+
+CASCADE_RECALL_COUNT = int(os.getenv("CASCADE_RECALL_COUNT", "50"))
+CASCADE_RERANK_COUNT = int(os.getenv("CASCADE_RERANK_COUNT", "20"))
+CASCADE_RESULT_COUNT = int(os.getenv("CASCADE_RESULT_COUNT", "10"))
+CASCADE_LLM_COUNT = int(os.getenv("CASCADE_LLM_COUNT", "3"))
+CASCADE_TOTAL_BUDGET_MS = float(os.getenv("CASCADE_TOTAL_BUDGET_MS", "30000"))
+CASCADE_BUDGETS_MS = os.getenv("CASCADE_BUDGETS_MS", "chunks=300,cross_encoder=500,llm=25000")
+
+CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# "torch", "onnx" or "off"
+CROSS_ENCODER_BACKEND = os.getenv("CROSS_ENCODER_BACKEND", "torch")
+CROSS_ENCODER_BATCH_SIZE = int(os.getenv("CROSS_ENCODER_BATCH_SIZE", "16"))
+# The model reads at most 512 tokens per pair: a short query leaves room for the job text
+CROSS_ENCODER_QUERY_CHARS = int(os.getenv("CROSS_ENCODER_QUERY_CHARS", "400"))
+CROSS_ENCODER_MAX_CHARS = 1600
+PAIR_CACHE_SIZE = int(os.getenv("PAIR_CACHE_SIZE", "20000"))
+
+
+def parse_budgets(value):
+    budgets = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, milliseconds = item.split("=")
+        budgets[name.strip()] = float(milliseconds) / 1000
+    return budgets
+
+
+STAGE_BUDGETS = parse_budgets(CASCADE_BUDGETS_MS)
+
+
+class Deadline:
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires
+
+
+def stage_budget(name, request_deadline):
+    """Seconds a stage may take: min(its budget, time left in the request)"""
+    return min(STAGE_BUDGETS.get(name, request_deadline.remaining()), request_deadline.remaining())
+
+
+async def run_stage(name, request_deadline, make_awaitable):
+    """
+    Await a stage within its stage_budget(). Returns None when the stage is
+    out of time, so the caller keeps the previous stage's result.
+    """
+    budget = stage_budget(name, request_deadline)
+    if budget <= 0:
+        event(f"cascade_skipped_{name}")
+        return None
+    with span(f"stage_{name}"):
+        try:
+            return await asyncio.wait_for(make_awaitable(Deadline(budget)), budget)
+        except asyncio.TimeoutError:
+            print(f"⚠️ Ranking stage '{name}' exceeded its {budget * 1000:.0f}ms budget, falling back to the previous stage")
+            event(f"cascade_degraded_{name}")
+            return None
+
+
+def _digest(text):
+    return hashlib.sha1((text or "").encode()).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU; holds cross-encoder pair scores and per-job analyses"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._scores = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            score = self._scores.get(key)
+            if score is not None:
+                self._scores.move_to_end(key)
+            return score
+
+    def put(self, key, score):
+        with self._lock:
+            self._scores[key] = score
+            self._scores.move_to_end(key)
+            while len(self._scores) > self.max_size:
+                self._scores.popitem(last=False)
+
+
+# Keyed by (resume digest, job digest)
+pair_scores = LRUCache(PAIR_CACHE_SIZE)
+
+_cross_encoder = None
+_cross_encoder_lock = threading.Lock()
+_cross_encoder_failed = False
+
+
+def get_cross_encoder():
+    """The shared CrossEncoder, or None when disabled or unavailable"""
+    global _cross_encoder, _cross_encoder_failed
+    if CROSS_ENCODER_BACKEND == "off" or _cross_encoder_failed:
+        return None
+    if _cross_encoder is None:
+        with _cross_encoder_lock:
+            if _cross_encoder is None and not _cross_encoder_failed:
+                try:
+                    from sentence_transformers import CrossEncoder
+
+                    _cross_encoder = CrossEncoder(CROSS_ENCODER_MODEL, backend=CROSS_ENCODER_BACKEND)
+                except Exception as e:
+                    print(f"Warning: cross-encoder '{CROSS_ENCODER_MODEL}' unavailable ({e}), stage disabled")
+                    _cross_encoder_failed = True
+    return _cross_encoder
+
+
+def warm_cross_encoder():
+    """Start loading the cross-encoder in a background thread; returns the thread, or None if nothing to load"""
+    if CROSS_ENCODER_BACKEND == "off" or _cross_encoder is not None or _cross_encoder_failed:
+        return None
+    thread = threading.Thread(target=get_cross_encoder, name="cross-encoder-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def loaded_cross_encoder():
+    """The cross-encoder if it is ready; otherwise starts warming it and returns None"""
+    if _cross_encoder is None and not _cross_encoder_lock.locked():
+        warm_cross_encoder()
+    return _cross_encoder
+
+
+def job_text(job):
+    return f"{job.get('title') or job.get('domain') or ''}\n{job.get('description') or ''}"[:CROSS_ENCODER_MAX_CHARS]
+
+
+def rerank_with_cross_encoder(query_text, jobs, deadline):
+    """
+    Order jobs by cross-encoder score against the query (resume) text, of
+    which the first CROSS_ENCODER_QUERY_CHARS are used. Pairs are scored in
+    batches, cached ones skipped; between batches the deadline is checked
+    and None is returned if it passed. Scores computed so far stay cached
+    for the next request. Returns None while the model is still loading.
+    CPU-bound, call through run_cpu.
+    """
+    model = loaded_cross_encoder()
+    if model is None or not jobs:
+        return None
+    query = query_text[:CROSS_ENCODER_QUERY_CHARS]
+    query_digest = _digest(query)
+    keys = [(query_digest, _digest(job_text(job))) for job in jobs]
+    scores = [pair_scores.get(key) for key in keys]
+    missing = [i for i, score in enumerate(scores) if score is None]
+    cache_event("cross_encoder_pairs", True, len(jobs) - len(missing))
+    cache_event("cross_encoder_pairs", False, len(missing))
+
+    for start in range(0, len(missing), CROSS_ENCODER_BATCH_SIZE):
+        if deadline.expired():
+            return None
+        batch = missing[start:start + CROSS_ENCODER_BATCH_SIZE]
+        with span("cross_encoder"):
+            predicted = model.predict([(query, job_text(jobs[i])) for i in batch], batch_size=len(batch))
+        for i, score in zip(batch, predicted):
+            scores[i] = float(score)
+            pair_scores.put(keys[i], scores[i])
+
+    ranked = [dict(job, rerank_score=round(score, 4)) for job, score in zip(jobs, scores)]
+    return sorted(ranked, key=lambda job: job["rerank_score"], reverse=True)
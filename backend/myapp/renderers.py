@@ -0,0 +1,168 @@
+"""
+orjson-based JSON output and input.
+
+- `dumps` / `JsonResponse`: drop-in replacements for Django's JsonResponse
+  path, with the output of DjangoJSONEncoder: UUIDs are encoded natively by
+  orjson, datetimes, timedeltas, Decimals (salary) and lazy strings by
+  DjangoJSONEncoder, and any other type raises TypeError. NumPy arrays and
+  scalars are encoded too.
+- `ORJSONRenderer` / `ORJSONParser`: the DRF renderer and parser.
+- `JobPayloadCache`: the encoded bytes of each job row, so job listings are
+  assembled by joining cached blobs instead of re-encoding every row.
+"""
+import datetime
+import json
+import os
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+
+import orjson
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+
+from .instrumentation import cache_event
+
+JOB_PAYLOAD_CACHE_SIZE = int(os.getenv("JOB_PAYLOAD_CACHE_SIZE", "50000"))
+
+# Datetimes go through _default so they are formatted like DjangoJSONEncoder (milliseconds, "Z")
+_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME
+_DJANGO_TYPES = (datetime.date, datetime.time, datetime.timedelta, Decimal, Promise)
+_django_encoder = DjangoJSONEncoder()
+
+
+def _default(value):
+    if isinstance(value, _DJANGO_TYPES):
+        return _django_encoder.default(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(data):
+    return orjson.dumps(data, default=_default, option=_OPTIONS)
+
+
+class JsonResponse(HttpResponse):
+    """
+    django.http.JsonResponse encoded with orjson. A custom `encoder` or
+    `json_dumps_params` is honoured by falling back to json.dumps.
+    """
+
+    def __init__(self, data, encoder=DjangoJSONEncoder, safe=True, json_dumps_params=None, **kwargs):
+        if safe and not isinstance(data, dict):
+            raise TypeError(
+                "In order to allow non-dict objects to be serialized set the safe parameter to False."
+            )
+        kwargs.setdefault("content_type", "application/json")
+        if encoder is DjangoJSONEncoder and not json_dumps_params:
+            content = dumps(data)
+        else:
+            content = json.dumps(data, cls=encoder, **(json_dumps_params or {}))
+        super().__init__(content=content, **kwargs)
+
+
+class RawJsonResponse(HttpResponse):
+    """Response for a body that is already encoded JSON"""
+
+    def __init__(self, content, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(content=content, **kwargs)
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return dumps(data)
+
+
+class ORJSONParser(BaseParser):
+    media_type = "application/json"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as e:
+            raise ParseError(f"JSON parse error - {e}")
+
+
+class JobPayloadCache:
+    """
+    LRU of encoded job rows keyed by source ("mirror" or "supabase") and job
+    id. Each entry remembers the row's `updated_at`, so a row that changed in
+    Supabase is re-encoded on the next read; rows without one are never
+    cached. Local saves and deletes also drop the entries (see apps.py).
+    """
+
+    def __init__(self, max_size=JOB_PAYLOAD_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._sources = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _lookup(self, row, source):
+        job_id, version = row.get("id"), row.get("updated_at")
+        if job_id is None or version is None:
+            return dumps(row), False
+        key = (source, str(job_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                return entry[1], True
+        blob = dumps(row)
+        with self._lock:
+            self._sources.add(source)
+            self._entries[key] = (version, blob)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return blob, False
+
+    def get(self, row, source):
+        """Encoded bytes of a job row dict, from the cache when still current"""
+        blob, hit = self._lookup(row, source)
+        cache_event("job_payload", hit)
+        return blob
+
+    def invalidate(self, job_id):
+        with self._lock:
+            for source in self._sources:
+                self._entries.pop((source, str(job_id)), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def render_list(self, rows, source):
+        """A JSON array of job rows built from the cached per-row bytes"""
+        blobs, misses = [], []
+        entries = self._entries
+        with self._lock:
+            for position, row in enumerate(rows):
+                job_id, version = row.get("id"), row.get("updated_at")
+                entry = entries.get((source, str(job_id))) if job_id is not None else None
+                if entry is not None and version is not None and entry[0] == version:
+                    entries.move_to_end((source, str(job_id)))
+                    blobs.append(entry[1])
+                else:
+                    blobs.append(None)
+                    misses.append(position)
+        for position in misses:
+            blobs[position], _ = self._lookup(rows[position], source)
+        cache_event("job_payload", True, len(blobs) - len(misses))
+        cache_event("job_payload", False, len(misses))
+        return b"[" + b",".join(blobs) + b"]"
+
+
+job_payloads = JobPayloadCache()
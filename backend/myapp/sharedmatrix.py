@@ -0,0 +1,172 @@
+"""
+Job-embedding matrix in POSIX shared memory, published by the pre-fork
+master (`manage.py serve`) and read by its workers without copying.
+
+Each publication is an immutable segment `<prefix>_<generation>`:
+
+    header (256 bytes)  rows, dim, ids length (uint64), source version (utf-8)
+    matrix              rows x dim float32, L2-normalised
+    ids                 newline-joined job ids
+
+A one-word control segment `<prefix>_ctl` holds the current generation. The
+master writes the new segment completely before storing its generation, so
+a worker sees either the old matrix or the new one, never a partial write.
+The previous segment is unlinked one publication later; workers that still
+map it keep a valid view until they move on.
+
+Workers compare the published source version with their own (mirror or
+local storage) and only use the shared matrix when they match, so a worker
+that is ahead of the master falls back to loading its own copy.
+"""
+import os
+import sys
+import threading
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+# Set by `manage.py serve` in the master before forking; workers inherit it
+SHARED_MATRIX_PREFIX = os.getenv("SHARED_MATRIX_PREFIX", "")
+SHARED_MATRIX_POLL_SECONDS = float(os.getenv("SHARED_MATRIX_POLL_SECONDS", "2"))
+
+HEADER_BYTES = 256
+VERSION_BYTES = HEADER_BYTES - 24
+
+
+def _attach(name):
+    """Open an existing segment without handing it to this process's resource tracker"""
+    if sys.version_info >= (3, 13):
+        return SharedMemory(name=name, track=False)
+    # Before 3.13 attaching registers the segment too. Workers forked from the
+    # master share its tracker, where that is a duplicate of the master's own
+    # entry; a process with a tracker of its own would unlink the master's
+    # segment when it exits, so there this one name is taken back
+    shared_tracker = resource_tracker._resource_tracker._fd is not None
+    segment = SharedMemory(name=name)
+    if not shared_tracker:
+        resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+class MatrixPublisher:
+    """Master side: writes new generations and retires old ones"""
+
+    def __init__(self, prefix=None):
+        self.prefix = prefix or f"jobsync_{os.getpid()}"
+        self.control = SharedMemory(name=f"{self.prefix}_ctl", create=True, size=8)
+        self._generation = np.ndarray((1,), dtype=np.uint64, buffer=self.control.buf)
+        self._generation[0] = 0
+        self.version = None
+        self._segments = []
+
+    def publish(self, version, ids, matrix):
+        matrix = np.asarray(matrix, dtype=np.float32)
+        rows, dim = matrix.shape if matrix.size else (0, 0)
+        id_bytes = "\n".join(str(job_id) for job_id in ids).encode()
+        generation = int(self._generation[0]) + 1
+        segment = SharedMemory(
+            name=f"{self.prefix}_{generation}", create=True, size=HEADER_BYTES + matrix.nbytes + len(id_bytes)
+        )
+        np.ndarray((3,), dtype=np.uint64, buffer=segment.buf)[:] = (rows, dim, len(id_bytes))
+        segment.buf[24:24 + VERSION_BYTES] = version.encode()[:VERSION_BYTES].ljust(VERSION_BYTES, b"\0")
+        if rows:
+            np.ndarray((rows, dim), dtype=np.float32, buffer=segment.buf, offset=HEADER_BYTES)[:] = matrix
+        start = HEADER_BYTES + matrix.nbytes
+        segment.buf[start:start + len(id_bytes)] = id_bytes
+        # The swap: workers read this word before attaching
+        self._generation[0] = generation
+        self.version = version
+        self._segments.append(segment)
+        while len(self._segments) > 2:
+            self._retire(self._segments.pop(0))
+        return generation
+
+    @staticmethod
+    def _retire(segment):
+        segment.close()
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        for segment in self._segments:
+            self._retire(segment)
+        self._segments = []
+        del self._generation
+        self._retire(self.control)
+
+
+class SharedMatrixReader:
+    """Worker side: the current generation as (source version, ids, matrix)"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._control = None
+        self._current = (0, None)
+        self._retired = []
+
+    def _generation(self):
+        if self._control is None:
+            self._control = _attach(f"{self.prefix}_ctl")
+        return int(np.ndarray((1,), dtype=np.uint64, buffer=self._control.buf)[0])
+
+    def _load(self, generation):
+        segment = _attach(f"{self.prefix}_{generation}")
+        rows, dim, id_length = (int(v) for v in np.ndarray((3,), dtype=np.uint64, buffer=segment.buf))
+        version = bytes(segment.buf[24:24 + VERSION_BYTES]).rstrip(b"\0").decode()
+        # frombuffer keeps a buffer export on the mapping, so close() cannot unmap it under a live view
+        matrix = np.frombuffer(segment.buf, dtype=np.float32, count=rows * dim, offset=HEADER_BYTES).reshape(rows, dim)
+        matrix.flags.writeable = False
+        start = HEADER_BYTES + matrix.nbytes
+        ids = bytes(segment.buf[start:start + id_length]).decode().split("\n") if id_length else []
+        return segment, (version, ids, matrix)
+
+    def _release_retired(self):
+        # A segment can only be closed once no request still holds a view of it
+        still_mapped = []
+        for segment in self._retired:
+            try:
+                segment.close()
+            except BufferError:
+                still_mapped.append(segment)
+        self._retired = still_mapped
+
+    def current(self):
+        with self._lock:
+            try:
+                generation = self._generation()
+            except FileNotFoundError:
+                return None
+            if generation and generation != self._current[0]:
+                try:
+                    segment, snapshot = self._load(generation)
+                except FileNotFoundError:
+                    # Retired between reading the generation and attaching; use the next call's
+                    return self._current[1][1] if self._current[1] else None
+                if self._current[1] is not None:
+                    self._retired.append(self._current[1][0])
+                self._current = (generation, (segment, snapshot))
+                self._release_retired()
+            return self._current[1][1] if self._current[1] else None
+
+
+_reader = None
+_reader_lock = threading.Lock()
+
+
+def shared_snapshot(version):
+    """(ids, matrix) published for this source version, or None outside `manage.py serve` or on mismatch"""
+    global _reader
+    if not SHARED_MATRIX_PREFIX:
+        return None
+    if _reader is None:
+        with _reader_lock:
+            if _reader is None:
+                _reader = SharedMatrixReader(SHARED_MATRIX_PREFIX)
+    snapshot = _reader.current()
+    if snapshot is None or snapshot[0] != version:
+        return None
+    return snapshot[1], snapshot[2]
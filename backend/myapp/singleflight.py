@@ -0,0 +1,263 @@
+"""
+Single-flight coalescing of identical in-flight computations.
+
+Concurrent calls with the same key share one execution: the first caller
+(the leader) runs the computation and everyone else attaches to its result.
+Within a process this works across threads and event loops through a
+concurrent.futures.Future per key. Across uvicorn workers on the same host,
+the leader takes a lease row in a small SQLite file; workers that find the
+lease held wait for the leader to publish its result there instead of
+running the computation again. Published results stay readable for
+SINGLEFLIGHT_RESULT_TTL seconds so retries that arrive just after the
+leader finished are served too.
+
+Results shared across workers must be JSON serialisable.
+"""
+import asyncio
+import hashlib
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .instrumentation import cache_event
+from .renderers import dumps
+
+SINGLEFLIGHT_DB = os.getenv("SINGLEFLIGHT_DB", str(settings.BASE_DIR / "singleflight.sqlite3"))
+SINGLEFLIGHT_SHARED = os.getenv("SINGLEFLIGHT_SHARED", "1") not in ("0", "false")
+# Longest a leader may hold a key; also bounds how long other workers wait on a crashed leader
+SINGLEFLIGHT_LEASE_SECONDS = float(os.getenv("SINGLEFLIGHT_LEASE_SECONDS", "90"))
+SINGLEFLIGHT_RESULT_TTL = float(os.getenv("SINGLEFLIGHT_RESULT_TTL", "10"))
+POLL_INTERVAL = 0.05
+
+
+def make_key(*parts):
+    """Stable key from strings, numbers and bytes (e.g. a packed query vector)"""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LeaseStore:
+    """
+    Leases and recently published results in SQLite, shared by the workers
+    on a host. Connections are pooled per process (sync requests run on a
+    new thread each under ASGI).
+    """
+
+    def __init__(self, path=SINGLEFLIGHT_DB):
+        self.path = path
+        self._idle = queue.SimpleQueue()
+
+    @contextmanager
+    def _connection(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            connection = sqlite3.connect(self.path, timeout=1, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=OFF")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+        try:
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def acquire(self, key, owner, seconds=SINGLEFLIGHT_LEASE_SECONDS):
+        """Take the lease unless another live owner holds it"""
+        now = time.time()
+        with self._connection() as connection:
+            cursor = connection.execute(
+                "INSERT INTO leases (key, owner, expires) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                "WHERE leases.expires < ?",
+                (key, owner, now + seconds, now),
+            )
+            return cursor.rowcount == 1
+
+    def result(self, key):
+        with self._connection() as connection:
+            row = connection.execute(
+                "SELECT value FROM results WHERE key = ? AND expires >= ?", (key, time.time())
+            ).fetchone()
+        return None if row is None else row[0]
+
+    def release(self, key, owner, value=None, ttl=SINGLEFLIGHT_RESULT_TTL):
+        """Drop the lease, publishing the encoded result first when there is one"""
+        now = time.time()
+        with self._connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                if value is not None:
+                    connection.execute(
+                        "INSERT OR REPLACE INTO results (key, value, expires) VALUES (?, ?, ?)",
+                        (key, value, now + ttl),
+                    )
+                connection.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+                connection.execute("DELETE FROM results WHERE expires < ?", (now,))
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+
+
+class SingleFlight:
+    """
+    Coalesces calls by key. `do` takes an async callable, `do_sync` a plain one;
+    both kinds of caller can share the same in-flight computation.
+    """
+
+    def __init__(self, name, shared=SINGLEFLIGHT_SHARED, store=None):
+        self.name = name
+        self.shared = shared
+        self._store = store
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = LeaseStore()
+        return self._store
+
+    def _join(self, key):
+        """Returns (future, is_leader)"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                cache_event(f"singleflight_{self.name}", True)
+                return future, False
+            future = Future()
+            self._calls[key] = future
+        cache_event(f"singleflight_{self.name}", False)
+        return future, True
+
+    def _settle(self, key, future, result=None, error=None):
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def do(self, key, func):
+        future, leader = self._join(key)
+        if leader:
+            # Run detached so a cancelled leader request does not cancel the followers' result
+            task = asyncio.ensure_future(self._lead(key, func))
+
+            def done(task):
+                if task.cancelled():
+                    self._settle(key, future, error=asyncio.CancelledError())
+                elif task.exception() is not None:
+                    self._settle(key, future, error=task.exception())
+                else:
+                    self._settle(key, future, task.result())
+
+            task.add_done_callback(done)
+        # Shielded: a caller going away must not cancel the shared future for the others
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def do_sync(self, key, func):
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = self._lead_sync(key, func)
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result
+
+    def _cross_process(self, key, owner):
+        """
+        One step of the cross-worker protocol: ("result", value) when another
+        worker already published it, ("lead", None) when this worker holds
+        the lease, ("wait", None) while another worker is computing it.
+        """
+        try:
+            published = self.store.result(key)
+            if published is not None:
+                return "result", orjson.loads(published)
+            if self.store.acquire(key, owner):
+                return "lead", None
+            return "wait", None
+        except sqlite3.Error as e:
+            # Fail open: compute locally rather than fail the request
+            print(f"Warning: single-flight lease store unavailable: {e}")
+            return "local", None
+
+    def _publish(self, key, owner, result):
+        try:
+            self.store.release(key, owner, None if result is None else dumps(result))
+        except (sqlite3.Error, TypeError) as e:
+            print(f"Warning: could not publish single-flight result: {e}")
+            try:
+                self.store.release(key, owner)
+            except sqlite3.Error:
+                pass
+
+    async def _lead(self, key, func):
+        if not self.shared:
+            return await func()
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        deadline = time.monotonic() + SINGLEFLIGHT_LEASE_SECONDS
+        # The lease store is SQLite with a busy timeout: keep it off the event loop
+        cross_process = sync_to_async(self._cross_process, thread_sensitive=False)
+        publish = sync_to_async(self._publish, thread_sensitive=False)
+        while True:
+            state, value = await cross_process(key, owner)
+            if state == "result":
+                cache_event(f"singleflight_{self.name}_shared", True)
+                return value
+            if state == "local" or (state == "wait" and time.monotonic() > deadline):
+                return await func()
+            if state == "lead":
+                break
+            await asyncio.sleep(POLL_INTERVAL)
+        try:
+            result = await func()
+        except BaseException:
+            await asyncio.shield(publish(key, owner, None))
+            raise
+        await publish(key, owner, result)
+        return result
+
+    def _lead_sync(self, key, func):
+        if not self.shared:
+            return func()
+        owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        deadline = time.monotonic() + SINGLEFLIGHT_LEASE_SECONDS
+        while True:
+            state, value = self._cross_process(key, owner)
+            if state == "result":
+                cache_event(f"singleflight_{self.name}_shared", True)
+                return value
+            if state == "local" or (state == "wait" and time.monotonic() > deadline):
+                return func()
+            if state == "lead":
+                break
+            time.sleep(POLL_INTERVAL)
+        try:
+            result = func()
+        except BaseException:
+            self._publish(key, owner, None)
+            raise
+        self._publish(key, owner, result)
+        return result
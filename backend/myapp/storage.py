@@ -0,0 +1,463 @@
+"""
+Storage backends for the Supabase tables and RPCs the app uses.
+
+STORAGE_BACKEND=supabase (default) talks to the hosted project.
+STORAGE_BACKEND=local keeps the same tables in a SQLite file (LOCAL_STORAGE_DB)
+and answers the vector RPCs with NumPy, so a single node needs no network
+hop and tests and benchmarks run hermetically.
+
+The local client mirrors the subset of the supabase-py query builder in use:
+
+    client.table(name).select(*columns) / insert(rows) / upsert(rows) / update(values) / delete()
+        .eq/.neq/.gt/.gte/.lt/.lte(column, value) .in_(column, values) .or_("...")
+        .order(column, desc=False) .limit(n) .execute() -> response with .data
+    client.rpc("match_filtered_job_descriptions" | "match_candidates", params).execute()
+
+Rows are stored as JSON with an `embedding` column split out as float32.
+Like the Postgres tables, rows get an `id` (uuid4) and `updated_at` when
+inserted without one. The RPCs keep their SQL semantics: cosine similarity
+above `match_threshold`, best first, at most `match_count` rows.
+"""
+import os
+import re
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timezone
+
+import numpy as np
+import orjson
+from django.conf import settings
+
+from .clients import run_cpu
+from .instrumentation import span
+from .lifecycle import LiveMatrix
+from .sharedmatrix import shared_snapshot
+
+# "supabase" or "local"
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase")
+LOCAL_STORAGE_DB = os.getenv("LOCAL_STORAGE_DB", str(settings.BASE_DIR / "storage.sqlite3"))
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_OPERATORS = {"eq": "=", "neq": "<>", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+
+class StorageError(Exception):
+    pass
+
+
+class LocalResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+def _identifier(name):
+    if not _IDENTIFIER.match(name):
+        raise StorageError(f"Invalid identifier '{name}'")
+    return name
+
+
+def _column(name):
+    return "id" if name == "id" else f"json_extract(data, '$.{_identifier(name)}')"
+
+
+def _embedding(value):
+    """pgvector values may arrive as '[0.1,...]' strings"""
+    if isinstance(value, str):
+        value = orjson.loads(value)
+    return np.asarray(value, dtype=np.float32)
+
+
+def _split_terms(expression):
+    """Split a PostgREST logic list on top-level commas"""
+    terms, depth, quoted, current = [], 0, False, ""
+    for char in expression:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and char == "," and depth == 0:
+            terms.append(current)
+            current = ""
+            continue
+        current += char
+    return terms + [current] if current else terms
+
+
+def _condition(column, op, value):
+    if op == "in":
+        values = list(value)
+        if not values:
+            return "0", []
+        return f"{_column(column)} IN ({','.join('?' * len(values))})", values
+    if op not in _OPERATORS:
+        raise StorageError(f"Unsupported filter operator '{op}'")
+    return f"{_column(column)} {_OPERATORS[op]} ?", [value]
+
+
+def _logic(term):
+    """SQL for `col.op.value`, `and(...)` or `or(...)` from an or_() filter string"""
+    if term.startswith(("and(", "or(")):
+        joiner = " AND " if term.startswith("and(") else " OR "
+        parts = [_logic(t.strip()) for t in _split_terms(term[term.index("(") + 1:-1])]
+        return "(" + joiner.join(sql for sql, _ in parts) + ")", [p for _, params in parts for p in params]
+    column, op, value = term.split(".", 2)
+    if op == "in":
+        value = [v.strip('"') for v in _split_terms(value.strip("()"))]
+    else:
+        value = value.strip('"')
+    return _condition(column, op, value)
+
+
+class LocalStore:
+    """SQLite tables (one per Supabase table) plus the vector RPCs"""
+
+    def __init__(self, path=LOCAL_STORAGE_DB):
+        self.path = path
+        self._local = threading.local()
+        self._tables = set()
+        self._tables_lock = threading.Lock()
+        self._matrices_lock = threading.Lock()
+        self._matrices = {}
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._local.connection = connection
+        return connection
+
+    def _table(self, name):
+        name = _identifier(name)
+        if name not in self._tables:
+            with self._tables_lock:
+                self._connection().execute(
+                    f'CREATE TABLE IF NOT EXISTS "{name}" (id TEXT PRIMARY KEY, data BLOB NOT NULL, embedding BLOB)'
+                )
+                self._tables.add(name)
+        return f'"{name}"'
+
+    def version(self, table):
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (f"version:{table}",)).fetchone()
+        return None if row is None else row[0]
+
+    def _touch(self, connection, table):
+        connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (f"version:{table}", uuid.uuid4().hex)
+        )
+
+    @staticmethod
+    def _decode(data, embedding):
+        row = orjson.loads(data)
+        if embedding is not None:
+            row["embedding"] = np.frombuffer(embedding, dtype=np.float32).tolist()
+        return row
+
+    @staticmethod
+    def _encode(row):
+        row = dict(row)
+        embedding = row.pop("embedding", None)
+        blob = None if embedding is None else _embedding(embedding).tobytes()
+        return str(row["id"]), orjson.dumps(row, option=orjson.OPT_SERIALIZE_NUMPY), blob
+
+    # -- table operations -------------------------------------------------
+
+    def select(self, table, where="", params=(), order="", limit=None):
+        sql = f"SELECT data, embedding FROM {self._table(table)}"
+        if where:
+            sql += f" WHERE {where}"
+        if order:
+            sql += f" ORDER BY {order}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [self._decode(data, embedding) for data, embedding in self._connection().execute(sql, list(params))]
+
+    def insert(self, table, rows, upsert=False):
+        now = datetime.now(timezone.utc).isoformat()
+        rows = [{**row, "id": row.get("id") or str(uuid.uuid4()), "updated_at": row.get("updated_at") or now}
+                for row in rows]
+        name = self._table(table)
+        connection = self._connection()
+        verb = "INSERT OR REPLACE" if upsert else "INSERT"
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                f"{verb} INTO {name} (id, data, embedding) VALUES (?, ?, ?)", [self._encode(row) for row in rows]
+            )
+            self._touch(connection, table)
+            connection.execute("COMMIT")
+        except sqlite3.IntegrityError as e:
+            connection.execute("ROLLBACK")
+            raise StorageError(f"duplicate key value violates unique constraint on {table}: {e}") from e
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return rows
+
+    def update(self, table, values, where="", params=()):
+        now = datetime.now(timezone.utc).isoformat()
+        name = self._table(table)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = [{**row, **values, "updated_at": values.get("updated_at") or now}
+                    for row in self.select(table, where, params)]
+            connection.executemany(
+                f"UPDATE {name} SET data = ?, embedding = ? WHERE id = ?",
+                [(data, blob, row_id) for row_id, data, blob in map(self._encode, rows)],
+            )
+            self._touch(connection, table)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return rows
+
+    def delete(self, table, where="", params=()):
+        name = self._table(table)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self.select(table, where, params)
+            connection.execute(f"DELETE FROM {name}" + (f" WHERE {where}" if where else ""), list(params))
+            self._touch(connection, table)
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return rows
+
+    # -- vector RPCs ------------------------------------------------------
+
+    def _matrix(self, table, key_column):
+        """
+        LiveMatrix of a table's embeddings, reloaded after writes. Job vectors
+        of expired postings are masked out (see lifecycle.py).
+        """
+        version = self.version(table)
+        with self._matrices_lock:
+            cached = self._matrices.get(table)
+            if cached is None or cached[0] != version:
+                # Under `manage.py serve` the master publishes the job matrix to shared memory
+                shared = shared_snapshot(f"storage:{version}") if table == "vector_table" else None
+                cached = (version, LiveMatrix(*(shared or self.load_matrix(table, key_column))))
+            if table == "vector_table":
+                cached = (version, cached[1].refreshed())
+            self._matrices[table] = cached
+            return cached[1]
+
+    def load_matrix(self, table, key_column):
+        rows = self._connection().execute(
+            f"SELECT {_column(key_column)}, embedding FROM {self._table(table)} WHERE embedding IS NOT NULL"
+        ).fetchall()
+        keys = [str(key) for key, _ in rows]
+        if not rows:
+            return keys, np.zeros((0, 0), dtype=np.float32)
+        matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+        return keys, matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+    def _ranked(self, table, key_column, params):
+        """Keys above the threshold with their cosine similarity, best first"""
+        live = self._matrix(table, key_column)
+        if not live.keys:
+            return []
+        query = _embedding(params["query_embedding"])
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        with span("local_vector_search"):
+            scores = live.scores(query)
+        above = np.flatnonzero(scores > float(params.get("match_threshold", 0.0)))
+        above = above[np.argsort(-scores[above], kind="stable")]
+        return [(live.keys[i], float(scores[i])) for i in above]
+
+    def _rows_by_id(self, table, ids):
+        if not ids:
+            return {}
+        rows = self.select(table, f"id IN ({','.join('?' * len(ids))})", ids)
+        return {str(row["id"]): row for row in rows}
+
+    def match_filtered_job_descriptions(self, params):
+        count = int(params.get("match_count", 10))
+        ranked, seen = [], set()
+        for job_id, score in self._ranked("vector_table", "job_id", params):
+            # A job with several vectors counts once, at its best similarity
+            if job_id not in seen:
+                seen.add(job_id)
+                ranked.append((job_id, score))
+        results = []
+        # Vectors whose job row is missing drop out, as with the SQL join
+        for start in range(0, len(ranked), max(count, 1) * 2):
+            batch = ranked[start:start + count * 2]
+            jobs = self._rows_by_id("job_description", [job_id for job_id, _ in batch])
+            results.extend(dict(jobs[job_id], similarity=score) for job_id, score in batch if job_id in jobs)
+            if len(results) >= count:
+                break
+        return results[:count]
+
+    def match_candidates(self, params):
+        ranked = self._ranked("resume_vectors", "id", params)[:int(params.get("match_count", 10))]
+        resumes = self._rows_by_id("resume_vectors", [resume_id for resume_id, _ in ranked])
+        return [
+            {"id": resumes[resume_id]["id"], "name": resumes[resume_id].get("name"),
+             "text": resumes[resume_id].get("text"), "similarity": score}
+            for resume_id, score in ranked if resume_id in resumes
+        ]
+
+    def rpc(self, name, params):
+        if name not in ("match_filtered_job_descriptions", "match_candidates"):
+            raise StorageError(f"Unknown function '{name}'")
+        return getattr(self, name)(params)
+
+
+class _Executable:
+    def __init__(self, asynchronous):
+        self._asynchronous = asynchronous
+
+    def execute(self):
+        """LocalResponse, or a coroutine returning it for the async client"""
+        if self._asynchronous:
+            return self._execute_async()
+        return LocalResponse(self._run())
+
+    async def _execute_async(self):
+        return LocalResponse(await run_cpu(self._run))
+
+
+class LocalQuery(_Executable):
+    def __init__(self, store, table, asynchronous):
+        super().__init__(asynchronous)
+        self._store = store
+        self._table = table
+        self._action = "select"
+        self._columns = ["*"]
+        self._payload = None
+        self._upsert = False
+        self._conditions = []
+        self._params = []
+        self._order = []
+        self._limit = None
+
+    def select(self, *columns, count=None):
+        self._action = "select"
+        self._columns = [c.strip() for column in columns for c in column.split(",")] or ["*"]
+        return self
+
+    def insert(self, json, upsert=False, **kwargs):
+        self._action = "insert"
+        self._payload = json if isinstance(json, list) else [json]
+        self._upsert = upsert
+        return self
+
+    def upsert(self, json, **kwargs):
+        return self.insert(json, upsert=True)
+
+    def update(self, json, **kwargs):
+        self._action = "update"
+        self._payload = json
+        return self
+
+    def delete(self, **kwargs):
+        self._action = "delete"
+        return self
+
+    def _filter(self, column, op, value):
+        sql, params = _condition(column, op, value)
+        self._conditions.append(sql)
+        self._params.extend(params)
+        return self
+
+    def eq(self, column, value):
+        return self._filter(column, "eq", value)
+
+    def neq(self, column, value):
+        return self._filter(column, "neq", value)
+
+    def gt(self, column, value):
+        return self._filter(column, "gt", value)
+
+    def gte(self, column, value):
+        return self._filter(column, "gte", value)
+
+    def lt(self, column, value):
+        return self._filter(column, "lt", value)
+
+    def lte(self, column, value):
+        return self._filter(column, "lte", value)
+
+    def in_(self, column, values):
+        return self._filter(column, "in", values)
+
+    def or_(self, filters):
+        sql, params = _logic(f"or({filters})")
+        self._conditions.append(sql)
+        self._params.extend(params)
+        return self
+
+    def order(self, column, desc=False, **kwargs):
+        self._order.append(f"{_column(column)} {'DESC' if desc else 'ASC'}")
+        return self
+
+    def limit(self, size, **kwargs):
+        self._limit = size
+        return self
+
+    def _run(self):
+        where = " AND ".join(self._conditions)
+        if self._action == "insert":
+            return self._store.insert(self._table, self._payload, upsert=self._upsert)
+        if self._action == "update":
+            return self._store.update(self._table, self._payload, where, self._params)
+        if self._action == "delete":
+            return self._store.delete(self._table, where, self._params)
+        rows = self._store.select(self._table, where, self._params, ", ".join(self._order), self._limit)
+        if self._columns != ["*"]:
+            rows = [{column: row.get(column) for column in self._columns} for row in rows]
+        return rows
+
+
+class LocalRPC(_Executable):
+    def __init__(self, store, name, params, asynchronous):
+        super().__init__(asynchronous)
+        self._store = store
+        self._name = name
+        self._params = params
+
+    def _run(self):
+        return self._store.rpc(self._name, self._params)
+
+
+class LocalClient:
+    """Drop-in for the supabase-py Client (or AsyncClient) over a LocalStore"""
+
+    def __init__(self, store, asynchronous=False):
+        self.store = store
+        self.asynchronous = asynchronous
+
+    def table(self, name):
+        return LocalQuery(self.store, name, self.asynchronous)
+
+    from_ = table
+
+    def rpc(self, name, params=None):
+        return LocalRPC(self.store, name, params or {}, self.asynchronous)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_local_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = LocalStore()
+    return _store
+
+
+def local_client(asynchronous=False):
+    return LocalClient(get_local_store(), asynchronous)
@@ -1,3 +1,1351 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from decimal import Decimal
+from unittest import mock
+from datetime import datetime, timedelta, timezone
 
-# Create your tests here.
+import httpx
+import numpy as np
+from asgiref.sync import async_to_sync
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import BinaryField
+from django.db.models.functions import Cast
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils.functional import lazystr
+from django.utils import timezone as django_timezone
+
+from . import (admission, compression, dedup, instrumentation, lifecycle, mirror, precompute, ranking, renderers,
+               sharedmatrix, storage, typeahead, views)
+from .chunking import chunk_text, split_sections
+from .clients import run_cpu
+from .dedup import DuplicateIndex, minhash_signature, posting_text, signature_to_bytes, similarity
+from .embeddings import EMBEDDING_DIM, encode, load_model, maxsim_scores, pack_vectors
+from .models import JobDescription, Resume, ResumeAnalysis
+from .middleware import timing_middleware
+from .ocr import TesserocrEngine
+from .quantization import PQIndex, ProductQuantizer, normalize
+from .ranking import Deadline, LRUCache, rerank_with_cross_encoder, run_stage
+from .singleflight import LeaseStore, SingleFlight
+from .storage import LocalClient, LocalQuery, LocalStore, StorageError
+from .typeahead import TypeaheadIndex
+
+SAMPLE_TEXTS = [
+    "Senior Python developer with 6 years of Django and PostgreSQL experience.",
+    "SKILLS: React, TypeScript, Next.js, Tailwind CSS, REST and GraphQL APIs.",
+    "Responsibilities: build data pipelines in Spark and Airflow on AWS.",
+    "Certified Scrum Master, led a team of five engineers through agile delivery.",
+]
+
+
+def _installed(*modules):
+    return all(importlib.util.find_spec(m) is not None for m in modules)
+
+
+@unittest.skipUnless(
+    _installed("sentence_transformers", "torch", "onnxruntime", "optimum"),
+    "ONNX parity test needs sentence-transformers, torch, onnxruntime and optimum",
+)
+class EmbeddingBackendParityTests(SimpleTestCase):
+    """The ONNX backends must produce the same vectors as PyTorch within tolerance"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reference = encode(SAMPLE_TEXTS, model=load_model("torch"))
+
+    def test_onnx_matches_torch(self):
+        vectors = encode(SAMPLE_TEXTS, model=load_model("onnx"))
+        self.assertEqual(vectors.shape, self.reference.shape)
+        np.testing.assert_allclose(vectors, self.reference, atol=1e-4)
+
+    def test_quantized_onnx_close_to_torch(self):
+        vectors = encode(SAMPLE_TEXTS, model=load_model("onnx-int8"))
+        cosine = np.sum(vectors * self.reference, axis=1)
+        self.assertTrue(np.all(cosine > 0.98), f"int8 cosine similarity too low: {cosine}")
+
+
+class ChunkingTests(SimpleTestCase):
+    """Section-aware chunking and max-sim scoring over the chunks"""
+
+    def test_sections_and_windows(self):
+        text = "Jane Doe\nSKILLS\nPython Django\nExperience:\n" + " ".join(f"w{i}" for i in range(25))
+        self.assertEqual([heading for heading, _ in split_sections(text)], ["", "SKILLS", "Experience"])
+        chunks = chunk_text(text, max_words=10, overlap=2)
+        first_window = "Experience: " + " ".join(f"w{i}" for i in range(10))
+        self.assertEqual(chunks[:3], ["Jane Doe", "SKILLS: Python Django", first_window])
+        # Windows overlap by two words and the last one ends the section
+        self.assertTrue(chunks[3].startswith("Experience: w8 w9 "))
+        self.assertTrue(chunks[-1].endswith("w24"))
+
+    def test_chunk_budget_is_shared_across_sections(self):
+        text = "EXPERIENCE\n" + " ".join(["word"] * 500) + "\nEDUCATION\nB.Tech"
+        chunks = chunk_text(text, max_words=20, overlap=0, max_chunks=4)
+        self.assertEqual(len(chunks), 4)
+        self.assertIn("EDUCATION: B.Tech", chunks)
+
+    def test_maxsim_scores(self):
+        rng = np.random.default_rng(0)
+        query = rng.normal(size=(3, 8)).astype(np.float32)
+        docs = [rng.normal(size=(n, 8)).astype(np.float32) for n in (4, 0, 1, 6)]
+        expected = [(query @ doc.T).max(axis=1).mean() if len(doc) else 0.0 for doc in docs]
+        np.testing.assert_allclose(maxsim_scores(query, docs), expected, rtol=1e-5)
+        self.assertEqual(maxsim_scores(query[:0], docs).tolist(), [0.0] * 4)
+
+
+class InstrumentationTests(SimpleTestCase):
+    """Spans reach the Server-Timing header and /metrics, and cost nothing when disabled"""
+
+    def _view(self, request):
+        with instrumentation.span("db"):
+            pass
+        for _ in range(2):
+            with instrumentation.span("encode"):
+                pass
+        instrumentation.cache_event("test_cache", True)
+        return views.HttpResponse("ok")
+
+    def _timings(self, response):
+        return [part.split(";")[0] for part in response["Server-Timing"].split(", ")]
+
+    def test_server_timing(self):
+        with self.assertLogs("myapp.requests") as logs:
+            response = timing_middleware(self._view)(RequestFactory().get("/"))
+        self.assertEqual(self._timings(response), ["db", "encode", "total"])
+        self.assertIn(';desc="2x"', response["Server-Timing"].split(", ")[1])
+        self.assertEqual(json.loads(logs.records[0].getMessage())["spans"]["encode"]["count"], 2)
+
+        async def view(request):
+            return self._view(request)
+
+        # Spans outside a request are not attributed to the next one
+        with instrumentation.span("outside"):
+            pass
+        with self.assertLogs("myapp.requests"):
+            response = async_to_sync(timing_middleware(view))(RequestFactory().get("/"))
+        self.assertEqual(self._timings(response), ["db", "encode", "total"])
+
+    def test_metrics_endpoint(self):
+        with self.assertLogs("myapp.requests"):
+            timing_middleware(self._view)(RequestFactory().get("/"))
+            response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn("# TYPE jobsync_span_duration_seconds histogram", body)
+        self.assertIn('jobsync_span_duration_seconds_bucket{span="encode",le="+Inf"}', body)
+        self.assertIn('jobsync_span_duration_seconds_count{span="encode"}', body)
+        self.assertIn("# TYPE jobsync_request_duration_seconds histogram", body)
+        self.assertIn("# TYPE jobsync_cache_total counter", body)
+        self.assertIn('jobsync_cache_total{cache="test_cache",result="hit"}', body)
+        self.assertIn("Server-Timing", response)
+
+    def test_disabled(self):
+        with mock.patch.object(instrumentation, "ENABLED", False):
+            self.assertIs(instrumentation.span("db"), instrumentation._NULL_SPAN)
+            response = timing_middleware(self._view)(RequestFactory().get("/"))
+            self.assertNotIn("Server-Timing", response)
+            before = instrumentation.render_metrics()
+            instrumentation.cache_event("disabled_cache", True)
+            instrumentation.event("disabled_event")
+            self.assertEqual(instrumentation.render_metrics(), before)
+
+
+class JobAnalysisFanoutTests(SimpleTestCase):
+    """One Groq request per job, the fallback model only after the primary failed"""
+
+    def setUp(self):
+        self.calls = []
+        patcher = mock.patch.object(views, "request_groq_analysis", self._fake_groq)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache = mock.patch.object(views, "job_sections", LRUCache(10))
+        cache.start()
+        self.addCleanup(cache.stop)
+
+    async def _fake_groq(self, model_name, prompt, groq_api_key, max_tokens=2048):
+        self.calls.append((model_name, "Kafka" in prompt))
+        if "Kafka" in prompt:
+            # The second job fails with every model
+            if model_name == views.ANALYSIS_MODELS[0]:
+                raise httpx.ConnectError("refused")
+            return None
+        return f"Analysis by {model_name}. " * 10
+
+    def test_partial_fallback(self):
+        jobs = [
+            {"id": "a", "title": "Backend Engineer", "description": "Python and Django"},
+            {"id": "b", "title": "Data Engineer", "description": "Kafka and Spark"},
+        ]
+        analysis, complete = asyncio.run(views.analyze_jobs("Python developer", jobs, "key", Deadline(5)))
+        self.assertFalse(complete)
+        primary, fallback = views.ANALYSIS_MODELS
+        self.assertIn(f"Analysis by {primary}", analysis)
+        self.assertIn("without AI assistance", analysis.split("## Job 2")[1])
+        self.assertNotIn("without AI assistance", analysis.split("## Job 2")[0])
+        # The fallback model is only asked about the job the primary failed on
+        self.assertEqual(sorted(self.calls), sorted([(primary, False), (primary, True), (fallback, True)]))
+
+
+class _FakeCrossEncoder:
+    def __init__(self):
+        self.queries = []
+
+    def predict(self, pairs, batch_size):
+        self.queries.extend(query for query, _ in pairs)
+        return [text.count("Python") for _, text in pairs]
+
+
+class CascadeStageTests(SimpleTestCase):
+    """Each stage's ordering, and the fallback when a stage runs out of time"""
+
+    def setUp(self):
+        self.jobs = [
+            {"id": "a", "title": "Designer", "description": "Figma and user research"},
+            {"id": "b", "title": "Python Engineer", "description": "Python, Django and Python tooling"},
+            {"id": "c", "title": "Backend Engineer", "description": "Python services"},
+        ]
+
+    def test_stage_timeout_falls_back_and_stops_the_work(self):
+        stopped = threading.Event()
+
+        def busy(deadline):
+            while not deadline.expired():
+                time.sleep(0.005)
+            stopped.set()
+            return None
+
+        async def run():
+            return await run_stage("slow", Deadline(5), lambda stage_deadline: run_cpu(busy, stage_deadline))
+
+        with mock.patch.dict(ranking.STAGE_BUDGETS, {"slow": 0.05}):
+            self.assertIsNone(asyncio.run(run()))
+        # The CPU work checks the same deadline, so it does not outlive the stage
+        self.assertTrue(stopped.wait(1))
+
+    def test_stage_result_within_budget(self):
+        async def run():
+            return await run_stage("fast", Deadline(5), lambda _: run_cpu(sorted, [3, 1, 2]))
+
+        with mock.patch.dict(ranking.STAGE_BUDGETS, {"fast": 1}):
+            self.assertEqual(asyncio.run(run()), [1, 2, 3])
+
+    def test_chunk_stage_ordering(self):
+        axes = np.eye(EMBEDDING_DIM, dtype=np.float32)
+        resume_chunks = axes[:2]
+        # "a" is stored and orthogonal, "b" matches a resume chunk exactly, "c" is encoded and matches half-way
+        stored = {"a": pack_vectors(axes[5:6]), "b": pack_vectors(axes[1:2])}
+        halfway = normalize((axes[0] + axes[7])[None, :])
+        with mock.patch.object(views, "embed_documents", return_value=[halfway]) as embed:
+            ranked = views.rerank_by_chunks([dict(job) for job in self.jobs], resume_chunks, stored, Deadline(5))
+        embed.assert_called_once_with(["Python services"], max_chunks=8)
+        self.assertEqual([job["id"] for job in ranked], ["b", "c", "a"])
+        # Max-sim averages over the resume chunks: one of the two matches exactly
+        self.assertEqual(ranked[0]["chunk_similarity"], 0.5)
+
+    def test_chunk_stage_stops_at_deadline(self):
+        with mock.patch.object(views, "embed_documents") as embed:
+            ranked = views.rerank_by_chunks(
+                [dict(job) for job in self.jobs], np.eye(EMBEDDING_DIM, dtype=np.float32)[:1], {}, Deadline(0)
+            )
+        self.assertIsNone(ranked)
+        embed.assert_not_called()
+
+    def test_cross_encoder_ordering(self):
+        model = _FakeCrossEncoder()
+        with mock.patch.object(ranking, "_cross_encoder", model), \
+                mock.patch.object(ranking, "pair_scores", LRUCache(10)):
+            ranked = rerank_with_cross_encoder("Python " * 1000, self.jobs, Deadline(5))
+            self.assertEqual([job["id"] for job in ranked], ["b", "c", "a"])
+            self.assertEqual(ranked[0]["rerank_score"], 3.0)
+            # Only a short query goes to the model, the rest of the 512 tokens are the job's
+            self.assertTrue(all(len(query) == ranking.CROSS_ENCODER_QUERY_CHARS for query in model.queries))
+            # Cached scores need no model and no time
+            self.assertEqual(rerank_with_cross_encoder("Python " * 1000, self.jobs, Deadline(0)), ranked)
+            self.assertIsNone(rerank_with_cross_encoder("Java developer", self.jobs, Deadline(0)))
+
+    def test_cross_encoder_skipped_while_loading(self):
+        with mock.patch.object(ranking, "_cross_encoder", None), \
+                mock.patch.object(ranking, "warm_cross_encoder") as warm:
+            self.assertIsNone(rerank_with_cross_encoder("Python", self.jobs, Deadline(5)))
+        warm.assert_called_once_with()
+
+
+class _FakeTessBaseAPI:
+    instances = []
+
+    def __init__(self, lang):
+        self.instances.append(self)
+
+    def SetPageSegMode(self, psm):
+        pass
+
+    def SetImage(self, image):
+        pass
+
+    def SetSourceResolution(self, dpi):
+        pass
+
+    def GetUTF8Text(self):
+        return "text"
+
+    def Clear(self):
+        pass
+
+
+class TesserocrPoolTests(SimpleTestCase):
+    """In-process Tesseract APIs are pooled per process, not per thread"""
+
+    def setUp(self):
+        _FakeTessBaseAPI.instances = []
+        fake = mock.patch.dict(sys.modules, {"tesserocr": mock.Mock(PyTessBaseAPI=_FakeTessBaseAPI)})
+        fake.start()
+        self.addCleanup(fake.stop)
+
+    def test_sequential_calls_reuse_the_api(self):
+        engine = TesserocrEngine(pool_size=2)
+        self.assertEqual(engine.recognize(None), "text")
+        # A new thread per request, as under ASGI
+        worker = threading.Thread(target=engine.recognize, args=(None,))
+        worker.start()
+        worker.join()
+        self.assertEqual(len(_FakeTessBaseAPI.instances), 1)
+
+    def test_pool_is_bounded(self):
+        engine = TesserocrEngine(pool_size=2)
+        with engine._api() as first, engine._api() as second:
+            self.assertIsNot(first, second)
+            waiter = threading.Thread(target=engine.recognize, args=(None,))
+            waiter.start()
+            waiter.join(0.2)
+            # The third page waits for an API instead of creating one
+            self.assertTrue(waiter.is_alive())
+        waiter.join()
+        self.assertEqual(len(_FakeTessBaseAPI.instances), 2)
+
+
+POSTING = (
+    "We are hiring a backend engineer to design, build and operate the APIs behind our hiring platform. "
+    "You will work with Python, Django and PostgreSQL, own services end to end, review code, mentor "
+    "junior engineers and take part in the on-call rotation. Experience with AWS and Docker is a plus."
+)
+
+
+class DuplicateDetectionTests(TestCase):
+    """MinHash/LSH flags reposted jobs but not different ones"""
+
+    def test_index_finds_near_duplicates(self):
+        original = minhash_signature(posting_text("Backend Engineer", POSTING))
+        repost = minhash_signature(posting_text("Backend Engineer", POSTING.replace("is a plus", "is nice to have")))
+        other = minhash_signature(posting_text("Data Analyst", "Build dashboards in Tableau and write SQL reports."))
+        self.assertGreater(similarity(original, repost), 0.8)
+        self.assertLess(similarity(original, other), 0.2)
+        index = DuplicateIndex()
+        index.add("original", original)
+        self.assertEqual(index.best_match(repost)[0], "original")
+        self.assertIsNone(index.best_match(other))
+        index.remove("original")
+        self.assertIsNone(index.best_match(repost))
+
+    def test_bulk_command_flags_later_copies(self):
+        first = JobDescription.objects.create(title="Backend Engineer", company="Acme", domain="Software",
+                                              description=POSTING)
+        copy = JobDescription.objects.create(title="Backend Engineer", company="Staffing Co", domain="Software",
+                                             description=POSTING + " Apply today.")
+        other = JobDescription.objects.create(title="Data Analyst", company="Acme", domain="Data",
+                                              description="Build dashboards in Tableau and write SQL reports.")
+        call_command("dedup_jobs", stdout=io.StringIO())
+        duplicates = dict(JobDescription.objects.values_list("id", "duplicate_of_id"))
+        self.assertEqual(duplicates, {first.id: None, copy.id: first.id, other.id: None})
+        self.assertFalse(JobDescription.objects.filter(minhash=None).exists())
+
+    def test_purge_splits_id_filters(self):
+        jobs = [
+            JobDescription.objects.create(title="Backend Engineer", company=f"Agency {i}", domain="Software",
+                                          description=POSTING + f" Ref {i}.")
+            for i in range(4)
+        ]
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        client = LocalClient(LocalStore(os.path.join(tmp.name, "storage.sqlite3")))
+        client.table("job_description").insert([{"id": str(job.id)} for job in jobs]).execute()
+        filtered = []
+        real_in = LocalQuery.in_
+
+        def in_(query, column, values):
+            filtered.append(len(values))
+            return real_in(query, column, values)
+
+        with mock.patch.object(views, "get_supabase_client", return_value=client), \
+                mock.patch.object(lifecycle, "ARCHIVE_FILTER_IDS", 2), mock.patch.object(LocalQuery, "in_", in_):
+            call_command("dedup_jobs", "--purge-vectors", "--batch-size", "500", stdout=io.StringIO())
+        # Three copies, two ids per filter on each table, whatever the scan batch size
+        self.assertEqual(filtered, [2, 2, 1, 1])
+        self.assertEqual([row["id"] for row in client.table("job_description").select("id").execute().data],
+                         [str(jobs[0].id)])
+
+    def test_index_picks_up_other_workers_postings(self):
+        self.addCleanup(setattr, dedup, "_index", None)
+        self.addCleanup(setattr, dedup, "_watermark", None)
+        dedup._index = dedup._watermark = None
+        signature = minhash_signature(posting_text("Backend Engineer", POSTING))
+        index = dedup.get_duplicate_index()
+        self.assertIsNone(index.best_match(signature))
+        # Stored by another worker
+        job = JobDescription.objects.create(title="Backend Engineer", company="Acme", domain="Software",
+                                            description=POSTING, minhash=signature_to_bytes(signature))
+        self.assertIsNone(dedup.get_duplicate_index().best_match(signature))
+        with mock.patch.object(dedup, "DEDUP_SYNC_SECONDS", 0):
+            self.assertEqual(dedup.get_duplicate_index().best_match(signature)[0], str(job.id))
+
+
+class AdmissionTests(SimpleTestCase):
+    """Rate limits answer 429 and full concurrency limits 503, both with Retry-After"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for patcher in (
+            mock.patch.dict(admission._limiters, {"test": admission.ConcurrencyLimiter("test", 1, 0, timeout=0.1)}),
+            mock.patch.dict(admission._rates, {"test": (0.01, 2)}),
+            mock.patch.object(admission, "_buckets", admission.TokenBucketStore(os.path.join(self.tmp.name, "rl"))),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.request = RequestFactory().get("/", REMOTE_ADDR="10.0.0.1")
+
+    def test_rate_limited(self):
+        view = admission.admit("test")(lambda request: views.JsonResponse({"ok": True}))
+        self.assertEqual([view(self.request).status_code for _ in range(2)], [200, 200])
+        response = view(self.request)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "100")
+        other_client = RequestFactory().get("/", REMOTE_ADDR="10.0.0.2")
+        self.assertEqual(view(other_client).status_code, 200)
+
+    def test_busy(self):
+        release = asyncio.Event()
+
+        @admission.admit("test")
+        async def view(request):
+            await release.wait()
+            return views.JsonResponse({"ok": True})
+
+        async def requests():
+            first = asyncio.create_task(view(self.request))
+            while not admission._limiters["test"]._active:
+                await asyncio.sleep(0.01)
+            rejected = await view(self.request)
+            release.set()
+            return await first, rejected
+
+        done, rejected = asyncio.run(requests())
+        self.assertEqual(done.status_code, 200)
+        self.assertEqual(rejected.status_code, 503)
+        self.assertEqual(rejected["Retry-After"], "1")
+
+    def test_streaming_response_keeps_slot(self):
+        limiter = admission._limiters["test"]
+
+        @admission.admit("test")
+        def view(request):
+            return StreamingHttpResponse(iter([b"a", b"b"]))
+
+        response = view(self.request)
+        self.assertEqual(limiter._active, 1)
+        self.assertEqual(view(RequestFactory().get("/", REMOTE_ADDR="10.0.0.2")).status_code, 503)
+        self.assertEqual(b"".join(response), b"ab")
+        self.assertEqual(limiter._active, 0)
+        # Closed without being sent, and closed twice: released once
+        response = view(self.request)
+        response.close()
+        response.close()
+        self.assertEqual(limiter._active, 0)
+
+
+class RendererTests(SimpleTestCase):
+    """orjson output must match DjangoJSONEncoder"""
+
+    def test_matches_django_encoder(self):
+        data = {
+            "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+            "created_at": datetime(2025, 3, 1, 12, 30, 5, 123456, tzinfo=timezone.utc),
+            "naive": datetime(2025, 3, 1, 12, 30),
+            "day": datetime(2025, 3, 1).date(),
+            "ttl": timedelta(days=60, seconds=5),
+            "salary": Decimal("1234.50"),
+            "label": lazystr("Software Development"),
+            "rows": [(1, "a"), {"nested": None, "ok": True, "score": 0.25}],
+        }
+        self.assertEqual(renderers.dumps(data).decode(), json.dumps(data, cls=DjangoJSONEncoder, separators=(",", ":")))
+
+    def test_unknown_types_raise(self):
+        for value in ({"a"}, object(), b"bytes"):
+            with self.assertRaises(TypeError):
+                renderers.dumps({"value": value})
+
+    def test_json_response_keeps_django_signature(self):
+        response = renderers.JsonResponse([1, 2], safe=False, json_dumps_params={"indent": 2})
+        self.assertEqual(response.content, b"[\n  1,\n  2\n]")
+
+        class Encoder(DjangoJSONEncoder):
+            def default(self, o):
+                return sorted(o) if isinstance(o, set) else super().default(o)
+
+        self.assertEqual(renderers.JsonResponse({"tags": {"b", "a"}}, encoder=Encoder).content, b'{"tags": ["a", "b"]}')
+
+    def test_job_payload_cache(self):
+        cache = renderers.JobPayloadCache()
+        row = {"id": "a", "title": "SRE", "updated_at": "2025-03-01T12:00:00+00:00"}
+        self.assertEqual(cache.render_list([row], "supabase"), b"[" + renderers.dumps(row) + b"]")
+        self.assertEqual(cache.get(dict(row, title="Changed"), "supabase"), cache.get(row, "supabase"))
+        # The mirror's copy of the same row is cached apart
+        mirrored = dict(row, title="Mirrored")
+        self.assertIn(b"Mirrored", cache.get(mirrored, "mirror"))
+        self.assertEqual(len(cache), 2)
+        edited = dict(row, title="Edited", updated_at="2025-03-02T12:00:00+00:00")
+        self.assertIn(b"Edited", cache.get(edited, "supabase"))
+        # Without a version a row could never be refreshed, so it is not cached
+        unversioned = {"id": "b", "title": "QA"}
+        cache.render_list([unversioned], "supabase")
+        self.assertIn(b"Tester", cache.get(dict(unversioned, title="Tester"), "supabase"))
+        self.assertEqual(len(cache), 2)
+        cache.invalidate("a")
+        self.assertEqual(len(cache), 0)
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Identical concurrent calls run once, within a worker and across workers"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "singleflight.sqlite3")
+        self.calls = 0
+
+    def _worker(self):
+        # Each SingleFlight with its own LeaseStore on the shared file stands in for a uvicorn worker
+        return SingleFlight("test", shared=True, store=LeaseStore(self.path))
+
+    async def _compute(self, value=42, delay=0.2):
+        self.calls += 1
+        await asyncio.sleep(delay)
+        return {"value": value}
+
+    def test_followers_share_the_leader_result(self):
+        first, second = self._worker(), self._worker()
+
+        async def main():
+            return await asyncio.gather(
+                first.do("key", self._compute), first.do("key", self._compute), second.do("key", self._compute)
+            )
+
+        self.assertEqual(asyncio.run(main()), [{"value": 42}] * 3)
+        self.assertEqual(self.calls, 1)
+        # Published for late retries in other workers too
+        self.assertEqual(self._worker().do_sync("key", lambda: {"value": 0}), {"value": 42})
+
+    def test_leader_error(self):
+        flight = self._worker()
+
+        async def failing():
+            await asyncio.sleep(0.05)
+            raise ValueError("boom")
+
+        async def main():
+            return await asyncio.gather(flight.do("key", failing), flight.do("key", failing), return_exceptions=True)
+
+        results = asyncio.run(main())
+        self.assertTrue(all(isinstance(result, ValueError) for result in results))
+        # Nothing was published and the lease is free for the next caller
+        self.assertIsNone(flight.store.result("key"))
+        self.assertEqual(flight.do_sync("key", lambda: "retried"), "retried")
+
+    def test_lease_expiry(self):
+        store = LeaseStore(self.path)
+        self.assertTrue(store.acquire("key", "crashed", seconds=60))
+        self.assertFalse(store.acquire("key", "other"))
+        self.assertTrue(store.acquire("expired", "crashed", seconds=-1))
+        self.assertTrue(store.acquire("expired", "other"))
+
+
+class LocalStorageTests(TestCase):
+    """The SQLite backend must answer the queries and RPCs like Supabase"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = LocalStore(os.path.join(self.tmp.name, "storage.sqlite3"))
+        self.client = LocalClient(self.store)
+        jobs = [
+            {"id": "a", "domain": "DevOps", "description": "Kubernetes"},
+            {"id": "b", "domain": "Data Science", "description": "Spark"},
+            {"id": "c", "domain": "DevOps", "description": "Terraform"},
+        ]
+        self.client.table("job_description").insert(jobs).execute()
+        vectors = {"a": [1.0, 0.0], "b": [0.0, 1.0], "c": [0.8, 0.6]}
+        self.client.table("vector_table").insert(
+            [{"job_id": job_id, "embedding": embedding} for job_id, embedding in vectors.items()]
+        ).execute()
+
+    def test_select_eq_and_columns(self):
+        rows = self.client.table("job_description").select("*").eq("domain", "DevOps").execute().data
+        self.assertEqual(sorted(row["id"] for row in rows), ["a", "c"])
+        self.assertTrue(all(row["updated_at"] for row in rows))
+        domains = self.client.table("job_description").select("domain").execute().data
+        self.assertEqual(sorted(row["domain"] for row in domains), ["Data Science", "DevOps", "DevOps"])
+
+    def test_or_order_limit(self):
+        rows = (self.client.table("job_description").select("id")
+                .or_('id.gt."b",and(domain.eq."DevOps",id.eq."a")').order("id").limit(5).execute().data)
+        self.assertEqual([row["id"] for row in rows], ["a", "c"])
+
+    def test_duplicate_id_rejected(self):
+        with self.assertRaises(StorageError):
+            self.client.table("job_description").insert({"id": "a", "domain": "DevOps"}).execute()
+
+    def test_match_filtered_job_descriptions(self):
+        params = {"query_embedding": [1.0, 0.0], "match_threshold": 0.5, "match_count": 10}
+        rows = self.client.rpc("match_filtered_job_descriptions", params).execute().data
+        self.assertEqual([row["id"] for row in rows], ["a", "c"])
+        self.assertAlmostEqual(rows[1]["similarity"], 0.8, places=5)
+        params["match_count"] = 1
+        self.assertEqual(len(self.client.rpc("match_filtered_job_descriptions", params).execute().data), 1)
+
+    def test_match_candidates_sees_new_rows(self):
+        params = {"query_embedding": [0.0, 2.0], "match_threshold": 0.2, "match_count": 10}
+        self.assertEqual(self.client.rpc("match_candidates", params).execute().data, [])
+        self.client.table("resume_vectors").insert(
+            {"id": 7, "name": "cv.pdf", "text": "Spark", "embedding": [0.1, 1.0]}
+        ).execute()
+        rows = self.client.rpc("match_candidates", params).execute().data
+        self.assertEqual([(row["id"], row["name"]) for row in rows], [(7, "cv.pdf")])
+
+    def test_async_client(self):
+        client = LocalClient(self.store, asynchronous=True)
+
+        async def domains():
+            return (await client.table("job_description").select("domain").eq("id", "b").execute()).data
+
+        self.assertEqual(asyncio.run(domains()), [{"domain": "Data Science"}])
+
+
+class SharedMatrixTests(SimpleTestCase):
+    """Workers attach to the master's matrix and follow its publications"""
+
+    def setUp(self):
+        self.prefix = f"jobsync_test_{uuid.uuid4().hex[:8]}"
+        self.publisher = sharedmatrix.MatrixPublisher(self.prefix)
+        self.addCleanup(self.publisher.close)
+
+    def test_attach_and_refresh(self):
+        reader = sharedmatrix.SharedMatrixReader(self.prefix)
+        self.assertIsNone(reader.current())
+
+        first = normalize(np.random.default_rng(0).standard_normal((3, 8)).astype(np.float32))
+        self.publisher.publish("v1", ["a", "b", "c"], first)
+        version, ids, matrix = reader.current()
+        self.assertEqual((version, ids), ("v1", ["a", "b", "c"]))
+        np.testing.assert_array_equal(matrix, first)
+        self.assertFalse(matrix.flags.writeable)
+        # Same generation, same mapping
+        self.assertIs(reader.current()[2], matrix)
+
+        second = normalize(np.random.default_rng(1).standard_normal((2, 8)).astype(np.float32))
+        self.publisher.publish("v2", ["d", "e"], second)
+        version, ids, refreshed = reader.current()
+        self.assertEqual((version, ids), ("v2", ["d", "e"]))
+        np.testing.assert_array_equal(refreshed, second)
+        # A request still holding the old matrix keeps a valid view
+        np.testing.assert_array_equal(matrix, first)
+
+        with mock.patch.object(sharedmatrix, "SHARED_MATRIX_PREFIX", self.prefix), \
+                mock.patch.object(sharedmatrix, "_reader", None):
+            self.assertEqual(sharedmatrix.shared_snapshot("v2")[0], ["d", "e"])
+            # A worker whose source moved on does not use the master's copy
+            self.assertIsNone(sharedmatrix.shared_snapshot("v3"))
+        # Views before segments, or the segments cannot be closed
+        del matrix, refreshed
+
+    def test_missing_segment(self):
+        self.assertIsNone(sharedmatrix.SharedMatrixReader(f"{self.prefix}_missing").current())
+
+
+class ProductQuantizationTests(SimpleTestCase):
+    """ADC over PQ codes with exact re-ranking finds what exact search finds"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rng = np.random.default_rng(7)
+        centers = rng.normal(size=(40, 64))
+        cls.vectors = normalize(centers[rng.integers(0, 40, 3000)] + 0.3 * rng.normal(size=(3000, 64)))
+        cls.queries = normalize(centers[:20] + 0.3 * rng.normal(size=(20, 64)))
+        cls.quantizer = ProductQuantizer(64, subspaces=16).fit(cls.vectors, iterations=8)
+        cls.codes = cls.quantizer.encode(cls.vectors)
+
+    def test_adc_scores_match_decoded_vectors(self):
+        index = PQIndex(self.quantizer, self.codes, lambda rows: self.vectors[rows])
+        query = self.queries[0]
+        np.testing.assert_allclose(index.adc_scores(query), self.quantizer.decode(self.codes) @ query, atol=1e-4)
+        restored = ProductQuantizer.from_bytes(self.quantizer.to_bytes())
+        np.testing.assert_array_equal(restored.encode(self.vectors[:50]), self.codes[:50])
+
+    def test_recall_against_exact_search(self):
+        index = PQIndex(self.quantizer, self.codes, lambda rows: self.vectors[rows])
+        recall = []
+        for query in self.queries:
+            exact = set(np.argsort(-(self.vectors @ query))[:10])
+            rows, scores = index.search(query, 10, rerank=100)
+            recall.append(len(exact & set(rows)) / 10)
+            # Re-ranked scores are the exact cosine similarities, best first
+            np.testing.assert_allclose(scores, self.vectors[rows] @ query, atol=1e-5)
+            self.assertTrue(np.all(np.diff(scores) <= 0))
+        self.assertGreaterEqual(np.mean(recall), 0.9)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_states(self):
+        breaker = mirror.CircuitBreaker("test", failures=2, reset_seconds=0.05)
+        breaker.failure()
+        self.assertTrue(breaker.allow())
+        breaker.failure()
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        # Half-open: a single trial call, whose failure re-opens the circuit
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.success()
+        self.assertFalse(breaker.is_open)
+        self.assertTrue(breaker.allow())
+
+
+class MirrorFallbackTests(SimpleTestCase):
+    """Reads go to the fresh mirror, to Supabase when it is stale, and back to the mirror when Supabase fails"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        client = LocalClient(LocalStore(os.path.join(self.tmp.name, "storage.sqlite3")))
+        client.table("job_description").insert({"id": "a", "domain": "DevOps", "description": "Kubernetes"}).execute()
+        client.table("vector_table").insert({"job_id": "a", "embedding": [1.0, 0.0]}).execute()
+        self.mirror = mirror.SupabaseMirror(os.path.join(self.tmp.name, "mirror.sqlite3"))
+        self.assertEqual(self.mirror.sync(client), {"job_description": 1, "vector_table": 1})
+        self.breaker = mirror.CircuitBreaker("test", failures=1, reset_seconds=0.05)
+        for patcher in (
+            mock.patch.object(mirror, "get_mirror", lambda: self.mirror),
+            mock.patch.object(mirror, "supabase_breaker", self.breaker),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.remote_calls = 0
+
+    def _read(self, remote):
+        async def counted():
+            self.remote_calls += 1
+            return await remote()
+
+        async def read():
+            return await mirror.read_through(lambda m: [job["id"] for job in m.jobs_by_domain("DevOps")], counted)
+
+        return asyncio.run(read())
+
+    async def _remote_ok(self):
+        return ["remote"]
+
+    async def _remote_down(self):
+        raise httpx.ConnectError("refused")
+
+    def test_fresh_mirror_is_read_locally(self):
+        self.assertEqual(self._read(self._remote_down), ["a"])
+        self.assertEqual(self.remote_calls, 0)
+
+    def test_stale_mirror(self):
+        with mock.patch.object(mirror, "MIRROR_MAX_STALENESS", -1):
+            self.assertEqual(self._read(self._remote_ok), ["remote"])
+            # Supabase down: the stale mirror answers and the circuit opens
+            self.assertEqual(self._read(self._remote_down), ["a"])
+            self.assertTrue(self.breaker.is_open)
+            self.assertEqual(self._read(self._remote_ok), ["a"])
+            self.assertEqual(self.remote_calls, 2)
+
+    def test_cancelled_trial_does_not_wedge_the_breaker(self):
+        self.breaker.failure()
+        time.sleep(0.06)
+
+        async def cancelled():
+            raise asyncio.CancelledError()
+
+        with mock.patch.object(mirror, "MIRROR_MAX_STALENESS", -1):
+            with self.assertRaises(asyncio.CancelledError):
+                self._read(cancelled)
+            self.assertEqual(self._read(self._remote_ok), ["remote"])
+        self.assertFalse(self.breaker.is_open)
+
+    def test_missing_watermark_column(self):
+        client = LocalClient(LocalStore(os.path.join(self.tmp.name, "storage.sqlite3")))
+        broken = mirror.SupabaseMirror(os.path.join(self.tmp.name, "other.sqlite3"), {"job_description": "synced"})
+        with self.assertRaises(ValueError):
+            broken.sync(client)
+
+
+class TypeaheadIndexTests(SimpleTestCase):
+    def setUp(self):
+        # Small merge size so both the sorted keys and the delta are exercised
+        self.index = TypeaheadIndex(merge_size=8)
+        now = datetime.now(timezone.utc)
+        self.index.add_postings([
+            ("Senior Python Engineer", "Acme", "Software Development", "Python and Django", now - timedelta(days=90)),
+            ("Senior Python Engineer", "Acme", "Software Development", "Python and AWS", now - timedelta(days=90)),
+            ("Python Developer", "Globex", "Software Development", "Django, React", now),
+        ])
+
+    def test_matches_any_word_start(self):
+        titles = [s["text"] for s in self.index.suggest("pyth", kind="title")]
+        self.assertEqual(set(titles), {"Senior Python Engineer", "Python Developer"})
+        self.assertEqual(self.index.suggest("eng", kind="title")[0]["text"], "Senior Python Engineer")
+
+    def test_recent_postings_outrank_older_ones(self):
+        # One posting today beats two from three half-lives ago
+        self.assertEqual(self.index.suggest("p", kind="title")[0]["text"], "Python Developer")
+
+    def test_incremental_add(self):
+        for i in range(10):
+            self.index.add_posting(f"Data Engineer {i}", "Initech", "Data Science", "SQL")
+        suggestions = self.index.suggest("initech")
+        self.assertEqual(suggestions, [{"text": "Initech", "type": "company", "count": 10}])
+        self.assertEqual(len(self.index.suggest("data engineer", limit=20)), 10)
+        self.assertEqual(self.index.suggest("sq", kind="skill")[0]["text"], "SQL")
+
+    def test_remove_posting(self):
+        now = datetime.now(timezone.utc)
+        self.index.remove_posting("Python Developer", "Globex", "Software Development", "Django, React", now)
+        self.assertEqual(self.index.suggest("glob"), [])
+        # The older postings keep the shared terms
+        self.assertEqual(self.index.suggest("python dev", kind="title"), [])
+        self.assertEqual(self.index.suggest("software", kind="domain")[0]["count"], 2)
+        self.assertEqual([s["text"] for s in self.index.suggest("dj", kind="skill")], ["Django"])
+        self.index.add_posting("Python Developer", "Globex", "Software Development", "React", now)
+        self.assertEqual(self.index.suggest("glob")[0]["count"], 1)
+
+
+class TypeaheadSyncTests(TestCase):
+    """Postings from other workers are added and expired ones dropped at each sync"""
+
+    def setUp(self):
+        for name, value in (("_index", None), ("_watermark", None), ("_recent", {}), ("_expired_until", None)):
+            patcher = mock.patch.object(typeahead, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _job(self, title, company, **fields):
+        return JobDescription.objects.create(title=title, company=company, domain="Software",
+                                             description="Python and Django", **fields)
+
+    def test_expired_postings_leave_the_index(self):
+        self._job("Backend Engineer", "Acme")
+        leaving = self._job("Backend Engineer", "Globex")
+        self._job("Data Engineer", "Initech", expires_at=django_timezone.now() - timedelta(days=1))
+        index = typeahead.get_typeahead_index()
+        self.assertEqual(index.suggest("initech"), [])
+        self.assertEqual(index.suggest("backend")[0]["count"], 2)
+
+        JobDescription.objects.filter(id=leaving.id).update(expires_at=django_timezone.now())
+        added = self._job("Frontend Engineer", "Hooli")
+        with mock.patch.object(typeahead, "TYPEAHEAD_SYNC_SECONDS", 0):
+            index = typeahead.get_typeahead_index()
+            self.assertEqual(index.suggest("globex"), [])
+            self.assertEqual(index.suggest("backend")[0]["count"], 1)
+            self.assertEqual(index.suggest("hooli")[0]["text"], "Hooli")
+            # Only dropped once, and the next read of the overlap window does not bring it back
+            typeahead.get_typeahead_index()
+            self.assertEqual(index.suggest("backend")[0]["count"], 1)
+            self.assertEqual(index.suggest("globex"), [])
+        self.assertNotIn(str(leaving.id), typeahead._recent)
+        self.assertIn(str(added.id), typeahead._recent)
+
+
+class PostingLifecycleTests(TestCase):
+    """Expired postings drop out of local matching, then out of the tables when archived"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = LocalStore(os.path.join(self.tmp.name, "storage.sqlite3"))
+        self.client = LocalClient(self.store)
+        expired_at = django_timezone.now() - timedelta(days=1)
+        self.jobs = {
+            "live": JobDescription.objects.create(title="SRE", company="Acme", domain="DevOps", description="k8s"),
+            "expired": JobDescription.objects.create(
+                title="SRE", company="Globex", domain="DevOps", description="k8s", expires_at=expired_at
+            ),
+        }
+        vectors = {"live": [0.8, 0.6], "expired": [1.0, 0.0]}
+        for name, job in self.jobs.items():
+            self.client.table("job_description").insert({"id": str(job.id), "domain": "DevOps"}).execute()
+            self.client.table("vector_table").insert({"job_id": str(job.id), "embedding": vectors[name]}).execute()
+        lifecycle._tombstones_checked = None
+        self.addCleanup(setattr, lifecycle, "_tombstones_checked", None)
+
+    def test_backfill_starts_from_the_migration(self):
+        from django.apps import apps
+
+        migration = importlib.import_module("myapp.migrations.0007_jobdescription_expires_at")
+        JobDescription.objects.update(created_at=django_timezone.now() - timedelta(days=365))
+        migration.backfill_expiry(apps, None)
+        # Postings older than the TTL stay live for a full TTL instead of all expiring at once
+        earliest = django_timezone.now() + timedelta(days=lifecycle.JOB_POSTING_TTL_DAYS, minutes=-1)
+        self.assertFalse(JobDescription.objects.filter(expires_at__lt=earliest).exists())
+
+    def _match(self):
+        params = {"query_embedding": [1.0, 0.0], "match_threshold": 0.1, "match_count": 5}
+        return [row["id"] for row in self.client.rpc("match_filtered_job_descriptions", params).execute().data]
+
+    def test_expired_jobs_are_masked_then_compacted(self):
+        self.assertEqual(self._match(), [str(self.jobs["live"].id)])
+        # One of two rows is a tombstone, above the default threshold
+        self.assertEqual(len(self.store._matrix("vector_table", "job_id").keys), 1)
+
+    def test_archive_expired(self):
+        archived, files = lifecycle.archive_expired(self.client, directory=self.tmp.name)
+        self.assertEqual((archived, len(files)), (1, 1))
+        self.assertFalse(JobDescription.objects.filter(id=self.jobs["expired"].id).exists())
+        remaining = self.client.table("vector_table").select("job_id").execute().data
+        self.assertEqual([row["job_id"] for row in remaining], [str(self.jobs["live"].id)])
+        with gzip.open(files[0]) as f:
+            record = json.loads(f.readline())
+        self.assertEqual(record["job"]["id"], str(self.jobs["expired"].id))
+        self.assertEqual(record["vectors"][0]["embedding"], [1.0, 0.0])
+
+    def test_archive_takes_duplicates_and_bounds_filters(self):
+        expired = self.jobs["expired"]
+        duplicate = JobDescription.objects.create(
+            title="SRE", company="Initech", domain="DevOps", description="k8s", duplicate_of=expired
+        )
+        filtered = []
+        real_in = LocalQuery.in_
+
+        def in_(query, column, values):
+            filtered.append(len(values))
+            return real_in(query, column, values)
+
+        with mock.patch.object(lifecycle, "ARCHIVE_FILTER_IDS", 1), mock.patch.object(LocalQuery, "in_", in_):
+            archived, files = lifecycle.archive_expired(self.client, directory=self.tmp.name)
+        # The duplicate would otherwise lose duplicate_of and pass as a posting of its own
+        self.assertEqual(archived, 2)
+        self.assertFalse(JobDescription.objects.filter(id__in=[expired.id, duplicate.id]).exists())
+        self.assertEqual(filtered, [1] * 8)
+        with gzip.open(files[0]) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record["job"]["id"] for record in records], [str(expired.id), str(duplicate.id)])
+        self.assertIsNone(records[1]["supabase_job"])
+
+    def test_tombstones_read_only_newly_expired(self):
+        live, expired = str(self.jobs["live"].id), str(self.jobs["expired"].id)
+        self.jobs["live"].expires_at = django_timezone.now() + timedelta(hours=1)
+        self.jobs["live"].save()
+        with mock.patch.object(lifecycle, "TOMBSTONE_REFRESH_SECONDS", 0):
+            generation, dead = lifecycle.tombstones()
+            self.assertEqual(dead, {expired})
+            self.assertEqual(lifecycle.tombstones()[0], generation)
+
+            later = django_timezone.now() + timedelta(hours=2)
+            # Archived elsewhere: an incremental check does not see it go
+            JobDescription.objects.filter(id=expired).delete()
+            with mock.patch("django.utils.timezone.now", return_value=later), \
+                    CaptureQueriesContext(connection) as queries:
+                generation, dead = lifecycle.tombstones()
+            self.assertEqual(dead, {live, expired})
+            self.assertIn("expires_at\" >", queries[0]["sql"])
+
+            with mock.patch.object(lifecycle, "TOMBSTONE_RELOAD_SECONDS", 0), \
+                    mock.patch("django.utils.timezone.now", return_value=later):
+                self.assertEqual(lifecycle.tombstones(), (generation + 1, {live}))
+
+
+@unittest.skipUnless(_installed("pyarrow"), "Export tests need pyarrow")
+class ExportTests(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.vectors = rng.standard_normal((3, EMBEDDING_DIM)).astype(np.float32)
+        for i in range(5):
+            JobDescription.objects.create(
+                title=f"Job {i}", company="Acme", domain="DevOps", description="k8s",
+                chunk_vectors=pack_vectors(self.vectors) if i % 2 == 0 else None,
+            )
+
+    def _read(self, export):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(pa.BufferReader(b"".join(export.chunks())))
+
+    def test_row_groups_and_embeddings(self):
+        from .export import EMBEDDING_TYPE, Export
+
+        parquet = self._read(Export("jobs", row_group_size=2))
+        self.assertEqual(parquet.metadata.num_row_groups, 3)
+        table = parquet.read()
+        self.assertEqual(table.schema.field("embedding").type, EMBEDDING_TYPE)
+        embeddings = table.column("embedding").to_pylist()
+        self.assertEqual([embedding is None for embedding in embeddings], [False, True, False, True, False])
+        pooled = self.vectors.astype(np.float16).astype(np.float32).mean(axis=0)
+        np.testing.assert_allclose(embeddings[0], pooled / np.linalg.norm(pooled), rtol=1e-5)
+
+    def test_incremental_from_watermark(self):
+        from .export import Export
+
+        first = Export("jobs")
+        self.assertEqual(self._read(first).metadata.num_rows, 5)
+        job = JobDescription.objects.get(title="Job 1")
+        job.title = "Job 1 (edited)"
+        job.save()
+        Resume.objects.create(name="cv.pdf", text="Python")
+        second = Export("jobs", since=first.until)
+        self.assertEqual(self._read(second).read().column("title").to_pylist(), ["Job 1 (edited)"])
+        self.assertEqual(self._read(Export("resumes", since="0")).metadata.num_rows, 1)
+        with self.assertRaises(ValueError):
+            Export("jobs", since="not a watermark")
+
+    def test_stream_holds_admission_slot(self):
+        limiter = admission._limiters["export"]
+        request = RequestFactory().get("/api/export/jobs/", HTTP_AUTHORIZATION="Bearer secret")
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+
+        async def export():
+            response = await views.export_table(request, "jobs")
+            streaming = limiter._active
+            body = b"".join([chunk async for chunk in response])
+            return streaming, limiter._active, body
+
+        with mock.patch.object(views, "EXPORT_TOKEN", "secret"), \
+                mock.patch.object(admission, "_buckets", admission.TokenBucketStore(os.path.join(tmp.name, "rl"))):
+            before = limiter._active
+            # async_to_sync, so the view's queries run on this thread, inside the test transaction
+            streaming, after, body = async_to_sync(export)()
+        # The slot is taken until the last chunk is sent, not given back when the response is returned
+        self.assertEqual((streaming, after), (before + 1, before))
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.assertEqual(pq.ParquetFile(pa.BufferReader(body)).metadata.num_rows, 5)
+
+
+class CompressedTextFieldTests(TestCase):
+    """Resume and posting texts are stored as zstd frames and decompressed on first read"""
+
+    def setUp(self):
+        compression._latest.clear()
+        compression._checked = None
+        self.addCleanup(compression._latest.clear)
+
+    def _resume(self, i):
+        return (
+            f"Candidate {i}\nPROFESSIONAL SUMMARY\nSoftware engineer with {i % 12} years of experience building "
+            f"scalable web applications.\nSKILLS\nPython, Django, SQL, Docker\nEDUCATION\nB.Tech {i}\n"
+        ) * 4
+
+    def _stored(self, resume):
+        return bytes(
+            Resume.objects.annotate(stored=Cast("text", BinaryField())).values_list("stored", flat=True).get(id=resume.id)
+        )
+
+    def test_round_trip(self):
+        text = self._resume(1)
+        resume = Resume.objects.create(name="a.pdf", text=text)
+        self.assertLess(len(self._stored(resume)), len(text.encode()))
+        self.assertEqual(Resume.objects.get(id=resume.id).text, text)
+        value = Resume.objects.values_list("text", flat=True).get(id=resume.id)
+        self.assertIs(type(value), str)
+        self.assertEqual(value, text)
+        self.assertEqual(Resume.objects.create(name="b.pdf", text="short").text, "short")
+
+    def test_instances_decompress_on_first_read(self):
+        text = self._resume(3)
+        resume = Resume.objects.create(name="a.pdf", text=text)
+        with mock.patch.object(compression, "decompress", wraps=compression.decompress) as decompress:
+            loaded = Resume.objects.get(id=resume.id)
+            names = [r.name for r in Resume.objects.all()]
+            decompress.assert_not_called()
+            self.assertEqual(loaded.text, text)
+            self.assertEqual(loaded.text, text)
+            decompress.assert_called_once()
+        self.assertEqual(names, ["a.pdf"])
+        # Saved without reading the text: the stored frame goes back as it is
+        untouched = Resume.objects.get(id=resume.id)
+        untouched.name = "renamed.pdf"
+        with mock.patch.object(compression, "compress") as compress:
+            untouched.save()
+        compress.assert_not_called()
+        self.assertEqual(Resume.objects.get(id=resume.id).text, text)
+        # values() rows are plain str, also named and flat ones
+        self.assertEqual(Resume.objects.values("text").get(id=resume.id), {"text": text})
+        self.assertEqual(Resume.objects.values_list("text", named=True).get(id=resume.id).text, text)
+
+    def test_trained_dictionary(self):
+        old = Resume.objects.create(name="old.pdf", text=self._resume(0))
+        dict_id = compression.train_dictionary("resume", [self._resume(i) for i in range(150)])
+        self.assertIsNotNone(dict_id)
+        new = Resume.objects.create(name="new.pdf", text=self._resume(1))
+        self.assertEqual(compression.dictionary_id(self._stored(new)), dict_id)
+        self.assertEqual(compression.dictionary_id(self._stored(old)), 0)
+        self.assertEqual(compression.recompress(Resume, ["text"]), 1)
+        self.assertEqual(compression.dictionary_id(self._stored(old)), dict_id)
+        self.assertEqual(Resume.objects.get(id=old.id).text, self._resume(0))
+
+    def test_refresh_does_not_block_the_event_loop(self):
+        loading = threading.Event()
+        finish = threading.Event()
+
+        def load():
+            loading.set()
+            finish.wait(5)
+
+        async def refresh():
+            started = time.monotonic()
+            compression._refresh()
+            return time.monotonic() - started
+
+        with mock.patch.object(compression, "_load_dictionaries", load):
+            self.assertLess(asyncio.run(refresh()), 0.5)
+            # The load runs in its own thread, once
+            self.assertTrue(loading.wait(1))
+            self.assertLess(asyncio.run(refresh()), 0.5)
+            finish.set()
+
+    def test_upload_saves_resume_once(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(tmp.name)
+        request = RequestFactory().post(
+            "/api/upload-resume/", {"file": SimpleUploadedFile("cv.pdf", b"%PDF-1.4")}, REMOTE_ADDR="10.0.0.9"
+        )
+        vectors = np.eye(EMBEDDING_DIM, dtype=np.float32)[:2]
+        with mock.patch.object(views, "extract_text", return_value=self._resume(2)), \
+                mock.patch.object(views, "embed_document", return_value=(vectors, vectors.mean(axis=0))), \
+                mock.patch.object(views, "get_supabase_client", return_value=LocalClient(LocalStore("storage"))), \
+                mock.patch.object(views.precompute, "schedule"), \
+                mock.patch.object(admission, "_buckets", admission.TokenBucketStore("ratelimit")), \
+                mock.patch.object(compression, "compress", wraps=compression.compress) as compress:
+            response = views.upload_resume(request)
+        self.assertEqual(response.status_code, 201)
+        compress.assert_called_once()
+        resume = Resume.objects.get(id=json.loads(response.content)["resume_id"])
+        self.assertEqual(resume.text, self._resume(2))
+        self.assertEqual(resume.chunk_vectors, pack_vectors(vectors))
+
+
+class PrecomputeTests(TestCase):
+    """Analyses computed after upload are served, shared while in flight and dropped when a relevant job is posted"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.vector = np.eye(EMBEDDING_DIM, dtype=np.float32)[0]
+        self.resume = Resume.objects.create(
+            name="cv.pdf", text="Python developer", chunk_vectors=pack_vectors([self.vector])
+        )
+        self.key = views.analysis_key(self.resume.text)
+        self.groq_calls = 0
+        for patcher in (
+            mock.patch.object(storage, "STORAGE_BACKEND", "local"),
+            mock.patch.object(storage, "_store", LocalStore(os.path.join(self.tmp.name, "storage.sqlite3"))),
+            mock.patch.object(admission, "_buckets", admission.TokenBucketStore(os.path.join(self.tmp.name, "rl"))),
+            mock.patch.object(views, "analysis_flight", SingleFlight("analysis", shared=False)),
+            mock.patch.object(views, "search_flight", SingleFlight("search", shared=False)),
+            mock.patch.object(views, "job_sections", LRUCache(10)),
+            mock.patch.object(views, "request_groq_analysis", self._fake_groq),
+            mock.patch.object(ranking, "CROSS_ENCODER_BACKEND", "off"),
+            mock.patch.dict(os.environ, {"GROQ_API_KEY": "key"}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        lifecycle._tombstones_checked = None
+        self.addCleanup(setattr, lifecycle, "_tombstones_checked", None)
+
+    async def _fake_groq(self, model_name, prompt, groq_api_key, max_tokens=2048):
+        self.groq_calls += 1
+        return f"Analysis by {model_name}. " * 10
+
+    def _post_job(self, vector):
+        job = JobDescription.objects.create(
+            title="Python Engineer", company="Acme", domain="Software", description="Python services",
+            chunk_vectors=pack_vectors([vector]),
+        )
+        client = storage.local_client()
+        client.table("job_description").insert(
+            {"id": str(job.id), "title": job.title, "domain": job.domain, "description": job.description}
+        ).execute()
+        client.table("vector_table").insert({"job_id": str(job.id), "embedding": vector.tolist()}).execute()
+        return job
+
+    def _analysis(self):
+        return async_to_sync(views.analyze_resume)(RequestFactory().get("/api/analyze-resume/"))
+
+    def test_schedule(self):
+        ran = []
+
+        async def record():
+            ran.append(threading.current_thread().name)
+
+        self.assertIsNone(precompute.schedule(record).result(5))
+        self.assertEqual(ran, ["precompute"])
+
+        async def fail():
+            raise RuntimeError("boom")
+
+        # Failures are logged on the background loop, never raised to the caller
+        self.assertIsNone(precompute.schedule(fail).result(5))
+        with mock.patch.object(precompute, "PRECOMPUTE_ANALYSIS", False):
+            self.assertIsNone(precompute.schedule(record))
+
+    def test_begin_finish_lookup(self):
+        lookup = async_to_sync(precompute.lookup)
+        async_to_sync(precompute.begin)(self.resume, self.key, self.vector, 0.5)
+        # Still running
+        self.assertIsNone(lookup(self.resume, self.key))
+        payload = {"matched_jobs": [], "job_analysis": "Strong fit"}
+        async_to_sync(precompute.finish)(self.resume, self.key, payload, 0.5)
+        self.assertEqual(lookup(self.resume, self.key), payload)
+        # Another resume text or other models
+        self.assertIsNone(lookup(self.resume, "other"))
+        with mock.patch.object(precompute, "PRECOMPUTE_TTL_SECONDS", -1):
+            self.assertIsNone(lookup(self.resume, self.key))
+        ResumeAnalysis.objects.update(stale=True)
+        self.assertIsNone(lookup(self.resume, self.key))
+
+    def test_serves_stored_analysis(self):
+        payload = {"matched_jobs": [{"id": "a"}], "job_analysis": "Precomputed"}
+        async_to_sync(precompute.begin)(self.resume, self.key, self.vector, 0.5)
+        async_to_sync(precompute.finish)(self.resume, self.key, payload, 0.5)
+        with mock.patch.object(views, "run_analysis", side_effect=AssertionError("analysed again")):
+            response = self._analysis()
+        self.assertEqual((response.status_code, json.loads(response.content)), (200, payload))
+
+    def test_attaches_to_analysis_in_flight(self):
+        job = self._post_job(self.vector)
+        started, release = threading.Event(), threading.Event()
+        groq = self._fake_groq
+
+        async def slow_groq(*args, **kwargs):
+            started.set()
+            while not release.is_set():
+                await asyncio.sleep(0.01)
+            return await groq(*args, **kwargs)
+
+        async def both():
+            # What upload_resume schedules, then the user asks for the analysis before it finished
+            speculative = asyncio.ensure_future(
+                views.analysis_flight.do(self.key, lambda: views.run_analysis(self.resume))
+            )
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            request = asyncio.ensure_future(views.analyze_resume(RequestFactory().get("/api/analyze-resume/")))
+            await asyncio.sleep(0.1)
+            release.set()
+            return await speculative, await request
+
+        with mock.patch.object(views, "request_groq_analysis", slow_groq), \
+                mock.patch.object(views, "run_analysis", wraps=views.run_analysis) as run_analysis:
+            (payload, status_code), response = async_to_sync(both)()
+        self.assertEqual(run_analysis.call_count, 1)
+        self.assertEqual(self.groq_calls, 1)
+        self.assertEqual(status_code, 200)
+        self.assertEqual([m["id"] for m in payload["matched_jobs"]], [str(job.id)])
+        self.assertEqual(json.loads(response.content), payload)
+        # The complete run was stored for the next request
+        self.assertEqual(async_to_sync(precompute.lookup)(self.resume, self.key), payload)
+
+    def test_invalidate_for_job(self):
+        invalidate = async_to_sync(precompute.invalidate_for_job)
+        async_to_sync(precompute.begin)(self.resume, self.key, self.vector, 1.0)
+        async_to_sync(precompute.finish)(self.resume, self.key, {"job_analysis": "Done"}, 1.0)
+        # Below the weakest match's similarity: it would not have been matched
+        self.assertEqual(invalidate(np.r_[0.6, 0.8, np.zeros(EMBEDDING_DIM - 2)]), 0)
+        self.assertIsNotNone(async_to_sync(precompute.lookup)(self.resume, self.key))
+        # At the weakest match's similarity
+        self.assertEqual(invalidate(self.vector * 3), 1)
+        self.assertIsNone(async_to_sync(precompute.lookup)(self.resume, self.key))
+
+
+class JobPostingUploadTests(TestCase):
+    """upload_job_posting stores the posting locally and in Supabase"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        for patcher in (
+            mock.patch.object(admission, "_buckets", admission.TokenBucketStore(os.path.join(self.tmp.name, "rl"))),
+            mock.patch.object(dedup, "_index", None),
+            mock.patch.object(dedup, "_watermark", None),
+            mock.patch.object(typeahead, "_index", None),
+            mock.patch.object(typeahead, "_watermark", None),
+            mock.patch.object(typeahead, "_recent", {}),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def _post(self, **fields):
+        body = dict(title="Backend Engineer", company="Acme", domain="Software", description=POSTING, **fields)
+        request = RequestFactory().post("/api/upload-job-posting/", json.dumps(body), content_type="application/json")
+
+        async def post():
+            response = await views.upload_job_posting(request)
+            # Let a cancelled encoding unwind
+            await asyncio.sleep(0)
+            return response
+
+        return async_to_sync(post)()
+
+    def test_encoding_stopped_when_a_write_fails(self):
+        cancelled = []
+
+        async def encode(func, *args):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(func)
+                raise
+
+        with mock.patch.object(views, "run_cpu", encode), \
+                mock.patch.object(DuplicateIndex, "add", side_effect=RuntimeError("index unavailable")):
+            response = self._post()
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(cancelled, [views.embed_document])
+
+    def test_supabase_row_carries_updated_at(self):
+        store = LocalStore(os.path.join(self.tmp.name, "storage.sqlite3"))
+        vectors = np.eye(2, EMBEDDING_DIM, dtype=np.float32)
+
+        async def encode(func, *args):
+            return vectors, vectors[0]
+
+        with mock.patch.object(storage, "STORAGE_BACKEND", "local"), mock.patch.object(storage, "_store", store), \
+                mock.patch.object(views, "run_cpu", encode):
+            response = self._post()
+        self.assertEqual((response.status_code, json.loads(response.content)["status"]), (201, "success"))
+        job = JobDescription.objects.get()
+        row = LocalClient(store).table("job_description").select("*").eq("id", str(job.id)).execute().data[0]
+        # The version JobPayloadCache checks, as written locally
+        self.assertEqual(row["updated_at"], job.updated_at.isoformat())
@@ -0,0 +1,333 @@
+"""
+Typeahead over job titles, companies, domains and skills.
+
+Every distinct term (per type) is indexed under each of its word starts, so
+"py" finds "Python Developer" and "Senior Python Engineer". Keys live in a
+sorted list searched with bisect; the term ids of a prefix's range are one
+NumPy slice, ranked by a single precomputed score per term.
+
+The score folds popularity and recency together: each posting adds
+exp(t / tau) to its terms, kept in log space. That is the exponentially
+decayed posting count up to a factor shared by all terms, so the ranking
+never needs recomputing as time passes. tau comes from
+TYPEAHEAD_HALF_LIFE_DAYS.
+
+New terms go to a small unsorted delta that queries scan linearly, merged
+into the sorted keys every TYPEAHEAD_MERGE_SIZE entries. Each process holds
+its own index; postings created by other workers are picked up from the
+database every TYPEAHEAD_SYNC_SECONDS, and postings that expired since the
+last sync are taken out again.
+"""
+import math
+import os
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+TYPEAHEAD_HALF_LIFE_DAYS = float(os.getenv("TYPEAHEAD_HALF_LIFE_DAYS", "30"))
+TYPEAHEAD_MERGE_SIZE = int(os.getenv("TYPEAHEAD_MERGE_SIZE", "2000"))
+TYPEAHEAD_SYNC_SECONDS = float(os.getenv("TYPEAHEAD_SYNC_SECONDS", "5"))
+# Postings can commit out of created_at order; each sync re-reads this window
+TYPEAHEAD_SYNC_OVERLAP_SECONDS = 60
+TYPEAHEAD_MAX_WORDS = 6
+TYPEAHEAD_MAX_CHARS = 80
+
+KINDS = ("title", "company", "domain", "skill")
+
+# Skills indexed from postings; the rule-based analysis fallback uses them too
+COMMON_SKILLS = [
+    "python", "javascript", "java", "c++", "sql", "aws", "azure", "gcp",
+    "react", "angular", "vue", "node.js", "django", "flask", "express",
+    "docker", "kubernetes", "cicd", "devops", "machine learning", "ai",
+    "data science", "analytics", "agile", "scrum", "product management",
+    "html", "css", "ui", "ux", "design", "testing", "qa", "security"
+]
+
+_WORD_RE = re.compile(r"[a-z0-9+#.]+")
+_SKILL_RE = re.compile(
+    r"(?<![a-z0-9])(?:" + "|".join(re.escape(skill) for skill in sorted(COMMON_SKILLS, key=len, reverse=True)) + r")(?![a-z0-9])"
+)
+_TAU = TYPEAHEAD_HALF_LIFE_DAYS * 86400 / math.log(2)
+_END = "\uffff"
+
+
+def normalize(text):
+    words = (word.strip(".") for word in _WORD_RE.findall((text or "").lower()))
+    return " ".join(filter(None, words))[:TYPEAHEAD_MAX_CHARS]
+
+
+def word_starts(key):
+    words = key.split(" ")
+    return [" ".join(words[i:]) for i in range(min(len(words), TYPEAHEAD_MAX_WORDS))]
+
+
+def posting_skills(text):
+    """COMMON_SKILLS mentioned in a posting, as first written there"""
+    text = text or ""
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        text = lowered
+    found = {}
+    for match in _SKILL_RE.finditer(lowered):
+        if match.group() not in found:
+            found[match.group()] = text[match.start():match.end()]
+    return list(found.values())
+
+
+def _logaddexp(a, b):
+    if a == -math.inf:
+        return b
+    high, low = (a, b) if a >= b else (b, a)
+    return high + math.log1p(math.exp(low - high))
+
+
+def _timestamp(created_at):
+    return created_at.timestamp() if created_at is not None else time.time()
+
+
+class TypeaheadIndex:
+    """In-memory prefix index; add_posting and suggest are safe to call from any thread"""
+
+    def __init__(self, merge_size=TYPEAHEAD_MERGE_SIZE):
+        self.merge_size = merge_size
+        self._lock = threading.Lock()
+        self._terms = {}  # (kind id, key) -> term id
+        self._labels = []
+        self._kinds = np.zeros(1024, dtype=np.int8)
+        self._counts = np.zeros(1024, dtype=np.int32)
+        self._scores = np.full(1024, -np.inf)
+        self._keys = []  # sorted word-start keys
+        self._entry_terms = np.zeros(0, dtype=np.int32)  # term id per key
+        self._delta = []  # (key, term id) not merged yet
+
+    def __len__(self):
+        return len(self._labels)
+
+    def _touch(self, kind, label, weight):
+        key = normalize(label)
+        if not key:
+            return
+        kind_id = KINDS.index(kind)
+        term = self._terms.get((kind_id, key))
+        if term is None:
+            term = len(self._labels)
+            if term == len(self._scores):
+                self._kinds = np.concatenate([self._kinds, np.zeros_like(self._kinds)])
+                self._counts = np.concatenate([self._counts, np.zeros_like(self._counts)])
+                self._scores = np.concatenate([self._scores, np.full(len(self._scores), -np.inf)])
+            self._terms[(kind_id, key)] = term
+            self._labels.append(label.strip()[:TYPEAHEAD_MAX_CHARS])
+            self._kinds[term] = kind_id
+            self._delta.extend((start, term) for start in word_starts(key))
+        self._counts[term] += 1
+        self._scores[term] = _logaddexp(float(self._scores[term]), weight)
+
+    def _add(self, title, company, domain, text, created_at):
+        weight = _timestamp(created_at) / _TAU
+        self._touch("title", title or "", weight)
+        self._touch("company", company or "", weight)
+        self._touch("domain", domain or "", weight)
+        for skill in posting_skills(text):
+            self._touch("skill", skill, weight)
+
+    def add_posting(self, title, company, domain, text="", created_at=None):
+        with self._lock:
+            self._add(title, company, domain, text, created_at)
+            if len(self._delta) >= self.merge_size:
+                self._merge()
+
+    def _untouch(self, kind, label, weight):
+        term = self._terms.get((KINDS.index(kind), normalize(label)))
+        if term is None or self._counts[term] == 0:
+            return
+        self._counts[term] -= 1
+        if self._counts[term] == 0:
+            self._scores[term] = -np.inf
+        else:
+            # log(exp(score) - exp(weight)); the term's other postings keep it above zero
+            score = float(self._scores[term])
+            self._scores[term] = score + math.log(max(-math.expm1(min(weight - score, 0.0)), 1e-12))
+
+    def remove_posting(self, title, company, domain, text="", created_at=None):
+        """Undo add_posting for a posting that expired; its terms stay indexed until their count is zero"""
+        weight = _timestamp(created_at) / _TAU
+        with self._lock:
+            self._untouch("title", title or "", weight)
+            self._untouch("company", company or "", weight)
+            self._untouch("domain", domain or "", weight)
+            for skill in posting_skills(text):
+                self._untouch("skill", skill, weight)
+
+    def add_postings(self, postings):
+        """Bulk load (title, company, domain, text, created_at) tuples with a single merge"""
+        with self._lock:
+            for posting in postings:
+                self._add(*posting)
+            self._merge()
+
+    def _merge(self):
+        if not self._delta:
+            return
+        self._delta.sort()
+        keys = self._keys
+        positions = [bisect_left(keys, key) for key, _ in self._delta]
+        merged, previous = [], 0
+        for position, (key, _) in zip(positions, self._delta):
+            merged.extend(keys[previous:position])
+            merged.append(key)
+            previous = position
+        merged.extend(keys[previous:])
+        self._entry_terms = np.insert(
+            self._entry_terms, positions, np.fromiter((term for _, term in self._delta), dtype=np.int32)
+        )
+        self._keys = merged
+        self._delta = []
+
+    def suggest(self, prefix, limit=10, kind=None):
+        """Up to `limit` terms with a word starting with `prefix`, best first, as dicts"""
+        key = normalize(prefix)
+        if not key or limit <= 0:
+            return []
+        with self._lock:
+            lo = bisect_left(self._keys, key)
+            hi = bisect_left(self._keys, key + _END, lo)
+            terms = self._entry_terms[lo:hi]
+            pending = [term for start, term in self._delta if start.startswith(key)]
+            if pending:
+                terms = np.concatenate([terms, np.array(pending, dtype=np.int32)])
+            if kind is not None:
+                terms = terms[self._kinds[terms] == KINDS.index(kind)]
+            terms = terms[self._counts[terms] > 0]
+            best = self._best(terms, limit)
+            return [
+                {"text": self._labels[term], "type": KINDS[self._kinds[term]], "count": int(self._counts[term])}
+                for term in best
+            ]
+
+    def _best(self, terms, limit):
+        # A term is in the range once per matching word start, so take some
+        # spare candidates and fall back to de-duplicating them all
+        scores = self._scores[terms]
+        take = min(len(terms), limit * 4)
+        if take < len(terms):
+            candidates = np.argpartition(-scores, take - 1)[:take]
+        else:
+            candidates = np.arange(len(terms))
+        best = []
+        for i in candidates[np.argsort(-scores[candidates], kind="stable")]:
+            term = int(terms[i])
+            if term not in best:
+                best.append(term)
+                if len(best) == limit:
+                    return best
+        if take < len(terms):
+            unique = np.unique(terms)
+            order = np.argsort(-self._scores[unique], kind="stable")[:limit]
+            return [int(term) for term in unique[order]]
+        return best
+
+
+_index = None
+_index_lock = threading.Lock()
+_watermark = None  # newest created_at read from the database
+_recent = {}  # job id -> created_at of postings inside the sync overlap window
+_expired_until = None  # postings expiring up to this time are out of the index
+_synced_at = 0.0
+
+
+def _canonical():
+    from .models import JobDescription
+
+    return JobDescription.objects.filter(duplicate_of__isnull=True)
+
+
+def _published():
+    # Archiving deletes the rows, so this leaves out archived postings too
+    from .lifecycle import live_jobs
+
+    return live_jobs().filter(duplicate_of__isnull=True)
+
+
+def _rows(queryset):
+    """Posting tuples for TypeaheadIndex, remembering the ids the next sync will read again"""
+    horizon = _watermark - timedelta(seconds=TYPEAHEAD_SYNC_OVERLAP_SECONDS) if _watermark else None
+    rows = queryset.values_list("id", "title", "company", "domain", "description", "requirements", "created_at")
+    for job_id, title, company, domain, description, requirements, created_at in rows.iterator(chunk_size=2000):
+        if horizon is not None and created_at >= horizon:
+            _recent[str(job_id)] = created_at
+        yield title, company, domain, f"{description or ''}\n{requirements or ''}", created_at
+
+
+def get_typeahead_index():
+    """
+    Process-wide index, built from the database on first use and topped up
+    with other processes' postings every TYPEAHEAD_SYNC_SECONDS. Call from
+    sync code (use sync_to_async in views).
+    """
+    global _index, _watermark, _expired_until, _synced_at
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                started = time.perf_counter()
+                index = TypeaheadIndex()
+                _expired_until = timezone.now()
+                _watermark = _published().order_by("-created_at").values_list("created_at", flat=True).first()
+                index.add_postings(_rows(_published()))
+                _synced_at = time.monotonic()
+                _index = index
+                print(f"✅ Typeahead index built with {len(index)} terms in {time.perf_counter() - started:.1f}s")
+    elif time.monotonic() - _synced_at >= TYPEAHEAD_SYNC_SECONDS:
+        with _index_lock:
+            if time.monotonic() - _synced_at >= TYPEAHEAD_SYNC_SECONDS:
+                _sync()
+    return _index
+
+
+def _drop_expired():
+    """Remove the postings that expired since the last sync; the index holds those read while still live"""
+    global _expired_until
+    now = timezone.now()
+    horizon = _watermark - timedelta(seconds=TYPEAHEAD_SYNC_OVERLAP_SECONDS) if _watermark else None
+    rows = _canonical().filter(expires_at__gt=_expired_until, expires_at__lte=now).values_list(
+        "id", "title", "company", "domain", "description", "requirements", "created_at"
+    )
+    for job_id, title, company, domain, description, requirements, created_at in rows.iterator(chunk_size=2000):
+        # Older than the overlap window, or remembered in it: the posting was indexed
+        if _recent.pop(str(job_id), None) is not None or (horizon is not None and created_at < horizon):
+            _index.remove_posting(title, company, domain, f"{description or ''}\n{requirements or ''}", created_at)
+    _expired_until = now
+
+
+def _sync():
+    global _watermark, _synced_at
+    _synced_at = time.monotonic()
+    _drop_expired()
+    queryset = _published().order_by("created_at")
+    if _watermark is not None:
+        queryset = queryset.filter(created_at__gt=_watermark - timedelta(seconds=TYPEAHEAD_SYNC_OVERLAP_SECONDS))
+    rows = queryset.values_list("id", "title", "company", "domain", "description", "requirements", "created_at")
+    for job_id, title, company, domain, description, requirements, created_at in rows.iterator(chunk_size=2000):
+        _watermark = created_at if _watermark is None else max(_watermark, created_at)
+        if str(job_id) in _recent:
+            continue
+        _recent[str(job_id)] = created_at
+        _index.add_posting(title, company, domain, f"{description or ''}\n{requirements or ''}", created_at)
+    if _watermark is not None:
+        horizon = _watermark - timedelta(seconds=TYPEAHEAD_SYNC_OVERLAP_SECONDS)
+        for job_id in [job_id for job_id, created_at in _recent.items() if created_at < horizon]:
+            del _recent[job_id]
+
+
+def index_posting(job):
+    """Add a posting this process just created (a JobDescription), so it is searchable immediately"""
+    index = get_typeahead_index()
+    with _index_lock:
+        if str(job.id) in _recent:
+            return
+        _recent[str(job.id)] = job.created_at
+    index.add_posting(job.title, job.company, job.domain, f"{job.description or ''}\n{job.requirements or ''}", job.created_at)
@@ -3,12 +3,8 @@ from rest_framework.decorators import api_view
 
 from django.shortcuts import render
 import os
-import pytesseract
 import time
-from pdf2image import convert_from_path
-from PIL import Image
-from PyPDF2 import PdfReader
-from django.http import JsonResponse, HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.core.files.storage import FileSystemStorage
 from .models import Resume
@@ -21,26 +17,68 @@ from supabase import create_client, Client
 import numpy as np
 import requests
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
 from .models import JobDescription, JobRecruiter
 from .serializers import JobDescriptionSerializer, DomainSerializer
+from .embeddings import embed_document, embed_documents, pack_vectors, unpack_vectors, pool, maxsim_scores
+from .instrumentation import span, cache_event, retry_event, event, render_metrics
 import uuid
+import asyncio
+import httpx
+from django.views.decorators.http import require_GET, require_POST
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .clients import HTTP_TIMEOUT, get_async_supabase, get_http_client, run_cpu
+from .ocr import extract_text
+from .dedup import DEDUP_MODE, get_duplicate_index, minhash_signature, posting_text, signature_to_bytes
+from asgiref.sync import sync_to_async
+from .admission import admit
+from .renderers import JsonResponse, RawJsonResponse, job_payloads
+from .singleflight import SingleFlight, make_key
+from .mirror import read_through
+from .storage import STORAGE_BACKEND, local_client
+from .lifecycle import live_jobs, tombstones
+from .typeahead import COMMON_SKILLS, KINDS, get_typeahead_index, index_posting
+from . import precompute
+from .ranking import (CASCADE_LLM_COUNT, CASCADE_RECALL_COUNT, CASCADE_RERANK_COUNT, CASCADE_RESULT_COUNT,
+                      CASCADE_TOTAL_BUDGET_MS, Deadline, LRUCache, rerank_with_cross_encoder, run_stage,
+                      stage_budget)
+import hashlib
+import hmac
+import logging
 
 
-# Initialize the model once at module level
-model = SentenceTransformer('sentence-transformers/all-MiniLM-L6-v2')
-
 load_dotenv() 
+logger = logging.getLogger(__name__)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY) if STORAGE_BACKEND == "supabase" else None
 
 def get_supabase_client():
-    """Helper function to get Supabase client"""
-    return supabase
+    """Helper function to get Supabase client (the local SQLite backend when STORAGE_BACKEND=local)"""
+    return supabase if supabase is not None else local_client()
+
+# Identical concurrent analyses and searches share one computation
+analysis_flight = SingleFlight("analysis")
+search_flight = SingleFlight("search")
+candidates_flight = SingleFlight("candidates")
+
+# Prefer Llama (more stable), fall back to Gemma if needed
+ANALYSIS_MODELS = ["llama-3.3-70b-versatile", "gemma2-9b-it"]
+# Minimum cosine similarity for a job to match a resume
+JOB_MATCH_THRESHOLD = 0.2
+# Per-job analysis requests in flight per analysis, and their output cap
+GROQ_FANOUT_CONCURRENCY = int(os.getenv("GROQ_FANOUT_CONCURRENCY", "4"))
+GROQ_JOB_MAX_TOKENS = int(os.getenv("GROQ_JOB_MAX_TOKENS", "700"))
+# Jobs encoded per batch in the chunk re-rank stage; its deadline is checked between batches
+CHUNK_RERANK_BATCH = int(os.getenv("CHUNK_RERANK_BATCH", "4"))
+job_sections = LRUCache(int(os.getenv("JOB_ANALYSIS_CACHE_SIZE", "5000")))
+# Bulk export is disabled unless a token is configured
+EXPORT_TOKEN = os.getenv("EXPORT_TOKEN", "")
 
 @csrf_exempt
+@admit("ocr")
 def upload_resume(request):
     if request.method == "POST":
         if 'file' not in request.FILES:
@@ -61,49 +99,44 @@ def upload_resume(request):
         file_path = os.path.join(uploads_directory, file_name)
         
         try:
-            text = ""
-            if uploaded_file.name.endswith('.pdf'):
-                # Check if PDF has embedded text
-                try:
-                    reader = PdfReader(file_path)
-                    for page in reader.pages:
-                        if page.extract_text():
-                            text += page.extract_text()
-                except Exception:
-                    # Fallback to OCR if PDF is an image-based document
-                    images = convert_from_path(file_path)
-                    for image in images:
-                        gray_image = image.convert('L')  # Convert to grayscale
-                        text += pytesseract.image_to_string(gray_image, lang='eng')
-            else:
-                # Process image files
-                image = Image.open(file_path)
-                gray_image = image.convert('L')  # Convert to grayscale
-                text = pytesseract.image_to_string(gray_image, lang='eng')
+            # Text layer for PDFs, preprocessed OCR for scans and images
+            text = extract_text(file_path, uploaded_file.name)
             
             if not text.strip():
                 return JsonResponse({"error": "Failed to extract text from the document."}, status=500)
             
-            # Save the extracted text in the database
-            resume = Resume.objects.create(name=uploaded_file.name, text=text)
-            
-            # Generate and store resume embedding in Supabase
+            # Embed every section-aware chunk; Supabase gets the pooled vector
+            chunk_vectors = pooled = None
             try:
-                # Generate embedding using the local model
-                vector = model.encode(text).tolist()
-                
-                # Store in Supabase resume_vectors table
-                supabase_client = get_supabase_client()
-                supabase_client.table("resume_vectors").insert({
-                    "id": resume.id,
-                    "name": uploaded_file.name,
-                    "text": text,
-                    "embedding": vector
-                }).execute()
+                chunk_vectors, pooled = embed_document(text)
             except Exception as e:
-                print(f"Warning: Failed to store resume vector in Supabase: {e}")
+                logger.warning(f"Failed to embed resume: {e}")
+
+            # Save the extracted text and its chunk vectors in the database, in one write
+            with span("db"):
+                resume = Resume.objects.create(
+                    name=uploaded_file.name,
+                    text=text,
+                    chunk_vectors=None if chunk_vectors is None else pack_vectors(chunk_vectors),
+                )
             
-            resume.save()
+            # Store in Supabase resume_vectors table
+            if pooled is not None:
+                try:
+                    supabase_client = get_supabase_client()
+                    with span("supabase_write"):
+                        supabase_client.table("resume_vectors").insert({
+                            "id": resume.id,
+                            "name": uploaded_file.name,
+                            "text": text,
+                            "embedding": pooled.tolist()
+                        }).execute()
+                except Exception as e:
+                    logger.warning(f"Failed to store resume vector in Supabase: {e}")
+
+            # The user almost always asks for the analysis next; start it now
+            key = analysis_key(text)
+            precompute.schedule(lambda: analysis_flight.do(key, lambda: run_analysis(resume)))
             
             return JsonResponse({"message": "Resume uploaded successfully", "resume_id": resume.id}, status=201)
         
@@ -117,293 +150,464 @@ def upload_resume(request):
     
     return JsonResponse({"error": "Invalid request method"}, status=405)
 
-def match_filtered_jobs(query_embedding):
-    match_threshold = 0.2
-    match_count = 10
-
-    # Call Supabase function with correct parameters
-    response = supabase.rpc(
-        "match_filtered_job_descriptions", 
-        {
-            "query_embedding": query_embedding,
-            "match_threshold": match_threshold,
-            "match_count": match_count
+async def match_filtered_jobs(query_embedding, match_count=10):
+    match_threshold = JOB_MATCH_THRESHOLD
+
+    async def search():
+        # Call Supabase function with correct parameters
+        client = await get_async_supabase()
+        with span("vector_search"):
+            response = await client.rpc(
+                "match_filtered_job_descriptions", 
+                {
+                    "query_embedding": query_embedding,
+                    "match_threshold": match_threshold,
+                    "match_count": match_count
+                }
+            ).execute()
+
+        # Check if response is valid; raised so the circuit breaker counts it as a failure
+        if not response or not hasattr(response, 'data'):
+            raise ValueError("Invalid response from Supabase")
+
+        # Return the matched jobs
+        return response.data
+
+    # Expired postings stay in the tables until archived; ask for enough extra rows to drop them
+    _, expired = await sync_to_async(tombstones)()
+    requested = match_count
+    match_count += min(len(expired), match_count)
+
+    key = make_key("match_filtered_job_descriptions", np.asarray(query_embedding, dtype=np.float32).tobytes(),
+                   match_threshold, match_count)
+    result = await read_through(
+        lambda mirror: mirror.match_jobs(query_embedding, match_threshold, match_count),
+        lambda: search_flight.do(key, search),
+    )
+    # Callers annotate the rows, so each gets its own copies
+    return [dict(job) for job in result or [] if str(job.get("id")) not in expired][:requested]
+
+
+async def load_job_chunk_vectors(job_ids):
+    """Fetch stored chunk vectors for the given job ids as {job_id: blob}"""
+    with span("db"):
+        return {
+            str(job_id): blob
+            async for job_id, blob in JobDescription.objects.filter(id__in=[j for j in job_ids if _is_uuid(j)])
+            .exclude(chunk_vectors=None)
+            .values_list('id', 'chunk_vectors')
         }
-    ).execute()
 
-    # Check if response is valid
-    if not response or not hasattr(response, 'data'):
-        return {"error": "Invalid response from Supabase"}
 
-    # Return the matched jobs
-    return response.data
+def rerank_by_chunks(matched_jobs, resume_chunks, stored, deadline):
+    """
+    Re-rank jobs returned by the vector RPC with max-sim over chunk vectors.
+    Jobs stored locally reuse their saved chunk vectors (`stored`, from
+    load_job_chunk_vectors), the rest are chunked and encoded
+    CHUNK_RERANK_BATCH jobs at a time (capped at 8 chunks per job). Between
+    batches the deadline is checked and None is returned if it passed.
+    CPU-bound, call through run_cpu.
+    """
+    if not matched_jobs or len(resume_chunks) == 0:
+        return matched_jobs
 
+    job_ids = [str(job.get('id')) for job in matched_jobs]
+    missing = [i for i, job_id in enumerate(job_ids) if job_id not in stored]
+    cache_event("job_chunk_vectors", True, len(job_ids) - len(missing))
+    cache_event("job_chunk_vectors", False, len(missing))
+    doc_matrices = [unpack_vectors(stored[job_id]) if job_id in stored else None for job_id in job_ids]
+    for start in range(0, len(missing), CHUNK_RERANK_BATCH):
+        if deadline.expired():
+            return None
+        batch = missing[start:start + CHUNK_RERANK_BATCH]
+        encoded = embed_documents([matched_jobs[i].get('description', '') for i in batch], max_chunks=8)
+        for i, matrix in zip(batch, encoded):
+            doc_matrices[i] = matrix
+
+    with span("rerank"):
+        scores = maxsim_scores(resume_chunks, doc_matrices)
+    for job, score in zip(matched_jobs, scores):
+        job['chunk_similarity'] = round(float(score), 4)
+    return sorted(matched_jobs, key=lambda job: job['chunk_similarity'], reverse=True)
+
+
+def _is_uuid(value):
+    try:
+        uuid.UUID(str(value))
+        return True
+    except ValueError:
+        return False
 
-@csrf_exempt
-def analyze_resume(request):
-    if request.method == "GET":
-        print("✅ Received GET request for analyzing resume.")
 
-        # Retrieve the most recent resume data from SQLite
+def build_job_analysis_prompt(user_resume, job):
+    """Prompt asking the LLM to assess the resume against one matched job"""
+    # Truncate the job description to manage token count
+    description = job.get('description', 'No description')
+    if len(description) > 1000:
+        description = description[:1000] + "... (truncated)"
+
+    # A structured prompt for Groq that's likely to generate better responses
+    return f"""
+    Please analyze the following resume against this job opportunity.
+
+    Provide the following sections in a clear, structured format:
+
+    1. Match Assessment: How well does the candidate's resume match the job requirements?
+    2. Key Matching Skills: List the top skills from the resume that match this job.
+    3. Missing Skills: Identify important skills mentioned in the job description that are not evident in the resume.
+    4. Recommended Learning: Suggest specific resources (courses, certifications, projects) to develop the missing skills.
+
+    Format your response as markdown with a "###" heading per section and bullet points.
+    Do not add a title for the job itself.
+
+    RESUME:
+    {user_resume}
+
+    JOB: {job.get('title') or job.get('domain', 'No title')}
+    Description: {description}
+    """
+
+
+async def request_groq_analysis(model_name, prompt, groq_api_key, max_tokens=2048):
+    """
+    Ask one Groq model for an analysis, retrying up to 3 times on network
+    errors, invalid JSON or malformed content. Returns the content or None.
+    """
+    client = get_http_client()
+    logger.info(f"Attempting analysis with model: {model_name}")
+    for attempt in range(3):  # Try up to 3 times
+        if attempt > 0:
+            retry_event("groq")
+            await asyncio.sleep(2)  # Wait before retrying
         try:
-            resume_instance = Resume.objects.last()
-            if not resume_instance:
-                print("❌ No resume data found in the database.")
-                return JsonResponse({"error": "No resume data found"}, status=404)
+            with span("llm"):
+                response = await client.post(
+                    GROQ_API_URL,
+                    headers={
+                        "Content-Type": "application/json",
+                        "Authorization": f"Bearer {groq_api_key}"
+                    },
+                    json={
+                        "model": model_name,
+                        "messages": [{"role": "user", "content": prompt}],
+                        "temperature": 0.3,  # Lower temperature for more consistent output
+                        "max_tokens": max_tokens
+                    },
+                    timeout=30
+                )
+        except httpx.HTTPError as e:
+            logger.error(f"Network error in Groq request (attempt {attempt+1}): {e}")
+            if attempt < 2:
+                continue
+            raise
 
-            user_resume = resume_instance.text
-            print(f"✅ Fetched resume: {user_resume[:100]}...")
+        # Check if response is valid JSON
+        try:
+            groq_data = response.json()
+        except json.JSONDecodeError:
+            logger.error(f"Invalid JSON response from Groq: {response.text[:100]}...")
+            if attempt < 2:
+                continue
+            raise Exception("Failed to parse Groq API response")
 
-        except Exception as e:
-            print(f"❌ Error fetching resume from the database: {e}")
-            return JsonResponse({"error": str(e)}, status=500)
+        # Validate response format
+        if not isinstance(groq_data, dict) or "choices" not in groq_data:
+            logger.error(f"Unexpected response structure: {groq_data}")
+            if attempt < 2:
+                continue
+            raise Exception("Invalid response structure from Groq API")
+
+        # Extract and validate content
+        content = groq_data.get("choices", [{}])[0].get("message", {}).get("content", "")
+
+        # Check if content is malformed (like in the example with lots of ** symbols)
+        if content.count("**") > 20 or len(content.strip()) < 100:
+            logger.error("Received malformed or truncated content from Groq")
+            continue
+
+        # Valid response
+        return content
+    return None
 
-        # Perform embedding using the local model
+
+async def analyze_with_models(prompt, groq_api_key, models_to_try, max_tokens=2048):
+    """
+    Ask the models in order of preference and return the first analysis that
+    succeeds. A fallback model is only called when the ones before it failed,
+    so a healthy primary costs one request per prompt.
+    """
+    for model_name in models_to_try:
         try:
-            print("🔄 Generating resume embedding locally...")
-            # Use the model imported at the top of the file
-            vector = model.encode(user_resume).tolist()
+            analysis = await request_groq_analysis(model_name, prompt, groq_api_key, max_tokens)
+        except Exception as model_e:
+            logger.error(f"Error using model {model_name}: {model_e}")
+            # Continue to the next model if this one failed
+            continue
+        if analysis:
+            logger.info(f"Successfully obtained analysis from {model_name}")
+            return analysis
+    return None
 
-            if vector is not None and len(vector) > 0:
-                print(f"✅ Vector generated successfully: Length - {len(vector)}")
 
-                # Match filtered jobs using the generated vector
-                print("🔄 Matching filtered jobs...")
-                result = match_filtered_jobs(vector)
-                
-                # Process result
-                if isinstance(result, dict) and "error" in result:
-                    return JsonResponse(result, status=500)
-                
-                matched_jobs = result
-                
-                # New functionality: Analyze resume and matched jobs with Groq
-                try:
-                    print("🔄 Analyzing resume fit with Groq LLM...")
-                    # Get Groq API key from environment variables
-                    groq_api_key = os.getenv("GROQ_API_KEY")
-                    
-                    if not groq_api_key:
-                        print("❌ GROQ_API_KEY environment variable not set")
-                        return JsonResponse({
-                            "matched_jobs": matched_jobs,
-                            "job_analysis_error": "Groq API key not configured"
-                        }, status=200)
-                    
-                    # Prepare job descriptions for the prompt - limit to top 3 to avoid token issues
-                    jobs_text = ""
-                    for i, job in enumerate(matched_jobs, 1):
-                        jobs_text += f"Job {i}: {job.get('domain', 'No title')}\n"
-                        # Truncate job descriptions to manage token count
-                        description = job.get('description', 'No description')
-                        if len(description) > 1000:
-                            description = description[:1000] + "... (truncated)"
-                        jobs_text += f"Description: {description}\n\n"
-                    
-                    # Create a more structured prompt for Groq that's likely to generate better responses
-                    prompt = f"""
-                    Please analyze the following resume against these job opportunities. 
-                    
-                    For each job, provide the following sections in a clear, structured format:
+async def analyze_jobs(user_resume, jobs, groq_api_key, deadline):
+    """
+    Analyse each job with its own Groq request, at most GROQ_FANOUT_CONCURRENCY
+    at a time, and join the sections in ranking order. Sections are cached per
+    (resume, job, models); a job whose request fails or misses the deadline
+    gets its rule-based section instead, without holding up the others.
+    Returns (markdown, True if every section came from the LLM).
+    """
+    resume_digest = hashlib.sha256(user_resume.encode()).hexdigest()
+    semaphore = asyncio.Semaphore(GROQ_FANOUT_CONCURRENCY)
 
-                    1. Match Assessment: How well does the candidate's resume match the job requirements?
-                    2. Key Matching Skills: List the top skills from the resume that match this job.
-                    3. Missing Skills: Identify important skills mentioned in the job description that are not evident in the resume.
-                    4. Recommended Learning: Suggest specific resources (courses, certifications, projects) to develop the missing skills.
-                    
-                    Format your response as markdown with clear headings and bullet points.
-                    
-                    RESUME:
-                    {user_resume}  # Truncate if needed
-                    
-                    MATCHED JOBS:
-                    {jobs_text}
-                    """
-                    
-                    # Try Mixtral first (more stable), fallback to Gemma if needed
-                    models_to_try = ["llama-3.3-70b-versatile", "gemma2-9b-it"]
-                    
-                    analysis = None
-                    for model_name in models_to_try:
-                        try:
-                            print(f"🔄 Attempting analysis with model: {model_name}")
-                            # Make request to Groq with retry logic
-                            for attempt in range(3):  # Try up to 3 times
-                                try:
-                                    response = requests.post(
-                                        "https://api.groq.com/openai/v1/chat/completions",
-                                        headers={
-                                            "Content-Type": "application/json",
-                                            "Authorization": f"Bearer {groq_api_key}"
-                                        },
-                                        json={
-                                            "model": model_name,
-                                            "messages": [{"role": "user", "content": prompt}],
-                                            "temperature": 0.3,  # Lower temperature for more consistent output
-                                            "max_tokens": 2048
-                                        },
-                                        timeout=30
-                                    )
-                                    
-                                    # Check if response is valid JSON
-                                    try:
-                                        groq_data = response.json()
-
-                                    except json.JSONDecodeError:
-                                        print(f"❌ Invalid JSON response from Groq: {response.text[:100]}...")
-                                        if attempt < 2:  # If not the last attempt
-                                            time.sleep(2)  # Wait before retrying
-                                            continue
-                                        raise Exception("Failed to parse Groq API response")
-                                    
-                                    # Validate response format
-                                    if not isinstance(groq_data, dict) or "choices" not in groq_data:
-                                        print(f"❌ Unexpected response structure: {groq_data}")
-                                        if attempt < 2:
-                                            time.sleep(2)
-                                            continue
-                                        raise Exception("Invalid response structure from Groq API")
-                                    
-                                    # Extract and validate content
-                                    content = groq_data.get("choices", [{}])[0].get("message", {}).get("content", "")
-                                    
-                                    # Check if content is malformed (like in the example with lots of ** symbols)
-                                    if content.count("**") > 20 or len(content.strip()) < 100:
-                                        print("❌ Received malformed or truncated content from Groq")
-                                        if attempt < 2:
-                                            time.sleep(2)
-                                            continue
-                                    else:
-                                        # Valid response
-                                        analysis = content
-                                        print(analysis,matched_jobs)
-                                        break
-                                        
-                                except requests.exceptions.RequestException as e:
-                                    print(f"❌ Network error in Groq request (attempt {attempt+1}): {e}")
-                                    if attempt < 2:
-                                        time.sleep(2)
-                                        continue
-                                    raise
-                            
-                            # If we got a valid analysis, break out of the model loop
-                            if analysis:
-                                print(f"✅ Successfully obtained analysis from {model_name}")
-                                break
-                                
-                        except Exception as model_e:
-                            print(f"❌ Error using model {model_name}: {model_e}")
-                            # Continue to the next model if this one failed
-                    
-                    # If no models succeeded, generate a fallback analysis
-                    if not analysis:
-                        print("❌ All LLM models failed, generating fallback analysis")
-                        analysis = generate_fallback_analysis(user_resume, matched_jobs)
-                    
-                    # Return both matched jobs and the analysis
-                    return JsonResponse({
-                        "matched_jobs": matched_jobs,
-                        "job_analysis": analysis
-                    }, status=200)
-                
-                    
-                except Exception as e:
-                    print(f"❌ Error in LLM analysis: {e}")
-                    # Generate a fallback analysis without the LLM
-                    fallback_analysis = generate_fallback_analysis(user_resume, matched_jobs)
-                    return JsonResponse({
-                        "matched_jobs": matched_jobs,
-                        "job_analysis": fallback_analysis,
-                        "job_analysis_error": str(e)
-                    }, status=200)
-            else:
-                print("❌ Empty or invalid vector response.")
-                return JsonResponse({"error": "Failed to generate embedding vector"}, status=500)
+    async def section(job):
+        key = make_key("job_analysis", resume_digest, job.get('id'),
+                       hashlib.sha256(job.get('description', '').encode()).hexdigest(), *ANALYSIS_MODELS)
+        cached = job_sections.get(key)
+        cache_event("job_analysis", cached is not None)
+        if cached is not None:
+            return cached, True
+        try:
+            async with semaphore:
+                analysis = await asyncio.wait_for(
+                    analyze_with_models(build_job_analysis_prompt(user_resume, job), groq_api_key, ANALYSIS_MODELS,
+                                        max_tokens=GROQ_JOB_MAX_TOKENS),
+                    deadline.remaining(),
+                )
+        except asyncio.TimeoutError:
+            logger.warning(f"Analysis of job {job.get('id')} missed the deadline, using the fallback section")
+            event("job_analysis_timeout")
+            analysis = None
+        except Exception as e:
+            logger.error(f"Analysis of job {job.get('id')} failed: {e}")
+            analysis = None
+        if not analysis:
+            event("job_analysis_fallback")
+            return fallback_job_section(user_resume, job), False
+        job_sections.put(key, analysis.strip())
+        return analysis.strip(), True
+
+    with span("llm_fanout"):
+        sections = await asyncio.gather(*(section(job) for job in jobs))
+    analysis = "".join(
+        f"{job_heading(i, job)}\n\n{text}\n\n" for i, (job, (text, _)) in enumerate(zip(jobs, sections), 1)
+    )
+    return analysis, all(from_llm for _, from_llm in sections)
+
+
+@csrf_exempt
+@admit("llm")
+async def analyze_resume(request):
+    if request.method != "GET":
+        # Return error for invalid request methods
+        logger.warning("Invalid request method. Only GET is allowed.")
+        return JsonResponse({"error": "Invalid request method. Only GET is allowed."}, status=405)
+
+    logger.debug("Received GET request for analyzing resume.")
+
+    # Retrieve the most recent resume data from SQLite
+    try:
+        with span("db"):
+            resume_instance = await Resume.objects.alast()
+        if not resume_instance:
+            logger.error("No resume data found in the database.")
+            return JsonResponse({"error": "No resume data found"}, status=404)
 
+        user_resume = resume_instance.text
+        logger.debug(f"Fetched resume: {user_resume[:100]}...")
+
+    except Exception as e:
+        logger.error(f"Error fetching resume from the database: {e}")
+        return JsonResponse({"error": str(e)}, status=500)
+
+    key = analysis_key(user_resume)
+    # Usually computed speculatively right after the upload
+    try:
+        stored = await precompute.lookup(resume_instance, key)
+    except Exception as e:
+        logger.warning(f"Precomputed analysis unavailable: {e}")
+        stored = None
+    if stored is not None:
+        return JsonResponse(stored)
+
+    # Duplicate requests (double clicks, retries) and a precompute still running share one analysis
+    payload, status_code = await analysis_flight.do(key, lambda: run_analysis(resume_instance))
+    return JsonResponse(payload, status=status_code)
+
+
+def analysis_key(resume_text):
+    return make_key("analyze", hashlib.sha256(resume_text.encode()).hexdigest(), *ANALYSIS_MODELS)
+
+
+async def run_analysis(resume_instance):
+    """
+    Embed the resume, rank jobs through the cascade in myapp.ranking and
+    analyse the fit of the best few with Groq. Returns (payload, HTTP status).
+    A complete LLM analysis is also stored for the resume (precompute.py).
+    """
+    user_resume = resume_instance.text
+    deadline = Deadline(CASCADE_TOTAL_BUDGET_MS / 1000)
+
+    # Perform embedding using the local model
+    try:
+        logger.info("Generating resume embedding locally...")
+        cache_event("resume_chunk_vectors", bool(resume_instance.chunk_vectors))
+        if resume_instance.chunk_vectors:
+            resume_chunks = unpack_vectors(resume_instance.chunk_vectors)
+            vector = pool(resume_chunks).tolist()
+        else:
+            resume_chunks, pooled = await run_cpu(embed_document, user_resume)
+            vector = pooled.tolist()
+
+        if vector is None or len(vector) == 0:
+            logger.error("Empty or invalid vector response.")
+            return {"error": "Failed to generate embedding vector"}, 500
+
+        logger.debug(f"Vector generated successfully: Length - {len(vector)}")
+
+        key = analysis_key(user_resume)
+        try:
+            await precompute.begin(resume_instance, key, vector, JOB_MATCH_THRESHOLD)
         except Exception as e:
-            print(f"❌ Error in processing: {e}")
-            return JsonResponse({"error": f"Processing error: {str(e)}"}, status=500)
+            logger.warning(f"Could not record analysis run: {e}")
 
-    # Return error for invalid request methods
-    print("❌ Invalid request method. Only GET is allowed.")
-    return JsonResponse({"error": "Invalid request method. Only GET is allowed."}, status=405)
+        # Match filtered jobs using the generated vector
+        logger.info("Matching filtered jobs...")
+        result = await match_filtered_jobs(vector, match_count=CASCADE_RECALL_COUNT)
 
+        # Each stage falls back to the previous ranking when it runs out of time
+        ranked = result[:CASCADE_RERANK_COUNT]
+        stored = await load_job_chunk_vectors([str(job.get('id')) for job in ranked])
+        ranked = await run_stage(
+            "chunks", deadline,
+            # Copies, so a stage abandoned at its deadline cannot touch the jobs we return
+            lambda stage_deadline: run_cpu(
+                rerank_by_chunks, [dict(job) for job in ranked], resume_chunks, stored, stage_deadline
+            ),
+        ) or ranked
+        ranked = await run_stage(
+            "cross_encoder", deadline,
+            lambda stage_deadline: run_cpu(rerank_with_cross_encoder, user_resume, ranked, stage_deadline),
+        ) or ranked
+        matched_jobs = ranked[:CASCADE_RESULT_COUNT]
+        llm_jobs = matched_jobs[:CASCADE_LLM_COUNT]
 
-def generate_fallback_analysis(resume, jobs):
-    """Generate a basic analysis without using an LLM when the API call fails"""
+    except Exception as e:
+        logger.error(f"Error in processing: {e}")
+        return {"error": f"Processing error: {str(e)}"}, 500
+
+    # Analyze resume and matched jobs with Groq
+    try:
+        logger.info("Analyzing resume fit with Groq LLM...")
+        # Get Groq API key from environment variables
+        groq_api_key = os.getenv("GROQ_API_KEY")
+
+        if not groq_api_key:
+            logger.error("GROQ_API_KEY environment variable not set")
+            return {
+                "matched_jobs": matched_jobs,
+                "job_analysis_error": "Groq API key not configured"
+            }, 200
+
+        # One request per job; a job that fails or runs out of time gets its fallback section
+        analysis, complete = await analyze_jobs(
+            user_resume, llm_jobs, groq_api_key, Deadline(stage_budget("llm", deadline))
+        )
+
+        if not complete:
+            logger.warning("Some job analyses fell back to the system-generated section")
+        else:
+            # A job posted later that scores at or above the cutoff of the ranked candidates invalidates this
+            considered = result[:CASCADE_RERANK_COUNT]
+            cutoff = (min(job.get('similarity', JOB_MATCH_THRESHOLD) for job in considered)
+                      if len(considered) == CASCADE_RERANK_COUNT else JOB_MATCH_THRESHOLD)
+            try:
+                await precompute.finish(
+                    resume_instance, key, {"matched_jobs": matched_jobs, "job_analysis": analysis}, cutoff
+                )
+            except Exception as e:
+                logger.warning(f"Could not store analysis: {e}")
+
+        # Return both matched jobs and the analysis
+        return {
+            "matched_jobs": matched_jobs,
+            "job_analysis": analysis
+        }, 200
+
+    except Exception as e:
+        logger.error(f"Error in LLM analysis: {e}")
+        # Generate a fallback analysis without the LLM
+        fallback_analysis = generate_fallback_analysis(user_resume, llm_jobs)
+        return {
+            "matched_jobs": matched_jobs,
+            "job_analysis": fallback_analysis,
+            "job_analysis_error": str(e)
+        }, 200
+
+
+def job_heading(i, job):
+    job_title = job.get("title") or job.get("domain") or "Unnamed Position"
+    company = job.get("company_name") or job.get("company")
+    return f"## Job {i}: {job_title}" + (f" at {company}" if company else "")
+
+
+def fallback_job_section(resume, job):
+    """Keyword-based sections for one job, used when its LLM analysis is unavailable"""
+    resume_lower = resume.lower()
+    section = "> Note: This section was generated without AI assistance due to service limitations.\n\n"
+
+    # Basic matching section
+    section += "### Match Assessment\n"
+    section += "A basic keyword analysis has been performed on your resume and this job listing.\n\n"
     
-    # Create a simple analysis based on keyword matching
-    analysis = "# Resume Analysis (System Generated)\n\n"
-    analysis += "> Note: This is an automated analysis generated without AI assistance due to service limitations.\n\n"
+    # Check for skill matches in job description
+    job_desc_lower = job.get("description", "").lower()
+    matching_skills = []
+    missing_skills = []
     
-    # Extract keywords from resume (simple approach)
-    resume_lower = resume.lower()
+    for skill in COMMON_SKILLS:
+        if skill in job_desc_lower:
+            if skill in resume_lower:
+                matching_skills.append(skill)
+            else:
+                missing_skills.append(skill)
     
-    # Common skills to check for
-    common_skills = [
-        "python", "javascript", "java", "c++", "sql", "aws", "azure", "gcp", 
-        "react", "angular", "vue", "node.js", "django", "flask", "express",
-        "docker", "kubernetes", "cicd", "devops", "machine learning", "ai",
-        "data science", "analytics", "agile", "scrum", "product management",
-        "html", "css", "ui", "ux", "design", "testing", "qa", "security"
-    ]
+    # Add matching skills
+    section += "### Key Matching Skills\n"
+    if matching_skills:
+        for skill in matching_skills:
+            section += f"- {skill.title()}\n"
+    else:
+        section += "- No specific skill matches detected\n"
     
-    # Find skills in resume
-    resume_skills = []
-    for skill in common_skills:
-        if skill in resume_lower:
-            resume_skills.append(skill)
+    section += "\n### Missing Skills\n"
+    if missing_skills:
+        for skill in missing_skills[:5]:  # Limit to top 5
+            section += f"- {skill.title()}\n"
+    else:
+        section += "- No obvious skill gaps detected\n"
     
-    for i, job in enumerate(jobs[:3], 1):
-        job_title = job.get("title", "Unnamed Position")
-        company = job.get("company_name", "Unknown Company")
-        
-        analysis += f"## Job {i}: {job_title} at {company}\n\n"
-        
-        # Basic matching section
-        analysis += "### Match Assessment\n"
-        analysis += "A basic keyword analysis has been performed on your resume and this job listing.\n\n"
-        
-        # Check for skill matches in job description
-        job_desc_lower = job.get("description", "").lower()
-        matching_skills = []
-        missing_skills = []
-        
-        for skill in common_skills:
-            if skill in job_desc_lower:
-                if skill in resume_lower:
-                    matching_skills.append(skill)
-                else:
-                    missing_skills.append(skill)
-        
-        # Add matching skills
-        analysis += "### Key Matching Skills\n"
-        if matching_skills:
-            for skill in matching_skills:
-                analysis += f"- {skill.title()}\n"
-        else:
-            analysis += "- No specific skill matches detected\n"
-        
-        analysis += "\n### Missing Skills\n"
-        if missing_skills:
-            for skill in missing_skills[:5]:  # Limit to top 5
-                analysis += f"- {skill.title()}\n"
-        else:
-            analysis += "- No obvious skill gaps detected\n"
-        
-        analysis += "\n### Recommended Learning\n"
-        if missing_skills:
-            for skill in missing_skills[:3]:  # Recommend for top 3
-                analysis += f"- For {skill.title()}: Online courses on platforms like Coursera, Udemy, or LinkedIn Learning\n"
-        else:
-            analysis += "- Continue developing your current skillset\n"
-        
-        analysis += "\n\n"
+    section += "\n### Recommended Learning\n"
+    if missing_skills:
+        for skill in missing_skills[:3]:  # Recommend for top 3
+            section += f"- For {skill.title()}: Online courses on platforms like Coursera, Udemy, or LinkedIn Learning\n"
+    else:
+        section += "- Continue developing your current skillset\n"
+    return section
+
+
+def generate_fallback_analysis(resume, jobs):
+    """Generate a basic analysis without using an LLM when the API call fails"""
     
+    # Create a simple analysis based on keyword matching
+    analysis = "# Resume Analysis (System Generated)\n\n"
+    for i, job in enumerate(jobs[:3], 1):
+        analysis += f"{job_heading(i, job)}\n\n{fallback_job_section(resume, job)}\n\n"
     return analysis
 
-@api_view(['GET'])
-def get_jobs_by_domain(request):
+@require_GET
+@admit("read")
+async def get_jobs_by_domain(request):
     """
     API endpoint to fetch jobs by domain from Supabase
     
@@ -413,55 +617,137 @@ def get_jobs_by_domain(request):
     domain = request.GET.get('domain', None)
     
     if not domain:
-        return Response({"error": "Domain parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({"error": "Domain parameter is required"}, status=status.HTTP_400_BAD_REQUEST)
     
-    try:
-        # Use the helper function
-        supabase = get_supabase_client()
+    async def fetch_remote():
+        supabase = await get_async_supabase()
         
         # Fetch jobs from Supabase that match the specified domain
-        response = supabase.table("job_description").select("*").eq("domain", domain).execute()
+        with span("supabase_read"):
+            response = await supabase.table("job_description").select("*").eq("domain", domain).execute()
+        return "supabase", getattr(response, 'data', None)
+
+    try:
+        # Local mirror when fresh, Supabase otherwise; the rows of each are cached apart
+        source, jobs = await read_through(lambda mirror: ("mirror", mirror.jobs_by_domain(domain)), fetch_remote)
+        _, expired = await sync_to_async(tombstones)()
+        if jobs and expired:
+            jobs = [job for job in jobs if str(job.get("id")) not in expired]
         
         # Check if we got data back
-        if hasattr(response, 'data') and response.data:
-            return Response(response.data)
+        if jobs:
+            # Rows are encoded once and reused until they change
+            with span("serialize"):
+                return RawJsonResponse(job_payloads.render_list(jobs, source))
         else:
-            return Response([], status=status.HTTP_200_OK)  # Return empty list if no jobs found
+            return JsonResponse([], safe=False, status=status.HTTP_200_OK)  # Return empty list if no jobs found
             
     except Exception as e:
-        print(f"Error fetching jobs from Supabase: {str(e)}")
-        return Response(
+        logger.error(f"Error fetching jobs from Supabase: {str(e)}")
+        return JsonResponse(
             {"error": "Failed to fetch jobs. Please try again later."}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
-@api_view(['GET'])
-def get_all_domains(request):
+@require_GET
+@admit("read")
+async def get_all_domains(request):
     """
     API endpoint to fetch all available job domains
     """
-    try:
-        # Use the helper function
-        supabase = get_supabase_client()
+    async def fetch_remote():
+        supabase = await get_async_supabase()
         
         # Query to get unique domains
-        response = supabase.table("job_description").select("domain").execute()
+        with span("supabase_read"):
+            response = await supabase.table("job_description").select("domain").execute()
         
         if hasattr(response, 'data') and response.data:
             # Extract unique domains
-            domains = list(set([item['domain'] for item in response.data if item.get('domain')]))
-            return Response(domains)
+            return list(set([item['domain'] for item in response.data if item.get('domain')]))
+        return []
+
+    try:
+        domains = await read_through(lambda mirror: mirror.domains(), fetch_remote)
+        if domains:
+            return JsonResponse(domains, safe=False)
         else:
-            return Response([], status=status.HTTP_200_OK)
+            return JsonResponse([], safe=False, status=status.HTTP_200_OK)
             
     except Exception as e:
-        print(f"Error fetching domains from Supabase: {str(e)}")
-        return Response(
+        logger.error(f"Error fetching domains from Supabase: {str(e)}")
+        return JsonResponse(
             {"error": "Failed to fetch domains. Please try again later."}, 
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
 
+@require_GET
+@admit("read")
+async def typeahead(request):
+    """
+    Autocomplete over job titles, companies, domains and skills, most
+    popular and recent first
+
+    Query parameters:
+    - q: what the user has typed so far
+    - type: optional, one of title, company, domain, skill
+    - limit: maximum suggestions (default 10, at most 50)
+    """
+    prefix = request.GET.get('q', '')
+    kind = request.GET.get('type') or None
+    if kind is not None and kind not in KINDS:
+        return JsonResponse({"error": f"type must be one of {', '.join(KINDS)}"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        return JsonResponse({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        index = await sync_to_async(get_typeahead_index)()
+        with span("typeahead"):
+            suggestions = index.suggest(prefix, limit, kind)
+        return JsonResponse(suggestions, safe=False)
+    except Exception as e:
+        logger.error(f"Error serving typeahead: {str(e)}")
+        return JsonResponse(
+            {"error": "Failed to fetch suggestions. Please try again later."},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@require_GET
+@admit("export")
+async def export_table(request, table):
+    """
+    Stream jobs or resumes with their embeddings as Parquet or an Arrow IPC
+    stream, one row group at a time. Needs `Authorization: Bearer <EXPORT_TOKEN>`.
+
+    Query parameters:
+    - format: parquet (default) or arrow
+    - since: the X-Export-Watermark of a previous export, to get only newer rows
+    """
+    if not EXPORT_TOKEN:
+        return JsonResponse({"error": "Export is disabled"}, status=status.HTTP_404_NOT_FOUND)
+    if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {EXPORT_TOKEN}"):
+        return JsonResponse({"error": "Invalid export token"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    # pyarrow is only loaded by the processes that export
+    from .export import Export
+
+    try:
+        export = await sync_to_async(Export)(table, request.GET.get('format', 'parquet'), request.GET.get('since'))
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    response = StreamingHttpResponse(export.achunks(), content_type=export.content_type)
+    response['Content-Disposition'] = f'attachment; filename="{export.file_name}"'
+    # Pass back as `since` for the next incremental export
+    response['X-Export-Watermark'] = export.until or export.since or ''
+    return response
+
+
+@admit("llm")
 @api_view(['POST'])
 def match_candidates_for_job(request):
     """
@@ -477,8 +763,26 @@ def match_candidates_for_job(request):
         if not job_description:
             return Response({"error": "Job description is required"}, status=status.HTTP_400_BAD_REQUEST)
         
+        # Identical concurrent requests share one search and LLM call
+        payload, status_code = candidates_flight.do_sync(
+            make_key("match_candidates", job_description), lambda: find_candidates(job_description)
+        )
+        return Response(payload, status=status_code)
+
+    except Exception as e:
+        logger.error(f"Error matching candidates: {e}")
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def find_candidates(job_description):
+    """
+    Match stored resumes against a job description and analyse them with Groq.
+    Returns (payload, HTTP status).
+    """
+    try:
         # Generate embedding locally
-        vector = model.encode(job_description).tolist()
+        _, pooled = embed_document(job_description)
+        vector = pooled.tolist()
         
         # Match candidates using a Supabase function
         match_threshold = 0.2
@@ -486,17 +790,18 @@ def match_candidates_for_job(request):
         
         # Call Supabase function to match candidates
         supabase = get_supabase_client()
-        response = supabase.rpc(
-            "match_candidates", 
-            {
-                "query_embedding": vector,
-                "match_threshold": match_threshold,
-                "match_count": match_count
-            }
-        ).execute()
+        with span("vector_search"):
+            response = supabase.rpc(
+                "match_candidates", 
+                {
+                    "query_embedding": vector,
+                    "match_threshold": match_threshold,
+                    "match_count": match_count
+                }
+            ).execute()
         
         if not response or not hasattr(response, 'data'):
-            return Response({"error": "Invalid response from Supabase"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            return {"error": "Invalid response from Supabase"}, status.HTTP_500_INTERNAL_SERVER_ERROR
         
         matched_candidates = response.data
         
@@ -525,38 +830,40 @@ def match_candidates_for_job(request):
             """
             
             # Make request to Groq
-            response = requests.post(
-                "https://api.groq.com/openai/v1/chat/completions",
-                headers={
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {groq_api_key}"
-                },
-                json={
-                    "model": "gemma2-9b-it",
-                    "messages": [{"role": "user", "content": prompt}]
-                }
-            )
+            with span("llm"):
+                response = requests.post(
+                    GROQ_API_URL,
+                    headers={
+                        "Content-Type": "application/json",
+                        "Authorization": f"Bearer {groq_api_key}"
+                    },
+                    json={
+                        "model": "gemma2-9b-it",
+                        "messages": [{"role": "user", "content": prompt}]
+                    },
+                    timeout=HTTP_TIMEOUT,
+                )
             
             groq_data = response.json()
             analysis = groq_data.get("choices", [{}])[0].get("message", {}).get("content", "Analysis unavailable")
             
             # Return both matched candidates and the analysis
-            return Response({
+            return {
                 "matched_candidates": matched_candidates,
                 "candidate_analysis": analysis
-            }, status=status.HTTP_200_OK)
+            }, status.HTTP_200_OK
             
         except Exception as e:
-            print(f"Error in Groq analysis: {e}")
+            logger.error(f"Error in Groq analysis: {e}")
             # Continue even if Groq analysis fails, just return matched candidates
-            return Response({
+            return {
                 "matched_candidates": matched_candidates,
                 "candidate_analysis_error": str(e)
-            }, status=status.HTTP_200_OK)
+            }, status.HTTP_200_OK
             
     except Exception as e:
-        print(f"Error matching candidates: {e}")
-        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        logger.error(f"Error matching candidates: {e}")
+        return {"error": str(e)}, status.HTTP_500_INTERNAL_SERVER_ERROR
 
 
 def insert_job_to_supabase(job_data):
@@ -612,13 +919,22 @@ def get_domains(request):
     ]
     return Response(domains)
 
-@api_view(['POST'])
-def upload_job_posting(request):
+def _request_data(request):
+    """Parse a JSON or form-encoded request body into a dict"""
+    if request.content_type == "application/json":
+        return json.loads(request.body or b"{}")
+    return request.POST
+
+
+@csrf_exempt
+@require_POST
+@admit("ingest")
+async def upload_job_posting(request):
     """
     API endpoint to receive job postings from the NextJS frontend and store them in Supabase
     """
     try:
-        data = request.data
+        data = _request_data(request)
         
         # Extract job posting data
         title = data.get('title')
@@ -629,77 +945,166 @@ def upload_job_posting(request):
         domain = data.get('domain')
         
         # Debug information
-        print(f"Received data: title={title}, company={company}, domain={domain}")
+        logger.debug(f"Received data: title={title}, company={company}, domain={domain}")
         
         # Validate required fields
         if not all([title, company, description, domain]):
-            return Response({"error": "Missing required fields"}, status=status.HTTP_400_BAD_REQUEST)
+            return JsonResponse({"error": "Missing required fields"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Optional ISO 8601 expiry; JOB_POSTING_TTL_DAYS from now otherwise
+        expiry = {}
+        if data.get('expires_at'):
+            expires_at = parse_datetime(str(data['expires_at']))
+            if expires_at is None:
+                return JsonResponse({"error": "expires_at must be an ISO 8601 datetime"}, status=status.HTTP_400_BAD_REQUEST)
+            if timezone.is_naive(expires_at):
+                expires_at = timezone.make_aware(expires_at)
+            if expires_at <= timezone.now():
+                return JsonResponse({"error": "expires_at must be in the future"}, status=status.HTTP_400_BAD_REQUEST)
+            expiry["expires_at"] = expires_at
         
+        # Near-duplicate check before spending time on embedding
+        signature = None
+        if DEDUP_MODE != "off":
+            with span("dedup"):
+                signature = minhash_signature(posting_text(title, description, requirements))
+                duplicate_index = await sync_to_async(get_duplicate_index)()
+                duplicate = duplicate_index.best_match(signature)
+                while duplicate and not await live_jobs().filter(id=duplicate[0]).aexists():
+                    # Expired or archived since the index was loaded: re-posting it is fine
+                    duplicate_index.remove(duplicate[0])
+                    duplicate = duplicate_index.best_match(signature)
+            if duplicate:
+                duplicate_id, duplicate_similarity = duplicate
+                event("duplicate_posting")
+                logger.info(f"Near-duplicate of job {duplicate_id} (similarity {duplicate_similarity:.2f})")
+                if DEDUP_MODE == "merge":
+                    return JsonResponse({
+                        "status": "duplicate",
+                        "message": "An equivalent job posting already exists",
+                        "job_id": duplicate_id,
+                        "similarity": duplicate_similarity
+                    }, status=status.HTTP_200_OK)
+                # Keep the posting locally, flagged, but do not embed or publish it
+                with span("db"):
+                    job_description = await JobDescription.objects.acreate(
+                        title=title,
+                        description=description,
+                        requirements=requirements,
+                        company=company,
+                        location=location,
+                        domain=domain,
+                        **expiry,
+                        minhash=signature_to_bytes(signature),
+                        duplicate_of_id=duplicate_id,
+                    )
+                return JsonResponse({
+                    "status": "duplicate_flagged",
+                    "message": "Job posting stored but flagged as a duplicate and not published",
+                    "job_id": job_description.id,
+                    "duplicate_of": duplicate_id,
+                    "similarity": duplicate_similarity
+                }, status=status.HTTP_201_CREATED)
+
+        # Start encoding on the CPU executor while the local row is written
+        combined_text = f"{title} {company}\n{description}\n{requirements}"
+        encoding = asyncio.ensure_future(run_cpu(embed_document, combined_text))
+
         try:
             job_id = uuid.uuid4()
             # Create and save the job description in the local database
-            job_description = JobDescription.objects.create(
-                id = job_id,
-                title=title,
-                description=description,
-                company=company,
-                location=location,
-                domain=domain,
-            )
+            with span("db"):
+                job_description = await JobDescription.objects.acreate(
+                    id = job_id,
+                    title=title,
+                    description=description,
+                    requirements=requirements,
+                    company=company,
+                    location=location,
+                    domain=domain,
+                    **expiry,
+                    minhash=signature_to_bytes(signature) if signature is not None else None,
+                )
+            if signature is not None:
+                duplicate_index.add(job_description.id, signature)
+            try:
+                await sync_to_async(index_posting)(job_description)
+            except Exception as e:
+                logger.warning(f"Could not add job to the typeahead index: {e}")
             
             # For debugging - to ensure we're correctly creating the Django model
-            print(f"Created JobDescription with ID: {job_description.id}")
+            logger.debug(f"Created JobDescription with ID: {job_description.id}")
             
             try:
-                # Generate vector embedding using sentence-transformers
-                # Import model inside try/except to handle potential import errors gracefully
-                from sentence_transformers import SentenceTransformer
-                model = SentenceTransformer('all-MiniLM-L6-v2')
-                
-                combined_text = f"{title} {company} {description} {requirements}"
-                vector = model.encode(combined_text).tolist()
+                # Chunk embeddings from the shared sentence-transformers model
+                chunk_vectors, pooled = await encoding
+                vector = pooled.tolist()
+                job_description.chunk_vectors = pack_vectors(chunk_vectors)
+                with span("db"):
+                    await job_description.asave(update_fields=['chunk_vectors'])
+
+                try:
+                    # Stored analyses this job would have been matched into are out of date
+                    await precompute.invalidate_for_job(vector)
+                except Exception as e:
+                    logger.warning(f"Could not invalidate precomputed analyses: {e}")
                 
                 try:
-                    # Import supabase client inside try/except to handle potential import errors
-                    supabase_client = get_supabase_client()
-                    
-                    # Insert into Supabase job_description table
-                    job_response = supabase_client.table("job_description").insert({
-                        "id": str(job_description.id),  # Use Django model ID as Supabase ID, not job_description.id,  # Use Django model ID as Supabase ID
-                        "uuid": str(job_description.id),  # Using the same ID for uuid field, not job_description.id,  # Using the same ID for uuid field
-                        "domain": domain,
-                        "description": description,
-                        "salary": 0,  # Default value as per schema
-                        "contact_info": company,  # Using company as contact info
-                        "recruiter_id": "00000000-0000-0000-0000-000000000000",  # Default UUID
-                        "application_link": ""  # Empty application link
-                    }).execute()
+                    supabase_client = await get_async_supabase()
+
+                    def insert_vector():
+                        return supabase_client.table("vector_table").insert({
+                            "id": str(uuid.uuid4()),   # Generate new UUID for vector table
+                            "job_id": str(job_description.id),  # Reference to job description ID in job_description table
+                            "embedding": vector  # The embedding vector
+                        }).execute()
+
+                    # Insert the job row and its vector concurrently
+                    with span("supabase_write"):
+                        job_response, vector_response = await asyncio.gather(
+                            supabase_client.table("job_description").insert({
+                                "id": str(job_description.id),  # Use Django model ID as Supabase ID
+                                "uuid": str(job_description.id),  # Using the same ID for uuid field
+                                "domain": domain,
+                                "description": description,
+                                "salary": 0,  # Default value as per schema
+                                "contact_info": company,  # Using company as contact info
+                                "recruiter_id": "00000000-0000-0000-0000-000000000000",  # Default UUID
+                                "application_link": "",  # Empty application link
+                                # Versions the cached JSON of the row (renderers.JobPayloadCache)
+                                "updated_at": job_description.updated_at.isoformat(),
+                            }).execute(),
+                            insert_vector(),
+                            return_exceptions=True,
+                        )
+
+                    if isinstance(job_response, Exception):
+                        raise job_response
 
                     if not job_response.data or len(job_response.data) == 0:
-                        print("Failed to insert job into Supabase:", job_response.error)
-                        return Response({
+                        logger.error(f"Failed to insert job into Supabase: {getattr(job_response, 'error', None)}")
+                        return JsonResponse({
                             "status": "partial_success", 
                              "message": "Job posting created in local database but Supabase job insert failed",
                              "job_id": str(job_description.id),
-                             "error": str(job_response.error)
+                             "error": str(getattr(job_response, "error", None))
                      }, status=status.HTTP_201_CREATED)
-                    
-                    # Insert vector embedding into vector_table
-                    vector_response = supabase_client.table("vector_table").insert({
-                        "id": str(uuid.uuid4()),   # Generate new UUID for vector table
-                        "job_id": str(job_description.id),  # Reference to job description ID in job_description table, not job_description.id,  # Reference to job description
-                        "embedding": vector  # The embedding vector
-                    }).execute()
 
+                    if isinstance(vector_response, Exception):
+                        # The vector may have raced ahead of the job row it references; retry now it exists
+                        logger.warning(f"Retrying vector insert after job insert: {vector_response}")
+                        retry_event("supabase_vector_insert")
+                        with span("supabase_write"):
+                            await insert_vector()
                     
-                    print("Successfully inserted data into Supabase")
+                    logger.debug("Successfully inserted data into Supabase")
                     
                 except Exception as supabase_error:
                     # Handle Supabase integration errors
-                    print(f"Supabase error: {str(supabase_error)}")
+                    logger.error(f"Supabase error: {str(supabase_error)}")
                     # If Supabase fails but Django DB succeeded, we still return success
                     # but include a warning
-                    return Response({
+                    return JsonResponse({
                         "status": "partial_success", 
                         "message": "Job posting created in local database but Supabase integration failed",
                         "job_id": job_description.id,
@@ -708,15 +1113,15 @@ def upload_job_posting(request):
                 
             except ImportError as import_error:
                 # Handle missing sentence-transformers package
-                print(f"Import error: {str(import_error)}")
-                return Response({
+                logger.error(f"Import error: {str(import_error)}")
+                return JsonResponse({
                     "status": "partial_success", 
                     "message": "Job posting created but vector embedding failed",
                     "job_id": job_description.id,
                     "error_detail": str(import_error)
                 }, status=status.HTTP_201_CREATED)
             
-            return Response({
+            return JsonResponse({
                 "status": "success", 
                 "message": "Job posting created successfully",
                 "job_id": job_description.id
@@ -724,18 +1129,26 @@ def upload_job_posting(request):
             
         except Exception as db_error:
             # Database-specific errors
-            print(f"Database error: {str(db_error)}")
-            return Response({
+            logger.error(f"Database error: {str(db_error)}")
+            return JsonResponse({
                 "status": "error", 
                 "message": "Database error",
                 "error_detail": str(db_error)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        finally:
+            # Not awaited when a write above failed: stop it, or retrieve its error so it is not reported as lost
+            if not encoding.cancel() and not encoding.cancelled():
+                encoding.exception()
             
     except Exception as e:
         # Catch-all for any other errors
-        print(f"General error: {str(e)}")
-        return Response({
+        logger.error(f"General error: {str(e)}")
+        return JsonResponse({
             "status": "error", 
             "message": str(e)
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+def metrics(request):
+    """Prometheus scrape endpoint for request, span, cache and retry metrics"""
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")